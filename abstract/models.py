@@ -1,8 +1,27 @@
+import gzip
+import io
+import itertools
+import json
+import uuid
+import zipfile
+from collections import defaultdict
+from decimal import Decimal
+
 from django.conf import settings
+from django.core.files import File as DjangoFile
+from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Max, Q, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 
+from apps.utils.functions import CONTENT_COUNTER_FIELDS, ORDER_GAP, get_file_kind
+
+CONTENT_APP_LABELS = ('batch', 'course', 'free_resource')
+FILE_BATCH_SIZE = 1000
+
 
 class AbstractReview(TimeStampedModel):
     student = models.ForeignKey(
@@ -25,3 +44,421 @@ class AbstractReview(TimeStampedModel):
 
     def __str__(self):
         return f"{self.student.full_name}: {self.title} ({self.rating})"
+
+
+class AbstractAttendanceSummary(TimeStampedModel):
+    """
+    Running attendance totals of a student in a batch or course, kept up to date by the MeritHub attendance webhook
+    so that ATTENDANCE_CRITERIA can be checked without scanning attendance rows.
+    """
+    owner_field = None  # Name of the batch/course foreign key, set by the concrete model
+    SUMMARY_FIELDS = ('classes_held', 'classes_attended', 'total_minutes', 'percentage', 'modified')
+
+    student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name="%(class)s_summaries")
+    classes_held = models.PositiveIntegerField(default=0, verbose_name="Classes Held")
+    classes_attended = models.PositiveIntegerField(default=0, verbose_name="Classes Attended")
+    total_minutes = models.PositiveIntegerField(default=0, verbose_name="Total Minutes")
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0, verbose_name="Attendance %")
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.student} - {getattr(self, self.owner_field)} ({self.percentage}%)"
+
+    @classmethod
+    def apply_changes(cls, owner_id, changes):
+        """
+        Add `changes`, a {student_id: (classes_held, classes_attended, total_minutes)} mapping of increments, to the
+        summaries of the owner's students. Missing summaries are created first, then all of them are locked and
+        written back with one bulk_update.
+        """
+        if not changes:
+            return
+        owner_attname = f'{cls.owner_field}_id'
+        cls.objects.bulk_create([cls(student_id=student_id, **{owner_attname: owner_id}) for student_id in changes],
+                                ignore_conflicts=True)
+        summaries = list(cls.objects.select_for_update().filter(**{owner_attname: owner_id},
+                                                                student_id__in=changes))
+        now = timezone.now()
+        for summary in summaries:
+            held, attended, minutes = changes[summary.student_id]
+            summary.classes_held += held
+            summary.classes_attended += attended
+            summary.total_minutes += minutes
+            summary.percentage = (
+                Decimal(summary.classes_attended * 100) / summary.classes_held if summary.classes_held else Decimal(0)
+            ).quantize(Decimal('0.01'))
+            summary.modified = now
+        cls.objects.bulk_update(summaries, cls.SUMMARY_FIELDS)
+
+
+class AbstractLiveClassFile(TimeStampedModel):
+    """
+    File shared during a batch or course live class, as reported by the MeritHub classFiles webhook. Concrete models
+    add the `live_class` foreign key.
+    """
+    name = models.CharField(max_length=255, verbose_name="File Name", blank=True)
+    url = models.URLField(max_length=1000, verbose_name="File URL", blank=True)
+    details = models.JSONField(verbose_name="Details", default=dict)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.live_class} - {self.name}"
+
+
+class AbstractLiveClassChat(TimeStampedModel):
+    """
+    Index of a batch or course live class chat transcript. The messages are kept in default_storage as NDJSON,
+    gzip-compressed in independent chunks of CHUNK_SIZE messages, and `chunk_offsets` holds the byte offset of every
+    chunk (plus the end of the file), so a page of messages only reads and decompresses the chunks it covers.
+    Concrete models add the `live_class` foreign key.
+    """
+
+    class Channel(models.TextChoices):
+        PUBLIC = 'public', 'Public'
+        PRIVATE = 'private', 'Private'
+
+    CHUNK_SIZE = 200
+    TEXT_FIELDS = ('message', 'text')  # Where the MeritHub payload may carry the message text
+
+    channel = models.CharField(max_length=10, choices=Channel.choices, verbose_name="Channel")
+    transcript = models.FileField(upload_to='live_class_chats/', verbose_name="Transcript")
+    message_count = models.PositiveIntegerField(default=0, verbose_name="Message Count")
+    chunk_offsets = models.JSONField(default=list, verbose_name="Chunk Offsets")
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.live_class} - {self.get_channel_display()} chat"
+
+    @classmethod
+    def store(cls, live_class, channel, messages):
+        """Write the transcript of a channel, replacing any earlier one."""
+        buffer = io.BytesIO()
+        offsets = [0]
+        for start in range(0, len(messages), cls.CHUNK_SIZE):
+            lines = ''.join(json.dumps(message) + '\n' for message in messages[start:start + cls.CHUNK_SIZE])
+            buffer.write(gzip.compress(lines.encode()))
+            offsets.append(buffer.tell())
+
+        chat = cls.objects.filter(live_class=live_class, channel=channel).first()
+        if chat is None:
+            chat = cls(live_class=live_class, channel=channel)
+        if chat.transcript:
+            chat.transcript.delete(save=False)
+        name = f'{live_class._meta.app_label}-{live_class.pk}-{channel}.ndjson.gz'
+        chat.transcript.save(name, ContentFile(buffer.getvalue()), save=False)
+        chat.message_count = len(messages)
+        chat.chunk_offsets = offsets
+        chat.save()
+        return chat
+
+    def read_chunks(self, first=0):
+        """Yield the messages of every chunk from `first` on, one list per chunk."""
+        with self.transcript.open('rb') as transcript:
+            for start, end in zip(self.chunk_offsets[first:], self.chunk_offsets[first + 1:]):
+                transcript.seek(start)
+                lines = gzip.decompress(transcript.read(end - start)).decode().splitlines()
+                yield [json.loads(line) for line in lines]
+
+    def get_page(self, page=1, page_size=50, query=None):
+        """
+        Return the messages of `page` and whether more follow. Without a query only the chunks holding the page are
+        read; a search reads chunks until the page is full.
+        """
+        skip = (page - 1) * page_size
+        if query:
+            query = query.lower()
+            matches = (
+                message for chunk in self.read_chunks() for message in chunk
+                if query in self.message_text(message).lower()
+            )
+        else:
+            first = skip // self.CHUNK_SIZE
+            matches = (message for chunk in self.read_chunks(first) for message in chunk)
+            skip -= first * self.CHUNK_SIZE
+        messages = list(itertools.islice(matches, skip, skip + page_size + 1))
+        return messages[:page_size], len(messages) > page_size
+
+    @classmethod
+    def message_text(cls, message):
+        return next((str(message[field]) for field in cls.TEXT_FIELDS if message.get(field)), '')
+
+
+class AbstractContentCounters(models.Model):
+    """
+    Denormalized file counters of a content owner (course, batch, free resource) or of a folder subtree.
+    """
+    COUNTER_FIELDS = CONTENT_COUNTER_FIELDS
+
+    file_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total Files")
+    video_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Videos")
+    image_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Images")
+    document_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Documents")
+    total_bytes = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Total Bytes")
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # The counters only change through F() updates, an ordinary save must not write stale copies back
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.COUNTER_FIELDS]
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def file_counter_changes(file, sign=1):
+        """
+        Expressions adding (sign=1) or removing (sign=-1) one file to the counters.
+        """
+        kind_field = f"{get_file_kind(file.url.name)}_count"
+        return {
+            'file_count': F('file_count') + sign,
+            kind_field: F(kind_field) + sign,
+            'total_bytes': F('total_bytes') + sign * (file.size or 0),
+        }
+
+
+class AbstractFolder(AbstractContentCounters, TimeStampedModel):
+    """
+    Folder tree node with a materialized path.
+
+    `path` holds the ids of every ancestor and of the folder itself, e.g. "4/17/52/", so ancestors, descendants and
+    subtree files are all read with a single indexed query whatever the depth of the tree. Concrete models must
+    define a `parent` foreign key to themselves, a `files` reverse relation and name their owner foreign key in
+    `owner_field`. The counters of a folder cover its whole subtree.
+
+    `version` changes whenever the folder's listing (its subfolders, files or breadcrumb) changes, so it can be
+    used as an ETag and as a cache key for the folder-structure response.
+    """
+    owner_field = None
+
+    path = models.CharField(max_length=255, default='', db_index=True, editable=False)
+    version = models.UUIDField(default=uuid.uuid4, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        parent_path = self.parent.path if self.parent_id else ''
+        path = f"{parent_path}{self.pk}/"
+        old_parent_ids = []
+        if path != self.path:
+            old_path = self.path
+            type(self).objects.filter(pk=self.pk).update(path=path)
+            if old_path:
+                # The folder was moved, re-root its whole subtree in one statement
+                type(self).objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(path), Substr('path', len(old_path) + 1))
+                )
+                old_parent_ids = self.ancestor_ids[-2:-1]
+            self.path = path
+
+        # Breadcrumbs below the folder show its title, a plain reorder only changes the parent's listing
+        update_fields = kwargs.get('update_fields')
+        subtree = update_fields is None or not {'title', 'parent'}.isdisjoint(update_fields)
+        self.touch_folders(self.parent_id, *old_parent_ids, subtree_of=self if subtree else None)
+
+    @classmethod
+    def touch_folders(cls, *folder_ids, subtree_of=None):
+        """
+        Give the folders a new version stamp, together with the whole subtree of `subtree_of` if given.
+        """
+        version = uuid.uuid4()
+        query = Q(id__in=[pk for pk in folder_ids if pk is not None])
+        if subtree_of is not None:
+            query |= Q(path__startswith=subtree_of.path)
+            subtree_of.version = version
+        cls.objects.filter(query).update(version=version)
+
+    def touch(self):
+        """
+        Mark the folder's listing as changed, for updates that bypass save() such as bulk reorders.
+        """
+        self.version = uuid.uuid4()
+        type(self).objects.filter(pk=self.pk).update(version=self.version)
+
+    @property
+    def etag(self):
+        return f'"{self.pk}-{self.version.hex}"'
+
+    @property
+    def ancestor_ids(self):
+        return [int(pk) for pk in self.path.split('/') if pk]
+
+    def get_breadcrumb(self):
+        ids = self.ancestor_ids
+        titles = dict(type(self).objects.filter(id__in=ids).values_list('id', 'title'))
+        return [{'id': pk, 'title': titles[pk]} for pk in ids if pk in titles]
+
+    def get_descendants(self, include_self=False):
+        descendants = type(self).objects.filter(path__startswith=self.path)
+        if not include_self:
+            descendants = descendants.exclude(pk=self.pk)
+        return descendants
+
+    def get_subtree_files(self):
+        return self.files.model.objects.filter(folder__path__startswith=self.path)
+
+    def _update_counters(self, folder_ids, changes):
+        type(self).objects.filter(id__in=folder_ids).update(**changes)
+        owner = self._meta.get_field(self.owner_field)
+        owner.related_model.objects.filter(pk=getattr(self, owner.attname)).update(**changes)
+
+    def apply_file_counters(self, file, sign=1):
+        """
+        Add (sign=1) or remove (sign=-1) a file of this folder to the counters of the folder, of every ancestor and
+        of the owner. Call inside the transaction that creates, moves or deletes the file.
+        """
+        self._update_counters(self.ancestor_ids, self.file_counter_changes(file, sign))
+
+    def delete_subtree(self):
+        """
+        Delete the folder with all its subfolders and files. Every node of the subtree is collected with one
+        path query instead of walking the tree level by level.
+        """
+        with transaction.atomic():
+            totals = type(self).objects.select_for_update().filter(pk=self.pk).values(*self.COUNTER_FIELDS).get()
+            self._update_counters(self.ancestor_ids[:-1],
+                                  {field: F(field) - totals[field] for field in self.COUNTER_FIELDS})
+            self.touch_folders(self.parent_id)
+            return self.get_descendants(include_self=True).delete()
+
+    def _next_child_order(self):
+        last = max(self.folders.aggregate(last=Max('order'))['last'] or 0,
+                   self.files.aggregate(last=Max('order'))['last'] or 0)
+        return last + ORDER_GAP
+
+    def _bulk_create_folders(self, levels, new_ids):
+        """
+        Insert new folders below this one with one bulk_create per tree level.
+
+        `levels` maps a depth to node dicts with an 'id' key, the 'parent_id' key of their parent, 'title', 'order'
+        and the counter fields. `new_ids` maps keys to database ids; it must hold the key standing for this folder
+        and is extended with the created folders. bulk_create skips save(), so paths are written here.
+        """
+        folder_model = type(self)
+        owner_attname = self._meta.get_field(self.owner_field).attname
+        owner_id = getattr(self, owner_attname)
+        paths = {self.pk: self.path}
+        for depth in sorted(levels):
+            folders = folder_model.objects.bulk_create([
+                folder_model(parent_id=new_ids[node['parent_id']], title=node['title'], order=node['order'],
+                             **{owner_attname: owner_id}, **{field: node[field] for field in self.COUNTER_FIELDS})
+                for node in levels[depth]
+            ])
+            for node, folder in zip(levels[depth], folders):
+                folder.path = f"{paths[folder.parent_id]}{folder.pk}/"
+                new_ids[node['id']] = folder.pk
+                paths[folder.pk] = folder.path
+            folder_model.objects.bulk_update(folders, ['path'])
+
+    def clone_subtree(self, source):
+        """
+        Copy `source`, a folder of any content app, with all its subfolders and files into this folder and return
+        the copy of `source`.
+
+        Folders are inserted with one bulk_create per tree level and files with batched bulk_creates. The copies
+        reference the stored uploads of the originals, so nothing is uploaded again. bulk_create skips save(), so
+        paths, counters and version stamps are maintained here.
+        """
+        file_model = self.files.model
+
+        with transaction.atomic():
+            levels = defaultdict(list)
+            nodes = source.get_descendants(include_self=True).values(
+                'id', 'parent_id', 'path', 'title', 'order', *self.COUNTER_FIELDS)
+            for node in nodes:
+                levels[node['path'].count('/')].append(node)
+            top = levels[min(levels)][0]
+
+            # The copy goes after everything already in the target folder
+            top['order'] = self._next_child_order()
+            new_ids = {top['parent_id']: self.pk}
+            self._bulk_create_folders(levels, new_ids)
+
+            files = source.get_subtree_files().values('folder_id', 'title', 'url', 'is_locked', 'order', 'size')
+            file_model.objects.bulk_create(
+                (file_model(folder_id=new_ids[file['folder_id']], title=file['title'], url=file['url'],
+                            is_locked=file['is_locked'], order=file['order'], size=file['size'])
+                 for file in files.iterator(chunk_size=FILE_BATCH_SIZE)),
+                batch_size=FILE_BATCH_SIZE,
+            )
+
+            self._update_counters(self.ancestor_ids, {field: F(field) + top[field] for field in self.COUNTER_FIELDS})
+            self.touch()
+        return type(self).objects.get(pk=new_ids[top['id']])
+
+    def import_zip(self, archive):
+        """
+        Unpack a ZIP archive into this folder: every directory becomes a folder and every other entry a file.
+
+        Entries are streamed one at a time from the archive into the storage of the file field, so neither the
+        archive nor an entry is ever held in memory. Folders are inserted per tree level and files in batches of
+        FILE_BATCH_SIZE. Hidden entries and macOS resource forks are skipped. Returns the number of folders and
+        files created.
+        """
+        file_model = self.files.model
+        url_field = file_model._meta.get_field('url')
+
+        with zipfile.ZipFile(archive) as zip_file, transaction.atomic():
+            # Lay out the tree from the central directory first, counters included, before reading any entry
+            directories, entries = {}, []
+            next_order = defaultdict(int)
+            next_order[None] = self._next_child_order() - ORDER_GAP
+            totals = dict.fromkeys(self.COUNTER_FIELDS, 0)
+            for info in zip_file.infolist():
+                parts = [part for part in info.filename.replace('\\', '/').split('/') if part]
+                if not parts or parts[0] == '__MACOSX' or any(part.startswith('.') for part in parts):
+                    continue
+                directory_parts = parts if info.is_dir() else parts[:-1]
+                for depth in range(1, len(directory_parts) + 1):
+                    key = '/'.join(directory_parts[:depth])
+                    if key not in directories:
+                        parent_key = '/'.join(directory_parts[:depth - 1]) or None
+                        next_order[parent_key] += ORDER_GAP
+                        directories[key] = {'id': key, 'parent_id': parent_key, 'title': directory_parts[depth - 1],
+                                            'order': next_order[parent_key], 'depth': depth,
+                                            **dict.fromkeys(self.COUNTER_FIELDS, 0)}
+                if info.is_dir():
+                    continue
+
+                directory = '/'.join(directory_parts) or None
+                next_order[directory] += ORDER_GAP
+                entries.append((info, directory, parts[-1], next_order[directory]))
+                kind_field = f"{get_file_kind(parts[-1])}_count"
+                for counters in [totals] + [directories['/'.join(directory_parts[:depth])]
+                                            for depth in range(1, len(directory_parts) + 1)]:
+                    counters['file_count'] += 1
+                    counters[kind_field] += 1
+                    counters['total_bytes'] += info.file_size
+
+            levels = defaultdict(list)
+            for node in directories.values():
+                levels[node['depth']].append(node)
+            new_ids = {None: self.pk}
+            self._bulk_create_folders(levels, new_ids)
+
+            files = []
+            for info, directory, title, order in entries:
+                with zip_file.open(info) as stream:
+                    content = DjangoFile(stream, name=title)
+                    content.size = info.file_size  # Avoids seeking through the compressed stream
+                    name = url_field.storage.save(url_field.generate_filename(None, title), content)
+                files.append(file_model(folder_id=new_ids[directory], title=title, url=name, order=order,
+                                        size=info.file_size))
+                if len(files) == FILE_BATCH_SIZE:
+                    file_model.objects.bulk_create(files)
+                    files = []
+            file_model.objects.bulk_create(files)
+
+            self._update_counters(self.ancestor_ids, {field: F(field) + totals[field] for field in self.COUNTER_FIELDS})
+            self.touch()
+        return {'folders': len(directories), 'files': len(entries)}
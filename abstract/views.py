@@ -1,6 +1,47 @@
+import csv
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from apps.user.models import Roles
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Reverse relation from an instructor to the owners assigned to them, by owner model
+INSTRUCTOR_ASSIGNMENTS = {
+    'batch.batch': ('assign_batches', 'batch_id'),
+    'course.course': ('assign_courses', 'course_id'),
+}
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes, so every row can be streamed as it is written."""
+
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, header, rows):
+    """Stream `rows`, an iterable of sequences, as a CSV download without holding them in memory."""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 
 class CustomResponseMixin(viewsets.ModelViewSet):
     list_serializer_class = None
@@ -59,4 +100,72 @@ class ReadOnlyCustomResponseMixin(viewsets.ReadOnlyModelViewSet):
         return self.serializer_class
 
 
+def get_manageable_owners(owner_model, user):
+    """
+    Batches, courses or free resources whose content `user` may edit. Admins and managers get every owner.
+    Instructors get the batches and courses assigned to them, as in the owner viewsets, and every free resource.
+    Students get none.
+    """
+    queryset = owner_model.objects.all()
+    if user.is_superuser or user.role in (Roles.ADMIN, Roles.MANAGER):
+        return queryset
+    if user.role != Roles.INSTRUCTOR:
+        return queryset.none()
+    assignment = INSTRUCTOR_ASSIGNMENTS.get(owner_model._meta.label_lower)
+    if assignment is None:
+        return queryset
+    relation, owner_id_field = assignment
+    return queryset.filter(id__in=getattr(user, relation).values(owner_id_field))
+
+
+def get_clone_source(user, source_type, folder_id):
+    """
+    Fetch the source folder of a clone-content request. It must belong to an owner `user` manages, so content can
+    only be copied out of the batches, courses and free resources the user could edit anyway.
+    """
+    folder_model = apps.get_model(source_type, 'Folder')
+    owner_field = folder_model.owner_field
+    owners = get_manageable_owners(folder_model._meta.get_field(owner_field).related_model, user)
+    return get_object_or_404(folder_model, id=folder_id, **{f'{owner_field}__in': owners})
+
+
+class FolderStructureCacheMixin:
+    """
+    Conditional GET and server side caching for folder listings.
+
+    Both are keyed by the folder's version stamp, which changes with every edit of the listing, so a client holding
+    the current ETag gets a 304 and any other client is served from the cache until the folder changes. `variant`
+    tells apart several cached representations of the same folder, e.g. pages of the listing.
+    """
+
+    def folder_structure_response(self, request, folder, build_data, variant=''):
+        etag = folder.etag
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache_key = f'folder-structure:{folder._meta.label_lower}:{folder.pk}:{folder.version.hex}:{variant}'
+            data = cache.get(cache_key)
+            if data is None:
+                data = build_data()
+                cache.set(cache_key, data, settings.FOLDER_STRUCTURE_CACHE_TIMEOUT)
+            response = Response(data, status=status.HTTP_200_OK)
+        response['ETag'] = etag
+        # Clients may keep the listing but have to revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CSVExportMixin:
+    """
+    Adds an `export` list action streaming the filtered queryset as CSV, with the filters of the list action.
+    `export_fields` maps the column names to values() lookups. Rows are read through a server side cursor,
+    EXPORT_CHUNK_SIZE at a time.
+    """
+    export_fields = None
+    export_filename = 'export.csv'
 
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values_list(*self.export_fields.values()).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        return csv_response(self.export_filename, list(self.export_fields), rows)
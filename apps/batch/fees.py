@@ -0,0 +1,33 @@
+from django.utils import timezone
+
+from .models import BatchPurchaseOrder, InstallmentDue
+
+
+def get_fee_ledger(batch=None, student=None, start=None, end=None):
+    """
+    Paid purchase orders, and the pending installments of approved enrollments split into unpaid (past due) and
+    upcoming ones, as querysets. `batch` and `student` are ids, [start, end) limits the payment date of paid orders
+    and the due date of installments. Installments are read from InstallmentDue, so every list is an index range
+    scan that can be counted and sliced in the database.
+    """
+    paid = BatchPurchaseOrder.objects.filter(is_paid=True)
+    # Unapproving an enrollment keeps its installments, they only come back if it is approved again
+    dues = InstallmentDue.objects.filter(status=InstallmentDue.Status.PENDING, enrollment__is_approved=True)
+    if batch is not None:
+        paid = paid.filter(batch_id=batch)
+        dues = dues.filter(batch_id=batch)
+    if student is not None:
+        paid = paid.filter(student_id=student)
+        dues = dues.filter(student_id=student)
+    if start:
+        paid = paid.filter(payment_date__gte=start)
+        dues = dues.filter(due_date__gte=start)
+    if end:
+        paid = paid.filter(payment_date__lt=end)
+        dues = dues.filter(due_date__lt=end)
+    now = timezone.now()
+    return {
+        'paid_fees': paid.order_by('-payment_date', '-id'),
+        'unpaid_fees': dues.filter(due_date__lt=now),
+        'upcoming_fees': dues.filter(due_date__gte=now),
+    }
@@ -0,0 +1,107 @@
+import logging
+from datetime import datetime
+
+from constance import config
+from django.utils import timezone
+
+from apps.course.models import Course, CourseLiveClass, CoursePurchaseOrder, CourseAttendance
+from config.jobs import enqueue
+from config.live_video import MeritHubAPI
+from .models import Batch, Enrollment, LiveClass, Attendance, LiveClassJob
+
+logger = logging.getLogger(__name__)
+
+
+def _batch_class(job):
+    batch = Batch.objects.get(pk=job.owner_id)
+    enrollments = Enrollment.objects.filter(batch=batch, is_approved=True).select_related('student')
+    return LiveClass, Attendance, {'batch': batch}, [enrollment.student for enrollment in enrollments]
+
+
+def _course_class(job):
+    course = Course.objects.get(pk=job.owner_id)
+    orders = CoursePurchaseOrder.objects.filter(course=course, is_paid=True).select_related('student')
+    students = {order.student_id: order.student for order in orders}  # A student may have several orders
+    return CourseLiveClass, CourseAttendance, {'course': course}, list(students.values())
+
+
+OWNER_HANDLERS = {
+    LiveClassJob.OwnerType.BATCH: _batch_class,
+    LiveClassJob.OwnerType.COURSE: _course_class,
+}
+
+
+def schedule_live_class(owner_type, owner_id, class_data, user, occurrences=None, recurrence=''):
+    """
+    Record a live class job for the batch or course and start it once the request commits. With `occurrences`, a
+    list of ISO start times, the job schedules one class per start time.
+    """
+    job = LiveClassJob.objects.create(owner_type=owner_type, owner_id=owner_id, class_data=class_data,
+                                      created_by=user, recurrence=recurrence, occurrences=occurrences or [])
+    enqueue(run_live_class_job, job.pk)
+    return job
+
+
+def occurrence_class_data(class_data, start_time):
+    """Class data of the occurrence of a series starting at `start_time`, keeping the length of the class."""
+    length = datetime.fromisoformat(class_data['endDate']) - datetime.fromisoformat(class_data['startTime'])
+    start = datetime.fromisoformat(start_time)
+    return {**class_data, 'startTime': start.isoformat(), 'endDate': (start + length).isoformat()}
+
+
+def run_live_class_job(job_id):
+    """
+    Schedule the class, or every occurrence of the series, with MeritHub, create the live classes with one
+    bulk_create and register the students once for all of them, reporting progress on the job row as it goes.
+    """
+    # Claimed with a conditional update, so a job resumed by resume_stale_live_class_jobs runs once
+    if not LiveClassJob.objects.filter(pk=job_id, status=LiveClassJob.Status.PENDING).update(
+            status=LiveClassJob.Status.RUNNING, modified=timezone.now()):
+        logger.info("Live class job %s was already started", job_id)
+        return
+    job = LiveClassJob.objects.get(pk=job_id)
+    api = MeritHubAPI(config.MERITHUB_CLIENT_ID, config.MERITHUB_CLIENT_SECRET)
+    classes = [occurrence_class_data(job.class_data, start) for start in job.occurrences] or [job.class_data]
+    try:
+        responses = api.schedule_classes(job.created_by_id, classes)
+        live_class_model, attendance_model, owner, students = OWNER_HANDLERS[job.owner_type](job)
+        job.update_progress(total_students=len(students))
+        live_classes = live_class_model.objects.bulk_create([
+            live_class_model(
+                **owner,
+                title=class_data['title'],
+                class_id=data['classId'],
+                date=class_data['startTime'],
+                host_link=api.generate_url(data['hostLink']),
+                common_host_link=api.generate_url(data['commonLinks']['commonHostLink']),
+                common_moderator_link=api.generate_url(data['commonLinks']['commonModeratorLink']),
+                common_participant_link=api.generate_url(data['commonLinks']['commonParticipantLink'])
+            )
+            for class_data, data in zip(classes, responses)
+        ])
+        job.update_progress(live_class_ids=[live_class.pk for live_class in live_classes])
+        failed = api.register_students_in_classes(live_classes, students, attendance_model,
+                                                  progress=job.update_progress)
+    except Exception as e:
+        logger.exception("Live class job %s failed", job.pk)
+        job.update_progress(status=LiveClassJob.Status.FAILED, error=str(e))
+        return
+    job.update_progress(status=LiveClassJob.Status.SUCCEEDED, failed_students=[user.id for user in failed])
+
+
+def resume_stale_live_class_jobs(older_than):
+    """
+    Recover the jobs lost with the worker pool, e.g. on a restart. Jobs still pending after `older_than` never
+    reached MeritHub and are run now. Jobs that made no progress for as long while running are marked failed, since
+    running them again could schedule their classes twice. Returns the numbers of resumed and failed jobs.
+    """
+    now = timezone.now()
+    stale = LiveClassJob.objects.filter(modified__lt=now - older_than)
+    failed = stale.filter(status=LiveClassJob.Status.RUNNING).update(
+        status=LiveClassJob.Status.FAILED, modified=now,
+        error="Interrupted before it finished, check the scheduled classes before trying again.")
+    resumed = 0
+    for job_id in stale.filter(status=LiveClassJob.Status.PENDING).order_by('id').values_list('id', flat=True):
+        run_live_class_job(job_id)
+        resumed += 1
+    return resumed, failed
@@ -0,0 +1,103 @@
+import time
+from datetime import date
+
+from constance.test import override_config
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.batch.models import Batch, Enrollment, LiveClassJob, Subject
+from apps.batch.views import CreateLiveClassView
+from config.live_video import MeritHubAPI
+from config.merithub_stub import MeritHubStub
+
+User = get_user_model()
+
+CLIENT_ID = 'benchmark-client'
+CLIENT_SECRET = 'benchmark-secret-key-of-32-bytes!'
+SEED_NAME = 'Live Class Benchmark'
+SEED_EMAIL_PREFIX = 'live-class-benchmark'
+
+
+class Command(BaseCommand):
+    help = ("Measure CreateLiveClassView end to end, background job included, against a local stand-in for MeritHub: "
+            "wall time, database queries and remote calls. Fails when a --max-* limit is exceeded, so scaling "
+            "regressions can be caught in CI. The seeded rows are removed afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help="Number of enrolled students")
+        parser.add_argument('--latency', type=float, default=20, help="Stand-in server latency per call in ms")
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Share of stand-in API calls answered with 503, between 0 and 1")
+        parser.add_argument('--seed', type=int, default=None, help="Seed for the failed calls")
+        parser.add_argument('--max-queries', type=int, default=None, help="Fail above this many queries")
+        parser.add_argument('--max-remote-calls', type=int, default=None, help="Fail above this many remote calls")
+        parser.add_argument('--max-seconds', type=float, default=None, help="Fail above this wall time")
+
+    def handle(self, *args, **options):
+        stub = MeritHubStub(latency=options['latency'] / 1000, error_rate=options['error_rate'], seed=options['seed'])
+        # The job runs on commit, so the seeded rows are committed and removed by hand
+        with stub, override_settings(JOBS_RUN_EAGERLY=True, **stub.settings()), \
+                override_config(MERITHUB_CLIENT_ID=CLIENT_ID, MERITHUB_CLIENT_SECRET=CLIENT_SECRET):
+            self.clean_up()
+            try:
+                instructor, batch = self.seed(options['students'])
+                job, queries, elapsed = self.create_live_class(instructor, batch)
+            finally:
+                self.clean_up()
+
+        self.stdout.write(f"job {job.status}: {job.links_generated} of {job.total_students} students linked, "
+                          f"{len(job.failed_students)} failed")
+        self.stdout.write(f"wall time: {elapsed:.2f}s")
+        self.stdout.write(f"queries: {len(queries)}")
+        calls = ', '.join(f"{endpoint} {count}" for endpoint, count in sorted(stub.calls.items()))
+        self.stdout.write(f"remote calls: {stub.remote_calls} ({calls})")
+
+        exceeded = [
+            f"{label} {value} above {limit}"
+            for label, value, limit in (('queries', len(queries), options['max_queries']),
+                                        ('remote calls', stub.remote_calls, options['max_remote_calls']),
+                                        ('seconds', round(elapsed, 2), options['max_seconds']))
+            if limit is not None and value > limit
+        ]
+        if exceeded:
+            raise CommandError(f"Live class creation exceeded its budget: {', '.join(exceeded)}")
+
+    def seed(self, count):
+        instructor = User.objects.create_user(email=f'{SEED_EMAIL_PREFIX}@example.com', phone_number='+9169999999999',
+                                              full_name='Benchmark Instructor')
+        subject = Subject.objects.create(name=SEED_NAME)
+        batch = Batch.objects.create(name=SEED_NAME, start_date=date.today(), subject=subject,
+                                     created_by=instructor)
+        students = User.objects.bulk_create(
+            User(email=f'{SEED_EMAIL_PREFIX}-{i}@example.com', phone_number=f'+9169999{i:05d}',
+                 full_name=f'Benchmark Student {i}')
+            for i in range(count)
+        )
+        Enrollment.objects.bulk_create(Enrollment(batch=batch, student=student, is_approved=True)
+                                       for student in students)
+        return instructor, batch
+
+    def clean_up(self):
+        Batch.objects.filter(name=SEED_NAME).delete()
+        Subject.objects.filter(name=SEED_NAME).delete()
+        User.objects.filter(email__startswith=SEED_EMAIL_PREFIX).delete()
+
+    def create_live_class(self, instructor, batch):
+        # Start without a token, like a fresh worker
+        MeritHubAPI._local_tokens.pop(CLIENT_ID, None)
+        cache.delete(MeritHubAPI(CLIENT_ID, CLIENT_SECRET).token_cache_key)
+
+        request = APIRequestFactory().post('/create-live-class/', {'batch': batch.pk, 'title': 'Benchmark Class'},
+                                           format='json')
+        force_authenticate(request, user=instructor)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = CreateLiveClassView.as_view()(request)
+            elapsed = time.perf_counter() - started
+        if response.status_code != 202:
+            raise CommandError(f"Live class was not scheduled: {response.data}")
+        return LiveClassJob.objects.get(pk=response.data['job_id']), queries, elapsed
@@ -0,0 +1,43 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from config.live_video import MeritHubAPI
+from config.merithub_stub import MeritHubStub
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Measure MeritHub participant provisioning, one call at a time and through the worker pool, "
+            "against a local stand-in server. Nothing is kept in the database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help="Number of students to provision")
+        parser.add_argument('--latency', type=float, default=50, help="Stand-in server latency per call in ms")
+        parser.add_argument('--workers', type=int, default=MeritHubAPI.MAX_WORKERS, help="Size of the worker pool")
+
+    def handle(self, *args, **options):
+        with MeritHubStub(latency=options['latency'] / 1000) as stub, transaction.atomic():
+            users = User.objects.bulk_create(
+                User(email=f'merithub-benchmark-{i}@example.com', phone_number=f'+9170000{i:05d}',
+                     full_name=f'Benchmark Student {i}')
+                for i in range(options['students'])
+            )
+
+            for label, workers in (('sequential', 1), ('pooled', options['workers'])):
+                for user in users:
+                    user.merit_user_id = None
+                api = stub.configure(MeritHubAPI('benchmark-client', 'benchmark-secret-key-of-32-bytes!'))
+                api.MAX_WORKERS = workers
+
+                started = time.perf_counter()
+                failed = api.provision_users(users)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{label:>10}: {len(users) - len(failed)} students provisioned with {workers} "
+                                  f"worker(s) in {elapsed:.2f}s")
+
+            # Leave the database as it was
+            transaction.set_rollback(True)
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.batch.models import Folder as BatchFolder, File as BatchFile
+from apps.course.models import Folder as CourseFolder, File as CourseFile
+from apps.free_resource.models import Folder as ResourceFolder, File as ResourceFile
+from apps.utils.functions import rebuild_content_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the file counters of batches, courses, free resources and their folders, and report any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report drift, do not write anything")
+        parser.add_argument('--fetch-sizes', action='store_true',
+                            help="Read the size of files without a recorded size from the storage backend")
+
+    def handle(self, *args, **options):
+        for folder_model, file_model in [(BatchFolder, BatchFile), (CourseFolder, CourseFile),
+                                         (ResourceFolder, ResourceFile)]:
+            with transaction.atomic():
+                self.rebuild(folder_model, file_model, options['dry_run'], options['fetch_sizes'])
+
+    def rebuild(self, folder_model, file_model, dry_run, fetch_sizes):
+        owner_field = folder_model._meta.get_field(folder_model.owner_field)
+        owner_model = owner_field.related_model
+        label = owner_model._meta.verbose_name_plural
+
+        if fetch_sizes and not dry_run:
+            self.fetch_sizes(file_model)
+
+        drifted_owners, drifted_folders = rebuild_content_counters(owner_model, folder_model, file_model,
+                                                                   owner_field.attname, dry_run)
+        for owner in drifted_owners:
+            self.stdout.write(self.style.WARNING(f"Counters of {owner_model._meta.verbose_name} {owner.id} drifted"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {len(drifted_owners)} of {owner_model.objects.count()} owners and {len(drifted_folders)} of "
+            f"{folder_model.objects.count()} folders {'have drifted' if dry_run else 'rebuilt'}"
+        ))
+
+    def fetch_sizes(self, file_model):
+        files = list(file_model.objects.filter(size=0).only('id', 'url', 'size'))
+        for file in files:
+            try:
+                file.size = file.url.size
+            except OSError:
+                self.stdout.write(self.style.ERROR(f"Missing stored file for {file_model.__name__} {file.id}"))
+        file_model.objects.bulk_update(files, ['size'], batch_size=1000)
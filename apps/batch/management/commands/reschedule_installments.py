@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.batch.models import Batch, InstallmentDue
+
+
+class Command(BaseCommand):
+    help = ("Rewrite the pending installments of approved enrollments from the current fee structure of their batch, "
+            "e.g. after fee structures were changed outside of save()")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, action='append', dest='batches',
+                            help="Only reschedule this batch, can be repeated")
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.all()
+        if options['batches']:
+            batches = batches.filter(pk__in=options['batches'])
+        batch_ids = list(batches.values_list('id', flat=True))
+        InstallmentDue.reschedule(batch_ids)
+        pending = InstallmentDue.objects.filter(batch__in=batch_ids, status=InstallmentDue.Status.PENDING).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(batch_ids)} batch(es) rescheduled, {pending} pending installment(s)"))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.batch.jobs import resume_stale_live_class_jobs
+
+
+class Command(BaseCommand):
+    help = ("Run the live class jobs left pending by a restart, and mark the ones interrupted while running as "
+            "failed")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=15,
+                            help="Minutes without progress after which a job counts as lost")
+
+    def handle(self, *args, **options):
+        resumed, failed = resume_stale_live_class_jobs(timedelta(minutes=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(f"{resumed} live class job(s) resumed, {failed} marked failed"))
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+def backfill_folder_paths(apps, schema_editor):
+    Folder = apps.get_model('batch', 'Folder')
+    parents = dict(Folder.objects.values_list('id', 'parent_id'))
+    paths = {}
+
+    def build_path(folder_id):
+        # Walk up until a folder with a known path (or a root) is reached, then fill in on the way down
+        chain = []
+        while folder_id is not None and folder_id not in paths:
+            chain.append(folder_id)
+            folder_id = parents.get(folder_id)
+        path = paths.get(folder_id, '')
+        for pk in reversed(chain):
+            path = f"{path}{pk}/"
+            paths[pk] = path
+        return paths[chain[0]] if chain else path
+
+    folders = list(Folder.objects.only('id'))
+    for folder in folders:
+        folder.path = build_path(folder.id)
+    Folder.objects.bulk_update(folders, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0022_batchreview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='path',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_folder_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:22
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0025_spread_content_order'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='version',
+            field=models.UUIDField(default=uuid.uuid4, editable=False),
+        ),
+    ]
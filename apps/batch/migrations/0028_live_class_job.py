@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:39
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0027_attendance_per_student'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveClassJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('owner_type', models.CharField(choices=[('batch', 'Batch'), ('course', 'Course')], max_length=10, verbose_name='Owner Type')),
+                ('owner_id', models.PositiveIntegerField(verbose_name='Batch or Course ID')),
+                ('class_data', models.JSONField(verbose_name='MeritHub Class Data')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('live_class_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='Live Class ID')),
+                ('total_students', models.PositiveIntegerField(default=0, verbose_name='Total Students')),
+                ('provisioned_students', models.PositiveIntegerField(default=0, verbose_name='Provisioned Students')),
+                ('links_generated', models.PositiveIntegerField(default=0, verbose_name='Links Generated')),
+                ('failed_students', models.JSONField(default=list, verbose_name='Failed Student IDs')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='live_class_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Live Class Job',
+                'verbose_name_plural': 'Live Class Jobs',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
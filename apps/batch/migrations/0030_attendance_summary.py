@@ -0,0 +1,72 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:46
+
+from decimal import Decimal
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def _backfill_attendance_summaries(apps, schema_editor):
+    """Count the classes that already have attendance, the webhook keeps the summaries up to date from now on."""
+    LiveClass = apps.get_model('batch', 'LiveClass')
+    Attendance = apps.get_model('batch', 'Attendance')
+    Summary = apps.get_model('batch', 'AttendanceSummary')
+    LiveClass.objects.filter(attendances__attended=True).update(attendance_recorded=True)
+    rows = (
+        Attendance.objects.filter(live_class__attendance_recorded=True)
+        .values('student_id', 'live_class__batch_id')
+        .annotate(held=Count('live_class', distinct=True), attended=Count('live_class', distinct=True,
+                                                                           filter=Q(attended=True)),
+                  minutes=Sum(Coalesce('total_time', 0) / 60))
+    )
+    summaries = []
+    for row in rows:
+        percentage = Decimal(row['attended'] * 100) / row['held']
+        summaries.append(Summary(student_id=row['student_id'], batch_id=row['live_class__batch_id'],
+                                 classes_held=row['held'], classes_attended=row['attended'],
+                                 total_minutes=row['minutes'] or 0, percentage=percentage.quantize(Decimal('0.01'))))
+    Summary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0029_live_class_files_and_chats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveclass',
+            name='attendance_recorded',
+            field=models.BooleanField(default=False, verbose_name='Attendance Recorded'),
+        ),
+        migrations.CreateModel(
+            name='AttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('classes_held', models.PositiveIntegerField(default=0, verbose_name='Classes Held')),
+                ('classes_attended', models.PositiveIntegerField(default=0, verbose_name='Classes Attended')),
+                ('total_minutes', models.PositiveIntegerField(default=0, verbose_name='Total Minutes')),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5, verbose_name='Attendance %')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_summaries', to='batch.batch')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(class)s_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Attendance Summary',
+                'verbose_name_plural': 'Attendance Summaries',
+                'indexes': [models.Index(fields=['batch', 'percentage'], name='batch_attendance_pct_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='attendancesummary',
+            constraint=models.UniqueConstraint(fields=('batch', 'student'), name='unique_batch_attendance_summary'),
+        ),
+        migrations.RunPython(_backfill_attendance_summaries, migrations.RunPython.noop),
+    ]
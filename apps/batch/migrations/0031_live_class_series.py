@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:48
+
+from django.db import migrations, models
+
+
+def _live_class_id_to_list(apps, schema_editor):
+    LiveClassJob = apps.get_model('batch', 'LiveClassJob')
+    jobs = list(LiveClassJob.objects.filter(live_class_id__isnull=False))
+    for job in jobs:
+        job.live_class_ids = [job.live_class_id]
+    LiveClassJob.objects.bulk_update(jobs, ['live_class_ids'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0030_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveclassjob',
+            name='live_class_ids',
+            field=models.JSONField(default=list, verbose_name='Live Class IDs'),
+        ),
+        migrations.RunPython(_live_class_id_to_list, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='liveclassjob',
+            name='live_class_id',
+        ),
+        migrations.AddField(
+            model_name='liveclassjob',
+            name='occurrences',
+            field=models.JSONField(default=list, verbose_name='Occurrence Start Times'),
+        ),
+        migrations.AddField(
+            model_name='liveclassjob',
+            name='recurrence',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Recurrence Rule'),
+        ),
+    ]
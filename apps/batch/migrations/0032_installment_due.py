@@ -0,0 +1,74 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:56
+
+from datetime import timedelta
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import migrations, models
+
+
+def _schedule_approved_enrollments(apps, schema_editor):
+    """Write the installments of the enrollments approved so far, Enrollment.save schedules new ones."""
+    Enrollment = apps.get_model('batch', 'Enrollment')
+    BatchPurchaseOrder = apps.get_model('batch', 'BatchPurchaseOrder')
+    InstallmentDue = apps.get_model('batch', 'InstallmentDue')
+    paid_orders = {(order.student_id, order.batch_id, order.installment_number): order.pk
+                   for order in BatchPurchaseOrder.objects.filter(is_paid=True)}
+    enrollments = Enrollment.objects.filter(is_approved=True, batch_joined_date__isnull=False,
+                                            batch__fee_structure__isnull=False).select_related('batch__fee_structure')
+    dues = []
+    for enrollment in enrollments.iterator(chunk_size=1000):
+        fee_structure = enrollment.batch.fee_structure
+        interval = fee_structure.number_of_values or 1
+        if fee_structure.frequency == 'weekly':
+            step = timedelta(weeks=interval)
+        else:
+            step = relativedelta(months=interval if fee_structure.frequency == 'monthly' else 1)
+        for index in range(fee_structure.installments):
+            order_id = paid_orders.get((enrollment.student_id, enrollment.batch_id, index + 1))
+            dues.append(InstallmentDue(enrollment_id=enrollment.pk, student_id=enrollment.student_id,
+                                       batch_id=enrollment.batch_id, installment_number=index + 1,
+                                       amount=fee_structure.fee_amount,
+                                       due_date=enrollment.batch_joined_date + step * index,
+                                       purchase_order_id=order_id, status='paid' if order_id else 'pending'))
+    InstallmentDue.objects.bulk_create(dues, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('batch', '0031_live_class_series'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstallmentDue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('installment_number', models.PositiveIntegerField(verbose_name='Installment Number')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Amount')),
+                ('due_date', models.DateTimeField(verbose_name='Due Date')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid')], default='pending', max_length=10, verbose_name='Status')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_dues', to='batch.batch')),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_dues', to='batch.enrollment')),
+                ('purchase_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='installment_dues', to='batch.batchpurchaseorder')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='installment_dues', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Installment Due',
+                'verbose_name_plural': 'Installment Dues',
+                'ordering': ('due_date', 'id'),
+                'indexes': [models.Index(fields=['due_date', 'status'], name='batch_insta_due_dat_9ba6b8_idx'), models.Index(fields=['student', 'batch'], name='batch_insta_student_c281e7_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='installmentdue',
+            constraint=models.UniqueConstraint(fields=('student', 'batch', 'installment_number'), name='unique_installment_due'),
+        ),
+        migrations.RunPython(_schedule_approved_enrollments, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,18 @@
 import random
 import string
+import uuid
+from datetime import timedelta
 
+from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 
-from abstract.models import AbstractReview
+from abstract.models import AbstractContentCounters, AbstractReview, AbstractFolder, AbstractAttendanceSummary, \
+    AbstractLiveClassChat, AbstractLiveClassFile
+from apps.utils.functions import build_content_tree
 
 User = get_user_model()
 
@@ -47,7 +53,23 @@ class FeeStructure(TimeStampedModel):
     def save(self, **kwargs):
         # Automatically calculate the total amount
         self.total_amount = self.fee_amount * self.installments
+        adding = self._state.adding
         super().save(**kwargs)
+        if not adding:
+            InstallmentDue.reschedule(Batch.objects.filter(fee_structure=self).values('id'))
+            # Outstanding fees are worked out from the structure
+            transaction.on_commit(BatchPurchaseOrder.invalidate_metrics)
+
+    def installment_offsets(self):
+        """Offset of every installment from the joining date, the first installment is due on joining."""
+        interval = self.number_of_values or 1
+        if self.frequency == 'weekly':
+            step = timedelta(weeks=interval)
+        elif self.frequency == 'monthly':
+            step = relativedelta(months=interval)
+        else:
+            step = relativedelta(months=1)  # Default to monthly if frequency is unknown
+        return [step * index for index in range(self.installments)]
 
     class Meta:
         verbose_name = "Fee Structure"
@@ -57,7 +79,7 @@ class FeeStructure(TimeStampedModel):
         return f"{self.structure_name} "
 
 
-class Batch(TimeStampedModel):
+class Batch(TimeStampedModel, AbstractContentCounters):
     name = models.CharField(max_length=255, verbose_name="Batch Name")
     batch_code = models.CharField(max_length=8, default=generate_batch_code, unique=True, verbose_name="Batch Code")
     start_date = models.DateField(verbose_name="Start Date")
@@ -88,6 +110,18 @@ class Batch(TimeStampedModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        fee_structure_changed = (
+            not self._state.adding and (update_fields is None or 'fee_structure' in update_fields)
+            and Batch.objects.filter(pk=self.pk).values_list('fee_structure_id', flat=True).first()
+            != self.fee_structure_id
+        )
+        super().save(*args, **kwargs)
+        if fee_structure_changed:
+            InstallmentDue.reschedule([self.pk])
+            transaction.on_commit(BatchPurchaseOrder.invalidate_metrics)
+
     def is_joining_request_sent(self, user):
         return Enrollment.objects.filter(student=user, batch=self, is_approved=False).exists()
 
@@ -118,7 +152,8 @@ class Batch(TimeStampedModel):
 
     def get_installment_details_for_user(self, user):
         """
-        Retrieves all installment details for the specified student.
+        Retrieves all installment details for the specified student, from the installment schedule of their
+        enrollment (see InstallmentDue) when there is one, otherwise from the fee structure.
 
         Args:
             user (User): The student for whom to retrieve installment details.
@@ -126,97 +161,65 @@ class Batch(TimeStampedModel):
         Returns:
             List[Dict]: A list of dictionaries containing installment details.
         """
-        if not self.fee_structure:
-            return []
+        return self.get_installment_details_for_batches([self], user)[self.pk]
 
-        installments = []
-        for installment_number in range(1, self.fee_structure.installments + 1):
-            try:
-                purchase_order = self.purchase_orders.get(student=user,
-                                                          installment_number=installment_number,
-                                                          is_paid=True)
-                installment_info = {
-                    'installment_number': installment_number,
-                    'amount': float(purchase_order.amount),
-                    'is_paid': purchase_order.is_paid,
-                    'payment_date': purchase_order.payment_date.isoformat() if purchase_order.payment_date else None,
-                    'transaction_id': purchase_order.transaction.transaction_id if purchase_order.transaction else None
-                }
-            except BatchPurchaseOrder.DoesNotExist:
-                # Installment not yet purchased
-                installment_info = {
-                    'installment_number': installment_number,
-                    'amount': float(self.fee_structure.fee_amount),
-                    'is_paid': False,
-                    'payment_date': None,
-                    'transaction_id': None
-                }
-            installments.append(installment_info)
-        return installments
+    @classmethod
+    def get_installment_details_for_batches(cls, batches, user):
+        """
+        get_installment_details_for_user for several batches at once, as a dict keyed by batch id. The schedules are
+        loaded with one query, and the paid orders of batches without a schedule with another one. `batches` should
+        select the related fee_structure.
+        """
+        details = {batch.pk: [] for batch in batches}
+        batches = [batch for batch in batches if batch.fee_structure]
+        for due in InstallmentDue.objects.filter(batch__in=batches, student=user).select_related(
+                'purchase_order__transaction'):
+            details[due.batch_id].append(
+                cls.installment_info(due.installment_number, due.amount, due.purchase_order, due.due_date))
+
+        # Not scheduled yet, the enrollment is not approved
+        unscheduled = [batch for batch in batches if not details[batch.pk]]
+        if unscheduled:
+            orders = {(order.batch_id, order.installment_number): order for order in BatchPurchaseOrder.objects.filter(
+                batch__in=unscheduled, student=user, is_paid=True).select_related('transaction')}
+            for batch in unscheduled:
+                details[batch.pk] = [
+                    cls.installment_info(installment_number, batch.fee_structure.fee_amount,
+                                         orders.get((batch.pk, installment_number)))
+                    for installment_number in range(1, batch.fee_structure.installments + 1)
+                ]
+        return details
+
+    @staticmethod
+    def installment_info(installment_number, amount, purchase_order=None, due_date=None):
+        """Installment details, paid when `purchase_order`, a paid BatchPurchaseOrder, is given."""
+        if purchase_order is None or not purchase_order.is_paid:
+            # Installment not yet purchased
+            return {
+                'installment_number': installment_number,
+                'amount': float(amount),
+                'is_paid': False,
+                'due_date': due_date.isoformat() if due_date else None,
+                'payment_date': None,
+                'transaction_id': None
+            }
+        return {
+            'installment_number': installment_number,
+            'amount': float(purchase_order.amount),
+            'is_paid': True,
+            'due_date': due_date.isoformat() if due_date else None,
+            'payment_date': purchase_order.payment_date.isoformat() if purchase_order.payment_date else None,
+            'transaction_id': purchase_order.transaction.transaction_id if purchase_order.transaction else None
+        }
 
     @property
     def content(self):
-        # Define the file extensions for videos and images
-        VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
-        IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
-
-        # Initialize counts
-        counts = {
-            'videos': 0,
-            'images': 0
-        }
-
-        def fetch_folder_structure(folder):
-            nonlocal counts  # Allows access to the counts dictionary defined in the outer scope
-
-            folder_data = {
-                'id': folder.id,
-                'title': folder.title,
-                'files': [],
-                'subfolders': []
-            }
-            # Fetch files within the folder
-            for file in folder.files.all():
-                # Determine the file extension
-                extension = file.url.name.rsplit('.', 1)[-1].lower()
-
-                # Increment counts based on file type
-                if extension in VIDEO_EXTENSIONS:
-                    counts['videos'] += 1
-                elif extension in IMAGE_EXTENSIONS:
-                    counts['images'] += 1
-
-                # TODO we don't need to show urls of each file that is locked or if student not purchased course
-                # Append file data
-                folder_data['files'].append({
-                    'id': file.id,
-                    'title': file.title,
-                    'url': file.url.url,  # URL to access the file
-                    'is_locked': file.is_locked
-                })
-
-            # Recursively fetch subfolders
-            for subfolder in folder.folders.all():
-                folder_data['subfolders'].append(fetch_folder_structure(subfolder))
-
-            return folder_data
-
-        folder_structure = []
-        # Start from top-level folders (where parent is None)
-        for folder in self.folders.filter(parent__isnull=True):
-            folder_structure.append(fetch_folder_structure(folder))
-
-        # Prepare the final data with directory structure and counts
-        data = {
-            'directory': folder_structure,
-            'videos': counts['videos'],
-            'images': counts['images']
-        }
+        return build_content_tree(self.folders.all(), File.objects.filter(folder__batch=self))
 
-        return data
 
+class Folder(AbstractFolder):
+    owner_field = 'batch'
 
-class Folder(TimeStampedModel):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='folders')
     batch = models.ForeignKey(Batch, related_name="folders", on_delete=models.CASCADE)
     title = models.CharField(max_length=255, verbose_name="Folder Title")
@@ -235,6 +238,7 @@ class File(TimeStampedModel):
     url = models.FileField(upload_to='videos/', verbose_name="Batch File URL")
     is_locked = models.BooleanField(default=False, verbose_name="Is Locked")
     order = models.PositiveIntegerField(default=0, verbose_name="Order")  # Field to handle the order
+    size = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Size In Bytes")
 
     def __str__(self):
         return self.title
@@ -246,7 +250,14 @@ class File(TimeStampedModel):
         # Automatically set the title from the document file name, if title is empty
         if not self.title and self.url:
             self.title = self.url.name.rsplit('/', 1)[-1]  # Get the file name only
+        if self.url and not self.url._committed:
+            self.size = self.url.size  # Size of the newly uploaded file
         super(File, self).save(**kwargs)
+        Folder.touch_folders(self.folder_id)
+
+    def delete(self, *args, **kwargs):
+        Folder.touch_folders(self.folder_id)
+        return super().delete(*args, **kwargs)
 
 
 class Enrollment(TimeStampedModel):
@@ -269,10 +280,13 @@ class Enrollment(TimeStampedModel):
 
     def save(self, *args, **kwargs):
         # Check if the enrollment is being approved
-        if self.is_approved and not self.batch_joined_date:
+        approving = self.is_approved and not self.batch_joined_date
+        if approving:
             self.batch_joined_date = timezone.now()  # Set current date and time
 
         super().save(*args, **kwargs)  # Call the parent class's save method
+        if approving:
+            InstallmentDue.schedule([self])
 
 
 class BatchFaculty(TimeStampedModel):
@@ -294,6 +308,8 @@ class LiveClass(TimeStampedModel):
     recording_url = models.URLField(verbose_name="Recording URL", null=True, blank=True)
     duration = models.IntegerField(verbose_name="Duration", null=True, blank=True)
     recording_status = models.CharField(max_length=255, verbose_name="Recording Status", null=True, blank=True)
+    # Set once the class has been counted as held in the attendance summaries
+    attendance_recorded = models.BooleanField(default=False, verbose_name="Attendance Recorded")
 
     class Meta:
         verbose_name = "Live Class"
@@ -303,10 +319,6 @@ class LiveClass(TimeStampedModel):
     def __str__(self):
         return f"Live Class for {self.batch} on {self.date}"
 
-    @property
-    def student_join_link(self):
-        return self.attendance.live_class_link
-
 
 # OfflineClass model
 class OfflineClass(TimeStampedModel):
@@ -392,7 +404,7 @@ class Schedule(TimeStampedModel):
 
 class Attendance(TimeStampedModel):
     student = models.ForeignKey(User, related_name="attendances", on_delete=models.CASCADE)
-    live_class = models.OneToOneField(LiveClass, related_name="attendance", on_delete=models.CASCADE)
+    live_class = models.ForeignKey(LiveClass, related_name="attendances", on_delete=models.CASCADE)
     attended = models.BooleanField(default=False, verbose_name="Attended")
     analytics = models.JSONField(verbose_name="Analytics", null=True, blank=True)
     browser = models.JSONField(max_length=255, verbose_name="Browser", null=True, blank=True)
@@ -413,6 +425,88 @@ class Attendance(TimeStampedModel):
         return f"{self.student} - {self.live_class} - {'Present' if self.attended else 'Absent'}"
 
 
+class AttendanceSummary(AbstractAttendanceSummary):
+    owner_field = 'batch'
+
+    batch = models.ForeignKey(Batch, related_name="attendance_summaries", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Attendance Summary"
+        verbose_name_plural = "Attendance Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=('batch', 'student'), name='unique_batch_attendance_summary'),
+        ]
+        indexes = [
+            models.Index(fields=('batch', 'percentage'), name='batch_attendance_pct_idx'),
+        ]
+
+
+class LiveClassFile(AbstractLiveClassFile):
+    live_class = models.ForeignKey(LiveClass, related_name="shared_files", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Live Class File"
+        verbose_name_plural = "Live Class Files"
+        ordering = ('id',)
+
+
+class LiveClassChat(AbstractLiveClassChat):
+    live_class = models.ForeignKey(LiveClass, related_name="chats", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Live Class Chat"
+        verbose_name_plural = "Live Class Chats"
+        constraints = [
+            models.UniqueConstraint(fields=('live_class', 'channel'), name='unique_live_class_chat'),
+        ]
+
+
+class LiveClassJob(TimeStampedModel):
+    """
+    Scheduling of a batch or course live class, or of a series of them, with MeritHub, run in the background (see
+    apps.batch.jobs).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCEEDED = 'succeeded', 'Succeeded'
+        FAILED = 'failed', 'Failed'
+
+    class OwnerType(models.TextChoices):
+        BATCH = 'batch', 'Batch'
+        COURSE = 'course', 'Course'
+
+    owner_type = models.CharField(max_length=10, choices=OwnerType.choices, verbose_name="Owner Type")
+    owner_id = models.PositiveIntegerField(verbose_name="Batch or Course ID")
+    class_data = models.JSONField(verbose_name="MeritHub Class Data")
+    created_by = models.ForeignKey(User, related_name="live_class_jobs", on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    # A series repeats the class at every start time in `occurrences`, expanded from the `recurrence` rule
+    recurrence = models.CharField(max_length=255, blank=True, verbose_name="Recurrence Rule")
+    occurrences = models.JSONField(default=list, verbose_name="Occurrence Start Times")
+    live_class_ids = models.JSONField(default=list, verbose_name="Live Class IDs")
+    total_students = models.PositiveIntegerField(default=0, verbose_name="Total Students")
+    provisioned_students = models.PositiveIntegerField(default=0, verbose_name="Provisioned Students")
+    links_generated = models.PositiveIntegerField(default=0, verbose_name="Links Generated")
+    failed_students = models.JSONField(default=list, verbose_name="Failed Student IDs")
+    error = models.TextField(blank=True, verbose_name="Error")
+
+    class Meta:
+        verbose_name = "Live Class Job"
+        verbose_name_plural = "Live Class Jobs"
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f"{self.get_owner_type_display()} {self.owner_id} - {self.class_data.get('title')} ({self.status})"
+
+    def update_progress(self, **fields):
+        """Write `fields` straight to the row, so progress is visible to status polls while the job runs."""
+        for name, value in fields.items():
+            setattr(self, name, value)
+        LiveClassJob.objects.filter(pk=self.pk).update(**fields, modified=timezone.now())
+
+
 class StudyMaterial(TimeStampedModel):
     batch = models.ForeignKey(Batch, related_name="study_materials", on_delete=models.CASCADE, verbose_name="Batch")
     title = models.CharField(max_length=255, verbose_name="Material Title")
@@ -442,9 +536,116 @@ class BatchPurchaseOrder(TimeStampedModel):
         verbose_name_plural = "Batch Purchase Orders"
         ordering = ('-created',)
 
+    METRICS_VERSION_KEY = 'fees-metrics:version'
+
     def __str__(self):
         return f"BatchPurchaseOrder {self.id} - {self.batch.name} - Installment {self.installment_number}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.is_paid:
+            InstallmentDue.objects.filter(
+                student_id=self.student_id, batch_id=self.batch_id, installment_number=self.installment_number,
+                status=InstallmentDue.Status.PENDING,
+            ).update(status=InstallmentDue.Status.PAID, purchase_order=self, modified=timezone.now())
+        transaction.on_commit(self.invalidate_metrics)
+
+    def delete(self, *args, **kwargs):
+        transaction.on_commit(self.invalidate_metrics)
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def metrics_version(cls):
+        """Version of the purchase orders, cached fee metrics are keyed by it."""
+        version = cache.get(cls.METRICS_VERSION_KEY)
+        if version is None:
+            cache.add(cls.METRICS_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.METRICS_VERSION_KEY)
+        return version
+
+    @classmethod
+    def invalidate_metrics(cls):
+        cache.set(cls.METRICS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class InstallmentDue(TimeStampedModel):
+    """
+    Installment schedule of an approved enrollment, written when the enrollment is approved and marked paid when the
+    matching BatchPurchaseOrder is paid, so due and overdue installments are read with index range scans. Pending
+    installments are rewritten when the fee structure of the batch is replaced or edited, see reschedule.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PAID = 'paid', 'Paid'
+
+    enrollment = models.ForeignKey(Enrollment, related_name='installment_dues', on_delete=models.CASCADE)
+    student = models.ForeignKey(User, related_name='installment_dues', on_delete=models.CASCADE)
+    batch = models.ForeignKey(Batch, related_name='installment_dues', on_delete=models.CASCADE)
+    installment_number = models.PositiveIntegerField(verbose_name="Installment Number")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Amount")
+    due_date = models.DateTimeField(verbose_name="Due Date")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    purchase_order = models.ForeignKey(BatchPurchaseOrder, related_name='installment_dues', null=True, blank=True,
+                                       on_delete=models.SET_NULL)
+
+    class Meta:
+        verbose_name = "Installment Due"
+        verbose_name_plural = "Installment Dues"
+        ordering = ('due_date', 'id')
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'batch', 'installment_number'],
+                                    name='unique_installment_due'),
+        ]
+        indexes = [
+            models.Index(fields=['due_date', 'status']),
+            models.Index(fields=['student', 'batch']),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.batch} - Installment {self.installment_number} ({self.status})"
+
+    @classmethod
+    def schedule(cls, enrollments):
+        """
+        Write the installments of approved `enrollments` whose batch has a fee structure, installments that already
+        have a paid purchase order are written as paid. Existing rows are left alone, so this can be run again.
+        """
+        enrollments = [enrollment for enrollment in enrollments if enrollment.is_approved
+                       and enrollment.batch_joined_date and enrollment.batch.fee_structure]
+        if not enrollments:
+            return []
+        paid_orders = {
+            (order.student_id, order.batch_id, order.installment_number): order
+            for order in BatchPurchaseOrder.objects.filter(
+                batch__in={enrollment.batch_id for enrollment in enrollments},
+                student__in={enrollment.student_id for enrollment in enrollments}, is_paid=True)
+        }
+        offsets = {}
+        dues = []
+        for enrollment in enrollments:
+            fee_structure = enrollment.batch.fee_structure
+            if fee_structure.pk not in offsets:
+                offsets[fee_structure.pk] = fee_structure.installment_offsets()
+            for installment_number, offset in enumerate(offsets[fee_structure.pk], start=1):
+                order = paid_orders.get((enrollment.student_id, enrollment.batch_id, installment_number))
+                dues.append(cls(enrollment=enrollment, student_id=enrollment.student_id, batch_id=enrollment.batch_id,
+                                installment_number=installment_number, amount=fee_structure.fee_amount,
+                                due_date=enrollment.batch_joined_date + offset, purchase_order=order,
+                                status=cls.Status.PAID if order else cls.Status.PENDING))
+        return cls.objects.bulk_create(dues, ignore_conflicts=True)
+
+    @classmethod
+    def reschedule(cls, batch_ids):
+        """
+        Rewrite the pending installments of the approved enrollments of the batches from their current fee structure,
+        after it was set, replaced or edited. Paid installments are kept.
+        """
+        with transaction.atomic():
+            cls.objects.filter(batch__in=batch_ids, status=cls.Status.PENDING).delete()
+            return cls.schedule(Enrollment.objects.filter(batch__in=batch_ids, is_approved=True)
+                                .select_related('batch__fee_structure'))
+
 
 class BatchReview(AbstractReview):
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='reviews')
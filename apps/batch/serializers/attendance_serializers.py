@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from apps.batch.models import Attendance, Batch, LiveClass
+from apps.batch.models import Attendance, AttendanceSummary, Batch, LiveClass
 
 
 # class BatchSerializer(serializers.ModelSerializer):
@@ -42,3 +42,11 @@ class ListAttendanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Attendance
         fields = '__all__'
+
+
+class AttendanceSummarySerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.full_name', read_only=True)
+
+    class Meta:
+        model = AttendanceSummary
+        fields = ('student', 'student_name', 'classes_held', 'classes_attended', 'total_minutes', 'percentage')
@@ -153,7 +153,7 @@ class FileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = File
-        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order']
+        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order', 'size']
 
 
 class BatchReviewSerializer(serializers.ModelSerializer):
@@ -1,4 +1,7 @@
+from datetime import datetime, time, timedelta
+
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import serializers
 
 from apps.batch.models import FeeStructure, Batch, Enrollment, BatchPurchaseOrder
@@ -75,3 +78,22 @@ class AddFeesRecordSerializer(serializers.Serializer):
             attrs['batch_purchased'] = batch_purchased
 
         return attrs
+
+
+class FeesRecordFilterSerializer(serializers.Serializer):
+    batch = serializers.IntegerField(required=False)
+    student = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    page = serializers.IntegerField(default=1, min_value=1)
+    page_size = serializers.IntegerField(default=50, min_value=1, max_value=500)
+
+    def validate(self, attrs):
+        start_date, end_date = attrs.get('start_date'), attrs.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError({'end_date': "End date must not be before start date"})
+        # Both dates are inclusive, get_fee_ledger takes the half-open range [start, end) of datetimes
+        attrs['start'] = timezone.make_aware(datetime.combine(start_date, time.min)) if start_date else None
+        attrs['end'] = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min)) \
+            if end_date else None
+        return attrs
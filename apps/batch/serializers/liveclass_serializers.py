@@ -1,10 +1,12 @@
+import itertools
 from datetime import datetime, timedelta
 
+from dateutil.rrule import rrulestr
 from django.utils import timezone
 from rest_framework import serializers
 
 from apps.batch import models
-from apps.batch.models import LiveClass, Batch
+from apps.batch.models import LiveClass, Batch, LiveClassJob
 
 
 # class BatchSerializer(serializers.ModelSerializer):
@@ -83,6 +85,45 @@ class CreateLiveClassSerializer(serializers.Serializer):
         return data
 
 
+class LiveClassSeriesMixin(serializers.Serializer):
+    """
+    Turns a create-live-class serializer into one for a series: `recurrence` is an iCalendar RRULE such as
+    "FREQ=WEEKLY;BYDAY=MO,WE,FR;COUNT=36", expanded from `start_time` into the start times in `occurrences`.
+    """
+    MAX_OCCURRENCES = 200
+
+    recurrence = serializers.CharField(max_length=255)
+
+    def validate(self, data):
+        if not data.get('start_time'):
+            raise serializers.ValidationError({"start_time": "start_time is required for a series."})
+        data = super().validate(data)
+        try:
+            rule = rrulestr(data['recurrence'], dtstart=data['start_time'])
+        except (ValueError, TypeError) as e:
+            raise serializers.ValidationError({"recurrence": f"Invalid recurrence rule: {e}"})
+        occurrences = list(itertools.islice(rule, self.MAX_OCCURRENCES + 1))
+        if not occurrences:
+            raise serializers.ValidationError({"recurrence": "The recurrence rule has no occurrence."})
+        if len(occurrences) > self.MAX_OCCURRENCES:
+            raise serializers.ValidationError(
+                {"recurrence": f"A series can have at most {self.MAX_OCCURRENCES} classes."})
+        data['occurrences'] = [occurrence.isoformat() for occurrence in occurrences]
+        return data
+
+
+class LiveClassJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LiveClassJob
+        fields = ('id', 'owner_type', 'owner_id', 'status', 'recurrence', 'occurrences', 'live_class_ids',
+                  'total_students', 'provisioned_students', 'links_generated', 'failed_students', 'error', 'created',
+                  'modified')
+
+
+class CreateLiveClassSeriesSerializer(LiveClassSeriesMixin, CreateLiveClassSerializer):
+    pass
+
+
 class RetrieveLiveClassSerializer(serializers.ModelSerializer):
     # batch = BatchSerializer(read_only=True)
 
@@ -1,8 +1,9 @@
 from datetime import datetime, timedelta
 
+from django.db import models
 from rest_framework import serializers
 
-from .models import Batch, LiveClass, Attendance, OfflineClass
+from .models import Batch, Enrollment, LiveClass, Attendance, OfflineClass
 from .serializers.fee_serializers import FeeStructureSerializer
 from .serializers.offline_classes_serializers import RetrieveOfflineClassSerializer
 
@@ -60,6 +61,23 @@ def generate_offline_classes(obj):
     return result
 
 
+class StudentBatchListSerializer(serializers.ListSerializer):
+    """
+    Loads the installment details and joining requests of the student for all batches of the list at once, and
+    shares them with StudentBatchSerializer through the context.
+    """
+
+    def to_representation(self, data):
+        batches = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        if request:
+            user = request.user
+            self.context['installment_details'] = Batch.get_installment_details_for_batches(batches, user)
+            self.context['joining_requests'] = set(Enrollment.objects.filter(
+                student=user, batch__in=batches, is_approved=False).values_list('batch_id', flat=True))
+        return super().to_representation(batches)
+
+
 class StudentBatchSerializer(serializers.ModelSerializer):
     created_by = serializers.ReadOnlyField(source='created_by.full_name')
     fee_structure = FeeStructureSerializer(read_only=True)
@@ -69,6 +87,8 @@ class StudentBatchSerializer(serializers.ModelSerializer):
     is_joining_request_sent = serializers.SerializerMethodField()
 
     def get_is_joining_request_sent(self, obj):
+        if 'joining_requests' in self.context:
+            return obj.pk in self.context['joining_requests']
         request = self.context.get('request')
         if request:
             user = request.user
@@ -77,9 +97,13 @@ class StudentBatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
         fields = ['id', 'name', 'batch_code', 'start_date', 'subject', 'live_class_link',
-                  'created_by', 'fee_structure', 'installment_details', 'thumbnail', 'is_joining_request_sent']
+                  'created_by', 'fee_structure', 'installment_details', 'thumbnail', 'is_joining_request_sent',
+                  'file_count', 'video_count', 'image_count', 'document_count', 'total_bytes']
+        list_serializer_class = StudentBatchListSerializer
 
     def get_installment_details(self, obj):
+        if 'installment_details' in self.context:
+            return self.context['installment_details'][obj.pk]
         request = self.context.get('request')
         if request:
             user = request.user
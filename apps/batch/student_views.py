@@ -1,21 +1,28 @@
-from datetime import timedelta, datetime, time
+from datetime import datetime, time
 
-from dateutil.relativedelta import relativedelta
-from django.db.models import Sum
+from django.db.models import OuterRef, Subquery, Sum
 from django.utils import timezone
 from rest_framework import viewsets, mixins
-from rest_framework.generics import ListAPIView
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
 from abstract.views import ReadOnlyCustomResponseMixin
-from .models import Batch, Enrollment, \
+from .fees import get_fee_ledger
+from .models import Batch, Enrollment, LiveClassChat, \
     BatchPurchaseOrder, LiveClass, Attendance  # Assuming you have an Enrollment model for student batch enrollments
 from .student_serializers import StudentBatchSerializer, StudentRetrieveBatchSerializer, \
     StudentLiveClassSerializer, StudentAttendanceSerializer, generate_offline_classes  # Create these serializers
 
 
+def with_student_join_link(live_classes, user):
+    """Annotate live classes with the joining link MeritHub issued to `user`."""
+    links = Attendance.objects.filter(live_class=OuterRef('pk'), student=user).values('live_class_link')[:1]
+    return live_classes.annotate(student_join_link=Subquery(links))
+
+
 class AbstractBatchStudentView:
 
     def get_available_batches(self):
@@ -34,7 +41,7 @@ class AbstractBatchStudentView:
             id__in=enrolled_batch_ids  # Exclude batches the user is already enrolled in
         ).exclude(
             id__in=purchased_batch_ids  # Exclude purchased batches if necessary
-        )
+        ).select_related('created_by', 'fee_structure', 'subject')
         return available_batches
 
     def get_purchased_batches(self):
@@ -52,7 +59,9 @@ class AbstractBatchStudentView:
         # Return Batch objects corresponding to the combined batch IDs
         return Batch.objects.filter(
             id__in=combined_batch_ids
-        ).select_related('created_by').filter(is_published=True)  # Ensure the batches are published
+        ).select_related('created_by', 'fee_structure', 'subject').filter(
+            is_published=True  # Ensure the batches are published
+        )
 
 
 class AvailableBatchViewSet(AbstractBatchStudentView, ReadOnlyCustomResponseMixin, viewsets.ReadOnlyModelViewSet):
@@ -80,7 +89,7 @@ class StudentLiveClassesViewSet(mixins.ListModelMixin,
         # TODO check current user have batch access
         batch = Batch.objects.get(id=self.kwargs['batch'])
         live_classes = batch.live_classes.all()
-        return live_classes
+        return with_student_join_link(live_classes, self.request.user)
 
 
 class StudentBatchAttendanceViewSet(mixins.ListModelMixin, GenericViewSet):
@@ -94,9 +103,33 @@ class StudentBatchAttendanceViewSet(mixins.ListModelMixin, GenericViewSet):
         return Attendance.objects.filter(student=user, live_class__batch=batch)
 
 
+class StudentLiveClassChatView(APIView):
+    """
+    Page through, or search, the public chat of a live class of one of the student's batches.
+    """
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 200
+
+    def get(self, request, pk):
+        live_class = get_object_or_404(LiveClass.objects.filter(
+            batch__enrollments__student=request.user, batch__enrollments__is_approved=True), pk=pk)
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = min(int(request.query_params.get('page_size', self.DEFAULT_PAGE_SIZE)), self.MAX_PAGE_SIZE)
+        except ValueError:
+            raise ValidationError({"page": "page and page_size must be integers."})
+        if page < 1 or page_size < 1:
+            raise ValidationError({"page": "page and page_size must be positive."})
+
+        chat = LiveClassChat.objects.filter(live_class=live_class, channel=LiveClassChat.Channel.PUBLIC).first()
+        if chat is None:
+            return Response({'count': 0, 'page': page, 'has_next': False, 'results': []})
+        messages, has_next = chat.get_page(page, page_size, request.query_params.get('search'))
+        return Response({'count': chat.message_count, 'page': page, 'has_next': has_next, 'results': messages})
+
+
 class StudentFeesRecordAPI(ListAPIView):
     def get(self, request, *args, **kwargs):
-        now = timezone.now()
         unpaid_fees = []
         upcoming_fees = []
         paid_fees = []
@@ -113,60 +146,20 @@ class StudentFeesRecordAPI(ListAPIView):
                 'installment_number': data.installment_number,
             })
 
-        # 2. Fetch approved enrollments with a batch, student, and batch_joined_date
-        enrollments = Enrollment.objects.filter(is_approved=True, student=self.request.user).select_related(
-            'batch__fee_structure', 'student'
-        )
-
-        for enrollment in enrollments:
-            batch = enrollment.batch
-            fee_structure = batch.fee_structure
-            if not fee_structure:
-                continue  # Skip if there's no fee structure
-
-            # Get frequency, number_of_values, and installments
-            frequency = fee_structure.frequency
-            interval = fee_structure.number_of_values
-            num_installments = fee_structure.installments
-            fee_amount = fee_structure.fee_amount
-            join_date = enrollment.batch_joined_date
-
-            # Define date increment based on frequency and number_of_values
-            if frequency == 'weekly':
-                date_increment = timedelta(weeks=interval)
-            elif frequency == 'monthly':
-                date_increment = relativedelta(months=interval)
-            else:
-                date_increment = relativedelta(months=1)  # Default to monthly if frequency is unknown
-
-            for installment_num in range(1, num_installments + 1):
-                due_date = join_date + (installment_num - 1) * date_increment
-
-                # Check if a corresponding BatchPurchaseOrder already exists
-                order_exists = BatchPurchaseOrder.objects.filter(
-                    student=self.request.user,
-                    batch=batch,
-                    installment_number=installment_num,
-                ).exists()
-
-                if order_exists:
-                    continue  # Skip if BatchPurchaseOrder record already exists
-
-                # Categorize based on due date and payment status
-                record = {
-                    'batch_name': batch.name,
-                    'batch': StudentBatchSerializer(batch).data,
-                    'installment_number': installment_num,
-                    'amount': fee_amount,
-                    'due_date': due_date,
-                }
-
-                if due_date < now:
-                    # Past-due unpaid installment
-                    unpaid_fees.append(record)
-                else:
-                    # Upcoming installment
-                    upcoming_fees.append(record)
+        # 2. Pending installments, see get_fee_ledger
+        ledger = get_fee_ledger(student=self.request.user.pk)
+        batch_data = {}
+        for name, records in (('unpaid_fees', unpaid_fees), ('upcoming_fees', upcoming_fees)):
+            for due in ledger[name].select_related('batch'):
+                if due.batch_id not in batch_data:
+                    batch_data[due.batch_id] = StudentBatchSerializer(due.batch).data
+                records.append({
+                    'batch_name': due.batch.name,
+                    'batch': batch_data[due.batch_id],
+                    'installment_number': due.installment_number,
+                    'amount': due.amount,
+                    'due_date': due.due_date,
+                })
 
         # Structure response with grouped data
         response_data = {
@@ -187,7 +180,7 @@ class StudentBatchClassesView(AbstractBatchStudentView, APIView):
             current_date = timezone.localtime(timezone.now()).date()
             # Get today's midnight in the local timezone
             today_midnight = timezone.make_aware(datetime.combine(current_date, time.min))
-            live_classes = batch.live_classes.filter(date__gte=today_midnight)
+            live_classes = with_student_join_link(batch.live_classes.filter(date__gte=today_midnight), request.user)
             live_classes_data = StudentLiveClassSerializer(live_classes, many=True).data
             offline_class = generate_offline_classes(batch)
 
@@ -0,0 +1,61 @@
+"""
+Fixtures shared by the test suites that work on batches, courses and free resources.
+"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from .models import Batch, Subject
+
+User = get_user_model()
+
+FILE_EXTENSIONS = ['mp4', 'png', 'pdf', 'MOV', 'jpeg']
+
+
+def create_owner(**fields):
+    """
+    Create the user that owns the batches and courses of a test.
+    """
+    return User.objects.create_user(**{'email': 'owner@example.com', 'phone_number': '+919876543210',
+                                       'full_name': 'Owner', 'password': 'password', **fields})
+
+
+def build_folder_tree(folder_model, file_model, **owner):
+    """
+    Create 10 top-level folders with 5 subfolders each and 2 subfolders below those, with 10 files in every leaf
+    folder. Two in five files are videos and two in five images.
+    """
+    top_folders = folder_model.objects.bulk_create(
+        folder_model(**owner, title=f'Folder {i}', order=i) for i in range(10))
+    mid_folders = folder_model.objects.bulk_create(
+        folder_model(**owner, parent=parent, title=f'{parent.title}.{i}', order=i)
+        for parent in top_folders for i in range(5))
+    leaf_folders = folder_model.objects.bulk_create(
+        folder_model(**owner, parent=parent, title=f'{parent.title}.{i}', order=i)
+        for parent in mid_folders for i in range(2))
+    file_model.objects.bulk_create(
+        file_model(folder=folder, title=f'{folder.title} file {i}',
+                   url=f'videos/file_{folder.id}_{i}.{FILE_EXTENSIONS[i % 5]}', order=i)
+        for folder in leaf_folders for i in range(10))
+
+
+class BatchTestCase(TestCase):
+    """
+    Test case with an owner, a subject and a batch created once for the whole class.
+
+    Subclasses add their own data by extending `setUpTestData`, and pass extra batch fields through
+    `get_batch_fields`.
+    """
+    owner_fields = {}
+
+    @classmethod
+    def get_batch_fields(cls):
+        return {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_owner(**cls.owner_fields)
+        cls.subject = Subject.objects.create(name='Physics')
+        cls.batch = Batch.objects.create(name='Batch', start_date=date.today(), subject=cls.subject,
+                                         created_by=cls.user, **cls.get_batch_fields())
@@ -1,3 +1,848 @@
-from django.test import TestCase
+import csv
+import socket
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from itertools import chain
+from unittest import mock
 
-# Create your tests here.
+import requests
+from dateutil.relativedelta import relativedelta
+from constance.test import override_config
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from config.live_video import MeritHubAPI
+from config.merithub_stub import MeritHubStub
+from .jobs import run_live_class_job
+from .models import Attendance, Batch, BatchFaculty, BatchPurchaseOrder, Enrollment, FeeStructure, File, Folder, \
+    InstallmentDue, LiveClass, LiveClassJob, Subject
+from .student_views import AvailableBatchViewSet, PurchasedBatchViewSet
+from .testing import BatchTestCase, build_folder_tree, create_owner
+from .views import BatchViewSet, CreateLiveClassSeriesView, CreateLiveClassView, EnrollmentViewSet, FeesRecordAPI, \
+    FeesRecordExportView, FolderFileViewSet, LiveClassJobView
+from ..course.models import Course, CourseFaculty, File as CourseFile, Folder as CourseFolder
+from ..user.models import Roles
+from ..utils.functions import ORDER_GAP, decode_item_cursor, get_folder_items, move_item, set_items_order
+
+User = get_user_model()
+
+
+class BatchContentTreeTests(BatchTestCase):
+    """
+    Batch.content must load the whole folder tree in a constant number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        build_folder_tree(Folder, File, batch=cls.batch)
+
+    def test_content_query_count(self):
+        # The first access initialises the configured storage backend
+        self.batch.content
+
+        with self.assertNumQueries(2):
+            content = self.batch.content
+
+        self.assertEqual(content['total_files'], 1000)
+        self.assertEqual(content['videos'], 400)
+        self.assertEqual(content['images'], 400)
+
+    def test_content_structure(self):
+        content = self.batch.content
+
+        directory = content['directory']
+        self.assertEqual([folder['title'] for folder in directory], [f'Folder {i}' for i in range(10)])
+        first_folder = directory[0]
+        self.assertEqual(len(first_folder['subfolders']), 5)
+        self.assertEqual(first_folder['files'], [])
+
+        leaf_folder = first_folder['subfolders'][0]['subfolders'][1]
+        self.assertEqual(leaf_folder['title'], 'Folder 0.0.1')
+        self.assertEqual(leaf_folder['subfolders'], [])
+        self.assertEqual([file['title'] for file in leaf_folder['files']],
+                         [f'Folder 0.0.1 file {i}' for i in range(10)])
+        self.assertEqual(set(leaf_folder['files'][0]), {'id', 'title', 'url', 'is_locked'})
+
+
+class FolderPathTests(BatchTestCase):
+    def test_path_follows_parent(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        chapter = Folder.objects.create(batch=self.batch, parent=home, title='Chapter')
+        topic = Folder.objects.create(batch=self.batch, parent=chapter, title='Topic')
+
+        self.assertEqual(topic.path, f'{home.id}/{chapter.id}/{topic.id}/')
+        with self.assertNumQueries(1):
+            breadcrumb = topic.get_breadcrumb()
+        self.assertEqual([crumb['title'] for crumb in breadcrumb], ['Home', 'Chapter', 'Topic'])
+        self.assertEqual(set(home.get_descendants()), {chapter, topic})
+
+    def test_move_updates_subtree(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        archive = Folder.objects.create(batch=self.batch, parent=home, title='Archive')
+        chapter = Folder.objects.create(batch=self.batch, parent=home, title='Chapter')
+        topic = Folder.objects.create(batch=self.batch, parent=chapter, title='Topic')
+
+        chapter.parent = archive
+        chapter.save()
+
+        topic.refresh_from_db()
+        self.assertEqual(topic.path, f'{home.id}/{archive.id}/{chapter.id}/{topic.id}/')
+
+    def test_delete_subtree(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        chapter = Folder.objects.create(batch=self.batch, parent=home, title='Chapter')
+        topic = Folder.objects.create(batch=self.batch, parent=chapter, title='Topic')
+        File.objects.create(folder=topic, title='Lecture', url='videos/lecture.mp4')
+
+        self.assertEqual(chapter.get_subtree_files().count(), 1)
+        chapter.delete_subtree()
+
+        self.assertEqual(list(Folder.objects.filter(batch=self.batch)), [home])
+        self.assertFalse(File.objects.exists())
+
+
+class ContentCounterTests(BatchTestCase):
+    def add_file(self, folder, name, size):
+        file = File.objects.create(folder=folder, title=name, url=f'videos/{name}', size=size)
+        folder.apply_file_counters(file)
+        return file
+
+    def test_counters_follow_file_changes(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        chapter = Folder.objects.create(batch=self.batch, parent=home, title='Chapter')
+        self.add_file(home, 'intro.mp4', 100)
+        self.add_file(chapter, 'diagram.png', 20)
+        notes = self.add_file(chapter, 'notes.pdf', 5)
+
+        self.batch.refresh_from_db()
+        home.refresh_from_db()
+        chapter.refresh_from_db()
+        self.assertEqual((self.batch.file_count, self.batch.video_count, self.batch.image_count,
+                          self.batch.document_count, self.batch.total_bytes), (3, 1, 1, 1, 125))
+        self.assertEqual((home.file_count, home.total_bytes), (3, 125))
+        self.assertEqual((chapter.file_count, chapter.total_bytes), (2, 25))
+
+        chapter.apply_file_counters(notes, sign=-1)
+        notes.delete()
+        chapter.delete_subtree()
+
+        self.batch.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((self.batch.file_count, self.batch.video_count, self.batch.total_bytes), (1, 1, 100))
+        self.assertEqual((home.file_count, home.image_count, home.total_bytes), (1, 0, 100))
+
+    def test_save_keeps_concurrent_counter_changes(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        batch = Batch.objects.get(pk=self.batch.pk)
+        self.add_file(home, 'intro.mp4', 100)
+
+        # Both copies were read before the file was added
+        batch.name = 'Renamed'
+        batch.save()
+        home.title = 'Start'
+        home.save()
+
+        batch.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((batch.name, batch.file_count, batch.total_bytes), ('Renamed', 1, 100))
+        self.assertEqual((home.title, home.file_count, home.total_bytes), ('Start', 1, 100))
+
+    def test_rebuild_command_fixes_drift(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        File.objects.create(folder=home, title='intro', url='videos/intro.mp4', size=100)
+
+        call_command('rebuild_content_counters', '--dry-run', stdout=StringIO())
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.file_count, 0)
+
+        call_command('rebuild_content_counters', stdout=StringIO())
+        self.batch.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((self.batch.file_count, self.batch.video_count, self.batch.total_bytes), (1, 1, 100))
+        self.assertEqual((home.file_count, home.total_bytes), (1, 100))
+
+    def test_migration_backfills_counters(self):
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        chapter = Folder.objects.create(batch=self.batch, parent=home, title='Chapter')
+        File.objects.create(folder=home, title='intro', url='videos/intro.mp4', size=100)
+        File.objects.create(folder=chapter, title='notes', url='docs/notes.pdf', size=20)
+
+        import_module('apps.batch.migrations.0024_content_counters').backfill_counters(django_apps, None)
+
+        self.batch.refresh_from_db()
+        home.refresh_from_db()
+        chapter.refresh_from_db()
+        self.assertEqual((self.batch.file_count, self.batch.video_count, self.batch.document_count,
+                          self.batch.total_bytes), (2, 1, 1, 120))
+        self.assertEqual((home.file_count, home.total_bytes), (2, 120))
+        self.assertEqual((chapter.file_count, chapter.document_count), (1, 1))
+
+
+class ContentOrderTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.home = Folder.objects.create(batch=cls.batch, title='Home')
+
+    def get_sequence(self):
+        siblings = chain(self.home.folders.order_by('order'), self.home.files.order_by('order'))
+        return [item.title for item in sorted(siblings, key=lambda item: item.order)]
+
+    def test_move_writes_single_row(self):
+        chapter = Folder.objects.create(batch=self.batch, parent=self.home, title='Chapter', order=ORDER_GAP)
+        File.objects.create(folder=self.home, title='Intro', url='videos/intro.mp4', order=2 * ORDER_GAP)
+        notes = File.objects.create(folder=self.home, title='Notes', url='docs/notes.pdf', order=3 * ORDER_GAP)
+
+        # Two neighbour lookups, the update and the parent's version stamp
+        with self.assertNumQueries(4):
+            self.assertTrue(move_item(notes, [self.home.folders.all(), self.home.files.all()], 'up'))
+        self.assertEqual(self.get_sequence(), ['Chapter', 'Notes', 'Intro'])
+
+        self.assertTrue(move_item(notes, [self.home.folders.all(), self.home.files.all()], 'up'))
+        self.assertEqual(self.get_sequence(), ['Notes', 'Chapter', 'Intro'])
+        self.assertFalse(move_item(notes, [self.home.folders.all(), self.home.files.all()], 'up'))
+
+        chapter.refresh_from_db()
+        self.assertEqual(chapter.order, ORDER_GAP)
+
+    def test_move_renumbers_ties(self):
+        File.objects.create(folder=self.home, title='Intro', url='videos/intro.mp4')
+        notes = File.objects.create(folder=self.home, title='Notes', url='docs/notes.pdf', order=1)
+        Folder.objects.create(batch=self.batch, parent=self.home, title='Chapter', order=1)
+
+        # Folders come first on equal order, so Notes is listed last and can only move up
+        self.assertTrue(move_item(notes, [self.home.folders.all(), self.home.files.all()], 'up'))
+        self.assertEqual(self.get_sequence(), ['Intro', 'Notes', 'Chapter'])
+
+    def test_set_items_order(self):
+        chapter = Folder.objects.create(batch=self.batch, parent=self.home, title='Chapter')
+        intro = File.objects.create(folder=self.home, title='Intro', url='videos/intro.mp4')
+        notes = File.objects.create(folder=self.home, title='Notes', url='docs/notes.pdf')
+        items = [{'id': notes.id, 'type': 'file'}, {'id': chapter.id, 'type': 'folder'},
+                 {'id': intro.id, 'type': 'file'}]
+
+        self.assertIsNotNone(set_items_order(items[:2], self.home.folders.all(), self.home.files.all()))
+        self.assertIsNone(set_items_order(items, self.home.folders.all(), self.home.files.all()))
+        self.assertEqual(self.get_sequence(), ['Notes', 'Chapter', 'Intro'])
+
+
+class FolderStructureCacheTests(BatchTestCase):
+    owner_fields = {'is_superuser': True}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.home = Folder.objects.create(batch=cls.batch, title='Home')
+        cls.chapter = Folder.objects.create(batch=cls.batch, parent=cls.home, title='Chapter')
+
+    def setUp(self):
+        cache.clear()
+
+    def get_structure(self, folder, **headers):
+        request = APIRequestFactory().get('/', {'folder_id': folder.id}, headers=headers)
+        force_authenticate(request, user=self.user)
+        response = BatchViewSet.as_view({'get': 'get_folder_structure'})(request, pk=self.batch.id)
+        return response.render()
+
+    def test_conditional_get(self):
+        response = self.get_structure(self.home)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.assertEqual(self.get_structure(self.home, if_none_match=etag).status_code, 304)
+
+        File.objects.create(folder=self.home, title='Intro', url='videos/intro.mp4')
+        response = self.get_structure(self.home, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([item['title'] for item in response.data['folder_structure']['items']],
+                         ['Chapter', 'Intro'])
+
+    def test_rename_invalidates_descendant_breadcrumbs(self):
+        etag = self.get_structure(self.chapter)['ETag']
+
+        self.home.title = 'Start'
+        self.home.save()
+
+        response = self.get_structure(self.chapter, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([crumb['title'] for crumb in response.data['breadcrumb']], ['Start', 'Chapter'])
+
+
+class CloneContentTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.course = Course.objects.create(name='Course', description='Course', created_by=cls.user)
+
+    def test_clone_course_tree_into_batch(self):
+        course_home = CourseFolder.objects.create(course=self.course, title='Home')
+        chapters = [CourseFolder.objects.create(course=self.course, parent=course_home, title=f'Chapter {i}', order=i)
+                    for i in range(3)]
+        topic = CourseFolder.objects.create(course=self.course, parent=chapters[0], title='Topic')
+        for folder in [*chapters, topic]:
+            for i in range(5):
+                file = CourseFile.objects.create(folder=folder, title=f'{folder.title} {i}',
+                                                 url=f'videos/{folder.id}_{i}.mp4', size=10, order=i)
+                folder.apply_file_counters(file)
+        course_home.refresh_from_db()
+
+        batch_home = Folder.objects.create(batch=self.batch, title='Home')
+        File.objects.create(folder=batch_home, title='Welcome', url='videos/welcome.mp4', order=ORDER_GAP)
+        clone = batch_home.clone_subtree(course_home)
+
+        self.assertEqual(clone.parent, batch_home)
+        self.assertEqual(clone.order, 2 * ORDER_GAP)
+        self.assertEqual(clone.path, f'{batch_home.id}/{clone.id}/')
+        copied_topic = Folder.objects.get(batch=self.batch, title='Topic')
+        self.assertEqual([crumb['title'] for crumb in copied_topic.get_breadcrumb()],
+                         ['Home', 'Home', 'Chapter 0', 'Topic'])
+        self.assertEqual(copied_topic.files.count(), 5)
+        self.assertEqual(set(clone.get_subtree_files().values_list('url', flat=True)),
+                         set(course_home.get_subtree_files().values_list('url', flat=True)))
+
+        self.batch.refresh_from_db()
+        batch_home.refresh_from_db()
+        self.assertEqual((clone.file_count, clone.total_bytes), (20, 200))
+        self.assertEqual((batch_home.file_count, self.batch.file_count), (20, 20))
+
+    def clone(self, user, target, source):
+        request = APIRequestFactory().post('/', {'source_type': 'course', 'source_folder_id': source.id},
+                                           format='json')
+        force_authenticate(request, user=user)
+        return FolderFileViewSet.as_view({'post': 'clone_content'})(request, pk=self.batch.id, folder_id=target.id)
+
+    def test_clone_needs_a_source_the_user_manages(self):
+        instructor = User.objects.create_user(email='instructor@example.com', phone_number='+919876543211',
+                                              full_name='Instructor', role=Roles.INSTRUCTOR)
+        BatchFaculty.objects.create(batch=self.batch, faculty=instructor)
+        course_home = CourseFolder.objects.create(course=self.course, title='Home')
+        CourseFile.objects.create(folder=course_home, title='Locked', url='videos/locked.mp4', is_locked=True)
+        batch_home = Folder.objects.create(batch=self.batch, title='Home')
+
+        # Assigned to the batch but not to the course
+        self.assertEqual(self.clone(instructor, batch_home, course_home).status_code, 404)
+        # Students manage no content at all
+        self.assertEqual(self.clone(self.user, batch_home, course_home).status_code, 404)
+        self.assertFalse(batch_home.folders.exists())
+
+        CourseFaculty.objects.create(course=self.course, faculty=instructor)
+        response = self.clone(instructor, batch_home, course_home)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(batch_home.folders.get().files.get().title, 'Locked')
+
+
+class ImportZipTests(BatchTestCase):
+    def test_import_zip(self):
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('syllabus.pdf', b'%PDF' * 10)
+            archive.writestr('Unit 1/Lecture 1.mp4', b'\0' * 100)
+            archive.writestr('Unit 1/Notes/diagram.png', b'\1' * 20)
+            archive.writestr('Unit 2/', b'')
+            archive.writestr('__MACOSX/Unit 1/._Lecture 1.mp4', b'')
+            archive.writestr('Unit 1/.DS_Store', b'')
+        buffer.seek(0)
+
+        home = Folder.objects.create(batch=self.batch, title='Home')
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            self.assertEqual(home.import_zip(buffer), {'folders': 3, 'files': 3})
+            lecture = File.objects.get(title='Lecture 1.mp4')
+            with lecture.url.open('rb') as stored:
+                self.assertEqual(stored.read(), b'\0' * 100)
+
+        unit = Folder.objects.get(batch=self.batch, title='Unit 1')
+        notes = Folder.objects.get(batch=self.batch, title='Notes')
+        self.assertEqual(notes.path, f'{home.id}/{unit.id}/{notes.id}/')
+        self.assertEqual((unit.file_count, unit.video_count, unit.image_count, unit.total_bytes), (2, 1, 1, 120))
+        self.assertTrue(Folder.objects.filter(parent=home, title='Unit 2').exists())
+
+        self.batch.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((home.file_count, home.document_count, home.total_bytes), (3, 1, 160))
+        self.assertEqual((self.batch.file_count, self.batch.total_bytes), (3, 160))
+
+
+class FolderItemsPaginationTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.home = Folder.objects.create(batch=cls.batch, title='Home')
+        # Orders collide across and within both tables, ids of folders and files overlap
+        for i in range(7):
+            Folder.objects.create(batch=cls.batch, parent=cls.home, title=f'Folder {i}', order=i // 2)
+            File.objects.create(folder=cls.home, title=f'File {i}', url=f'videos/{i}.mp4', order=i // 3)
+
+    def test_pages_follow_full_listing(self):
+        with self.assertNumQueries(1):
+            items, next_cursor = get_folder_items(self.home)
+        self.assertIsNone(next_cursor)
+        self.assertEqual(len(items), 14)
+        self.assertEqual([(item['order'], item['type']) for item in items[:5]],
+                         [(0, 'folder'), (0, 'folder'), (0, 'file'), (0, 'file'), (0, 'file')])
+        self.assertEqual(items[2]['url'], File.objects.get(title='File 0').url.url)
+
+        paged, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                page, cursor = get_folder_items(self.home, cursor and decode_item_cursor(cursor), 3)
+            paged += page
+            if cursor is None:
+                break
+        self.assertEqual([(item['type'], item['id']) for item in paged],
+                         [(item['type'], item['id']) for item in items])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError):
+            decode_item_cursor('not-a-cursor')
+
+
+class LiveClassProvisioningTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = User.objects.bulk_create(
+            User(email=f'student{i}@example.com', phone_number=f'+9170000{i:05d}', full_name=f'Student {i}')
+            for i in range(30))
+        cls.students[0].merit_user_id = 'existing'
+        cls.students[0].save()
+
+    def test_register_students(self):
+        live_class = LiveClass.objects.create(batch=self.batch, title='Class', class_id='class-1',
+                                              common_participant_link='https://live.merithub.com/info/room/c/link')
+        with MeritHubStub() as stub:
+            api = stub.configure(MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!'))
+            # Merit ids are written back with one bulk_update and attendance rows with one bulk_create
+            with self.assertNumQueries(2):
+                failed = api.register_students(live_class, self.students, Attendance)
+
+        self.assertEqual(failed, [])
+        self.assertFalse(User.objects.filter(id__in=[user.id for user in self.students],
+                                             merit_user_id__isnull=True).exists())
+        self.assertEqual(Attendance.objects.filter(live_class=live_class).count(), 30)
+
+    def test_failed_provisioning_is_reported(self):
+        live_class = LiveClass.objects.create(batch=self.batch, title='Class', class_id='class-1')
+        with MeritHubStub() as stub:
+            api = stub.configure(MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!'))
+            api.RETRY_BACKOFF = 0
+            original = api.create_user
+
+            def create_user(user_data):
+                if user_data['clientUserId'] == str(self.students[1].id):
+                    raise requests.ConnectionError('unreachable')
+                return original(user_data)
+            api.create_user = create_user
+
+            with self.assertLogs('config.live_video', 'ERROR'):
+                failed = api.register_students(live_class, self.students, Attendance)
+
+        self.assertEqual(failed, [self.students[1]])
+        self.assertEqual(Attendance.objects.filter(live_class=live_class).count(), 29)
+
+    def test_unavailable_service_is_retried(self):
+        with MeritHubStub(error_rate=1) as stub:
+            api = stub.configure(MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!'))
+            api.RETRY_BACKOFF = 0
+            with self.assertLogs('config.live_video', 'ERROR'):
+                failed = api.provision_users(self.students)
+
+        self.assertCountEqual(failed, self.students[1:])
+        self.assertEqual(stub.calls['error'], 29 * api.MAX_RETRIES)
+        self.assertEqual(stub.calls['create_user'], 0)
+
+    def test_only_unprocessed_calls_are_retried(self):
+        api = MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!')
+        api.RETRY_BACKOFF = 0
+
+        def attempts(exc):
+            calls = []
+
+            def call():
+                calls.append(exc)
+                raise exc
+            with self.assertRaises(type(exc)):
+                api._call_with_retry(call)
+            return len(calls)
+
+        def http_error(status_code):
+            response = requests.Response()
+            response.status_code = status_code
+            return requests.HTTPError(response=response)
+
+        # MeritHub may have created the user before these failures
+        for exc in [requests.ReadTimeout(), requests.ConnectionError('Connection aborted'), http_error(500),
+                    http_error(502), http_error(504)]:
+            self.assertEqual(attempts(exc), 1, exc)
+        for exc in [requests.ConnectTimeout(), http_error(429), http_error(503)]:
+            self.assertEqual(attempts(exc), api.MAX_RETRIES, exc)
+
+        # Nothing listens on a port that was just released, the connection is refused
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        calls = []
+
+        def refused():
+            calls.append(1)
+            return requests.get(f'http://127.0.0.1:{port}/', timeout=5)
+        with self.assertRaises(requests.ConnectionError):
+            api._call_with_retry(refused)
+        self.assertEqual(len(calls), api.MAX_RETRIES)
+
+
+@override_settings(JOBS_RUN_EAGERLY=True)
+@override_config(MERITHUB_CLIENT_ID='client', MERITHUB_CLIENT_SECRET='secret-key-of-at-least-32-bytes!')
+class LiveClassJobTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        students = User.objects.bulk_create(
+            User(email=f'student{i}@example.com', phone_number=f'+9170000{i:05d}', full_name=f'Student {i}')
+            for i in range(30))
+        Enrollment.objects.bulk_create(Enrollment(batch=cls.batch, student=student, is_approved=True)
+                                       for student in students)
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.stub = MeritHubStub()
+        self.stub.start()
+        self.addCleanup(self.stub.stop)
+        urls = self.settings(**self.stub.settings())
+        urls.enable()
+        self.addCleanup(urls.disable)
+
+    def create_live_class(self, view=CreateLiveClassView, **data):
+        request = self.factory.post('/create-live-class/', {'batch': self.batch.id, 'title': 'Class', **data},
+                                    format='json')
+        force_authenticate(request, user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = view.as_view()(request)
+        self.assertEqual(response.status_code, 202, response.data)
+        return response.data['job_id']
+
+    def job_status(self, job_id):
+        request = self.factory.get(f'/live-class-jobs/{job_id}/')
+        force_authenticate(request, user=self.user)
+        return LiveClassJobView.as_view()(request, pk=job_id).data
+
+    def test_job_schedules_class_and_reports_progress(self):
+        job_id = self.create_live_class()
+
+        data = self.job_status(job_id)
+        self.assertEqual(data['status'], LiveClassJob.Status.SUCCEEDED)
+        self.assertEqual((data['total_students'], data['provisioned_students'], data['links_generated']), (30, 30, 30))
+        self.assertEqual(data['failed_students'], [])
+        live_class = LiveClass.objects.get(pk__in=data['live_class_ids'])
+        self.assertEqual(live_class.batch, self.batch)
+        self.assertEqual(Attendance.objects.filter(live_class=live_class).count(), 30)
+
+    def test_failed_job_keeps_the_error(self):
+        with mock.patch.object(MeritHubAPI, 'schedule_class', side_effect=requests.ConnectionError('unreachable')), \
+                self.assertLogs('apps.batch.jobs', 'ERROR'):
+            job_id = self.create_live_class()
+
+        data = self.job_status(job_id)
+        self.assertEqual(data['status'], LiveClassJob.Status.FAILED)
+        self.assertEqual(data['error'], 'unreachable')
+        self.assertEqual(data['live_class_ids'], [])
+
+    def test_job_is_only_shown_to_its_owners(self):
+        job_id = self.create_live_class()
+        other = User.objects.create_user(email='other@example.com', phone_number='+919876543211', full_name='Other')
+        request = self.factory.get(f'/live-class-jobs/{job_id}/')
+        force_authenticate(request, user=other)
+        self.assertEqual(LiveClassJobView.as_view()(request, pk=job_id).status_code, 404)
+
+    def test_lost_jobs_are_resumed_or_failed(self):
+        # Neither job reached the worker pool
+        lost = LiveClassJob.objects.create(owner_type=LiveClassJob.OwnerType.BATCH, owner_id=self.batch.id,
+                                           class_data={'title': 'Lost'}, created_by=self.user)
+        interrupted = LiveClassJob.objects.create(owner_type=LiveClassJob.OwnerType.BATCH, owner_id=self.batch.id,
+                                                  class_data={'title': 'Interrupted'}, created_by=self.user,
+                                                  status=LiveClassJob.Status.RUNNING)
+        recent = LiveClassJob.objects.create(owner_type=LiveClassJob.OwnerType.BATCH, owner_id=self.batch.id,
+                                             class_data={'title': 'Recent'}, created_by=self.user)
+        LiveClassJob.objects.exclude(pk=recent.pk).update(modified=timezone.now() - timedelta(hours=1))
+
+        with mock.patch('apps.batch.jobs.run_live_class_job') as run:
+            out = StringIO()
+            call_command('resume_live_class_jobs', stdout=out)
+        run.assert_called_once_with(lost.pk)
+        self.assertIn("1 live class job(s) resumed, 1 marked failed", out.getvalue())
+        interrupted.refresh_from_db()
+        self.assertEqual(interrupted.status, LiveClassJob.Status.FAILED)
+
+        # A job that already started is not run a second time
+        lost.status = LiveClassJob.Status.SUCCEEDED
+        lost.save()
+        with mock.patch.object(MeritHubAPI, 'schedule_classes') as schedule_classes:
+            run_live_class_job(lost.pk)
+        schedule_classes.assert_not_called()
+
+    def create_series(self, count):
+        start = timezone.now() + timedelta(days=1)
+        return self.create_live_class(CreateLiveClassSeriesView, start_time=start.isoformat(),
+                                      recurrence=f'FREQ=DAILY;COUNT={count}')
+
+    def test_series_schedules_every_occurrence(self):
+        with CaptureQueriesContext(connection) as queries:
+            job_id = self.create_series(20)
+
+        data = self.job_status(job_id)
+        self.assertEqual(data['status'], LiveClassJob.Status.SUCCEEDED)
+        self.assertEqual(len(data['occurrences']), 20)
+        self.assertEqual((data['provisioned_students'], data['links_generated']), (30, 600))
+        live_classes = LiveClass.objects.filter(pk__in=data['live_class_ids']).order_by('date')
+        self.assertEqual([live_class.date.isoformat() for live_class in live_classes], data['occurrences'])
+        self.assertEqual(Attendance.objects.filter(live_class__in=live_classes).count(), 600)
+        # Every student is provisioned once for the whole series
+        self.assertEqual((self.stub.calls['create_user'], self.stub.calls['schedule_class'],
+                          self.stub.calls['add_users']), (31, 20, 20))
+
+        # The database work does not grow with the number of occurrences
+        User.objects.update(merit_user_id=None)
+        with CaptureQueriesContext(connection) as fewer_queries:
+            self.create_series(2)
+        self.assertEqual(len(fewer_queries), len(queries))
+
+    def test_invalid_recurrence_is_rejected(self):
+        request = self.factory.post('/create-live-class-series/', {
+            'batch': self.batch.id, 'title': 'Class', 'start_time': (timezone.now() + timedelta(days=1)).isoformat(),
+            'recurrence': 'FREQ=DAILY',
+        }, format='json')
+        force_authenticate(request, user=self.user)
+        response = CreateLiveClassSeriesView.as_view()(request)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('recurrence', response.data['error'])
+        self.assertFalse(LiveClassJob.objects.exists())
+
+
+class MeritHubTokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        MeritHubAPI._local_tokens.clear()
+
+    def test_token_is_shared_between_clients(self):
+        with MeritHubStub() as stub:
+            first = stub.configure(MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!'))
+            first.create_user({'name': 'Student'})
+            # Another worker only sees the Django cache
+            MeritHubAPI._local_tokens.clear()
+            second = stub.configure(MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!'))
+            second.create_user({'name': 'Student'})
+
+        self.assertEqual(stub.calls['token'], 1)
+        self.assertEqual(stub.calls['create_user'], 2)
+        self.assertEqual(first.access_token, second.access_token)
+
+    def test_token_is_refreshed_before_expiry(self):
+        api = MeritHubAPI('client', 'secret-key-of-at-least-32-bytes!')
+        cache.set(api.token_cache_key, ('expiring-token', time.time() + 10))
+        with MeritHubStub() as stub:
+            stub.configure(api).create_user({'name': 'Student'})
+
+        self.assertEqual(stub.calls['token'], 1)
+        self.assertNotEqual(api.access_token, 'expiring-token')
+        self.assertEqual(cache.get(api.token_cache_key)[0], api.access_token)
+
+
+class FeesRecordTests(BatchTestCase):
+    @classmethod
+    def get_batch_fields(cls):
+        return {'fee_structure': FeeStructure.objects.create(structure_name='Monthly', fee_amount=1000,
+                                                             installments=12, frequency='monthly',
+                                                             number_of_values=1)}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = User.objects.bulk_create(
+            User(email=f'student{i}@example.com', phone_number=f'+9170000{i:05d}', full_name=f'Student {i}')
+            for i in range(20))
+        # Six installments are past due, the other six upcoming
+        cls.joined = timezone.now() - relativedelta(months=5, days=1)
+        student = cls.students[0]
+        BatchPurchaseOrder.objects.bulk_create([
+            BatchPurchaseOrder(student=student, batch=cls.batch, installment_number=1, amount=1000, is_paid=True,
+                               payment_date=cls.joined),
+            BatchPurchaseOrder(student=student, batch=cls.batch, installment_number=2, amount=1000, is_paid=True,
+                               payment_date=cls.joined + relativedelta(months=1)),
+            BatchPurchaseOrder(student=student, batch=cls.batch, installment_number=3, amount=1000),
+        ])
+        InstallmentDue.schedule(Enrollment.objects.bulk_create(
+            Enrollment(batch=cls.batch, student=student, is_approved=True, batch_joined_date=cls.joined)
+            for student in cls.students))
+
+    def fees_record(self, status_code=200, **params):
+        request = APIRequestFactory().get('/fees-record/', params)
+        force_authenticate(request, user=self.user)
+        response = FeesRecordAPI.as_view()(request)
+        self.assertEqual(response.status_code, status_code, response.data)
+        return response.data
+
+    def test_query_count_does_not_grow_with_installments(self):
+        with self.assertNumQueries(6):
+            data = self.fees_record(page_size=500)
+
+        # The unpaid order of the third installment leaves it due
+        self.assertEqual(data['counts'], {'paid_fees': 2, 'unpaid_fees': 20 * 6 - 2, 'upcoming_fees': 20 * 6})
+        self.assertEqual(len(data['unpaid_fees']), 118)
+        due_dates = [record['due_date'] for record in data['upcoming_fees']]
+        self.assertEqual(due_dates, sorted(due_dates))
+
+    def test_filters_and_pagination(self):
+        data = self.fees_record(student=self.students[0].id, page=2, page_size=2)
+        self.assertEqual(data['counts'], {'paid_fees': 2, 'unpaid_fees': 4, 'upcoming_fees': 6})
+        self.assertEqual(data['paid_fees'], [])
+        self.assertEqual([record['installment_number'] for record in data['upcoming_fees']], [9, 10])
+
+        due = timezone.localdate(self.joined + relativedelta(months=6))
+        data = self.fees_record(student=self.students[0].id, start_date=due, end_date=due)
+        self.assertEqual(data['counts'], {'paid_fees': 0, 'unpaid_fees': 0, 'upcoming_fees': 1})
+        self.assertEqual(data['upcoming_fees'][0]['installment_number'], 7)
+
+        data = self.fees_record(400, start_date=due, end_date=due - timedelta(days=1))
+        self.assertIn('end_date', data['error'])
+
+    def test_unapproved_enrollments_have_no_dues(self):
+        enrollment = Enrollment.objects.get(batch=self.batch, student=self.students[1])
+        enrollment.is_approved = False
+        enrollment.save()
+
+        data = self.fees_record(student=self.students[1].id)
+        self.assertEqual(data['counts'], {'paid_fees': 0, 'unpaid_fees': 0, 'upcoming_fees': 0})
+
+    def test_fee_structure_changes_reschedule_pending_installments(self):
+        fee_structure = self.batch.fee_structure
+        fee_structure.installments = 10
+        fee_structure.fee_amount = 1200
+        fee_structure.save()
+
+        dues = InstallmentDue.objects.filter(student=self.students[0])
+        self.assertEqual(list(dues.values_list('installment_number', 'amount', 'status')),
+                         [(1, 1000, 'paid'), (2, 1000, 'paid')] + [(i, 1200, 'pending') for i in range(3, 11)])
+
+        self.batch.fee_structure = FeeStructure.objects.create(structure_name='Once', fee_amount=5000, installments=1)
+        self.batch.save()
+        self.assertEqual(list(dues.values_list('installment_number', 'amount', 'status')),
+                         [(1, 1000, 'paid'), (2, 1000, 'paid')])
+        self.assertEqual(list(InstallmentDue.objects.filter(student=self.students[1]).values_list('amount', flat=True)),
+                         [5000])
+
+    def test_reschedule_command(self):
+        InstallmentDue.objects.filter(status=InstallmentDue.Status.PENDING).delete()
+        out = StringIO()
+        call_command('reschedule_installments', '--batch', str(self.batch.id), stdout=out)
+        self.assertIn("1 batch(es) rescheduled, 238 pending installment(s)", out.getvalue())
+        self.assertEqual(InstallmentDue.objects.filter(status=InstallmentDue.Status.PENDING).count(), 238)
+
+    def test_export_streams_every_installment(self):
+        request = APIRequestFactory().get('/fees-record/export/', {'student': self.students[0].id})
+        force_authenticate(request, user=self.user)
+        response = FeesRecordExportView.as_view()(request)
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['status'] for row in rows], ['paid'] * 2 + ['unpaid'] * 4 + ['upcoming'] * 6)
+        self.assertEqual([row['installment_number'] for row in rows[2:]], [str(i) for i in range(3, 13)])
+        self.assertEqual(rows[0]['due_date'], '')
+        self.assertEqual(rows[2]['payment_date'], '')
+
+    def test_enrollment_export_uses_list_filters(self):
+        Enrollment.objects.filter(student=self.students[1]).update(is_approved=False)
+        request = APIRequestFactory().get('/enrollments/export/', {'is_approved': 'false'})
+        force_authenticate(request, user=self.user)
+        response = EnrollmentViewSet.as_view({'get': 'export'})(request)
+
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual([row['email'] for row in rows], [self.students[1].email])
+
+    def test_schedule_follows_approval_and_payment(self):
+        student = User.objects.create_user(email='new@example.com', phone_number='+919876543211', full_name='New')
+        enrollment = Enrollment.objects.create(batch=self.batch, student=student)
+        self.assertFalse(InstallmentDue.objects.filter(enrollment=enrollment).exists())
+
+        enrollment.is_approved = True
+        enrollment.save()
+        dues = list(InstallmentDue.objects.filter(student=student))
+        self.assertEqual([due.installment_number for due in dues], list(range(1, 13)))
+        self.assertEqual(dues[0].due_date, enrollment.batch_joined_date)
+        self.assertEqual(dues[1].due_date, enrollment.batch_joined_date + relativedelta(months=1))
+
+        order = BatchPurchaseOrder.objects.create(student=student, batch=self.batch, installment_number=1,
+                                                  amount=1000)
+        self.assertEqual(InstallmentDue.objects.get(pk=dues[0].pk).status, InstallmentDue.Status.PENDING)
+        order.is_paid = True
+        order.payment_date = timezone.now()
+        order.save()
+        self.assertEqual(InstallmentDue.objects.get(pk=dues[0].pk).purchase_order, order)
+
+        with self.assertNumQueries(1):
+            installments = self.batch.get_installment_details_for_user(student)
+        self.assertEqual([installment['is_paid'] for installment in installments], [True] + [False] * 11)
+        self.assertEqual(installments[1]['due_date'], dues[1].due_date.isoformat())
+
+
+class StudentBatchListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = create_owner()
+        cls.student = User.objects.create_user(email='student@example.com', phone_number='+919876543211',
+                                               full_name='Student')
+        subject = Subject.objects.create(name='Physics')
+        fee_structure = FeeStructure.objects.create(structure_name='Monthly', fee_amount=1000, installments=6,
+                                                    frequency='monthly', number_of_values=1)
+        cls.batches = Batch.objects.bulk_create(
+            Batch(name=f'Batch {i}', batch_code=f'BATCH{i:03d}', start_date=date.today(), subject=subject,
+                  created_by=owner, fee_structure=fee_structure, is_published=True)
+            for i in range(12))
+        # Enrolled in the first eight batches, asked to join the next two
+        for batch in cls.batches[:8]:
+            Enrollment.objects.create(batch=batch, student=cls.student, is_approved=True)
+        for batch in cls.batches[8:10]:
+            Enrollment.objects.create(batch=batch, student=cls.student)
+        order = BatchPurchaseOrder.objects.create(student=cls.student, batch=cls.batches[0], installment_number=1,
+                                                  amount=1000, is_paid=True, payment_date=timezone.now())
+        cls.paid_batch = order.batch_id
+
+    def list_batches(self, viewset, page_size):
+        request = APIRequestFactory().get('/batches/')
+        force_authenticate(request, user=self.student)
+        with override_settings(REST_FRAMEWORK={'PAGE_SIZE': page_size}), \
+                CaptureQueriesContext(connection) as queries:
+            response = viewset.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results'], len(queries)
+
+    def test_purchased_batches_query_count_does_not_grow(self):
+        _, few_queries = self.list_batches(PurchasedBatchViewSet, 2)
+        batches, queries = self.list_batches(PurchasedBatchViewSet, 8)
+
+        self.assertEqual(queries, few_queries)
+        self.assertEqual(len(batches), 8)
+        details = {batch['id']: batch['installment_details'] for batch in batches}
+        self.assertEqual([installment['is_paid'] for installment in details[self.paid_batch]],
+                         [True] + [False] * 5)
+        self.assertTrue(all(installment['due_date'] for installment in details[self.batches[1].pk]))
+
+    def test_available_batches_report_joining_requests(self):
+        batches, queries = self.list_batches(AvailableBatchViewSet, 4)
+
+        self.assertEqual({batch['id']: batch['is_joining_request_sent'] for batch in batches},
+                         {batch.pk: batch in self.batches[8:10] for batch in self.batches[8:]})
+        self.assertEqual([len(batch['installment_details']) for batch in batches], [6] * 4)
+        self.assertLessEqual(queries, 7)
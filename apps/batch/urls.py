@@ -2,10 +2,11 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 from .student_views import AvailableBatchViewSet, PurchasedBatchViewSet, StudentLiveClassesViewSet, \
-    StudentBatchAttendanceViewSet, StudentFeesRecordAPI, StudentBatchClassesView
+    StudentBatchAttendanceViewSet, StudentFeesRecordAPI, StudentBatchClassesView, StudentLiveClassChatView
 from .views import (SubjectViewSet, BatchViewSet, EnrollmentViewSet, LiveClassViewSet, AttendanceViewSet,
                     StudyMaterialViewSet, CreateLiveClassView, FeeStructureViewSet, FeesRecordAPI, FolderFileViewSet,
-                    OfflineClassViewSet, StudentJoinBatchView, AddFeesRecordAPI, BatchReviewViewSet)
+                    OfflineClassViewSet, StudentJoinBatchView, AddFeesRecordAPI, BatchReviewViewSet, LiveClassJobView,
+                    CreateLiveClassSeriesView, FeesRecordExportView)
 
 router = DefaultRouter()
 router.register(r'subjects', SubjectViewSet)
@@ -27,7 +28,10 @@ urlpatterns = [
     path('', include(router.urls)),
     path('', include(student_router.urls)),
     path('create-live-class/', CreateLiveClassView.as_view(), name='create_live_class'),
+    path('create-live-class-series/', CreateLiveClassSeriesView.as_view(), name='create_live_class_series'),
+    path('live-class-jobs/<int:pk>/', LiveClassJobView.as_view(), name='live_class_job'),
     path('fees-record/', FeesRecordAPI.as_view(), name='fees_record'),
+    path('fees-record/export/', FeesRecordExportView.as_view(), name='fees_record_export'),
     path('add-fees-record/', AddFeesRecordAPI.as_view(), name='add_fees_record'),
     path('student/join-batch/', StudentJoinBatchView.as_view(), name='join_batch'),
     path('student/batch-classes/', StudentBatchClassesView.as_view(), name='batch_classes'),
@@ -39,5 +43,6 @@ urlpatterns = [
     path('student/<str:batch>/batches-attendance/', StudentBatchAttendanceViewSet.as_view({'get': 'list'}),
          name='student_batch_attendance'),
     path('student-fees-record/', StudentFeesRecordAPI.as_view(), name='student_fees_record'),
+    path('student/live-classes/<int:pk>/chat/', StudentLiveClassChatView.as_view(), name='student_live_class_chat'),
 
 ]
@@ -1,39 +1,42 @@
-from datetime import timedelta
-from itertools import chain
+import zipfile
 
 from constance import config
-from dateutil.relativedelta import relativedelta
 from django.contrib.auth import get_user_model
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Q
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets, status, mixins
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
-from rest_framework.generics import ListAPIView, get_object_or_404
+from rest_framework.generics import ListAPIView, RetrieveAPIView, get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
-from abstract.views import CustomResponseMixin
-from config.live_video import MeritHubAPI
+from abstract.models import CONTENT_APP_LABELS
+from abstract.views import EXPORT_CHUNK_SIZE, CSVExportMixin, CustomResponseMixin, FolderStructureCacheMixin, \
+    csv_response, get_clone_source, get_manageable_owners
+from .fees import get_fee_ledger
+from .jobs import schedule_live_class
 from .models import Subject, Batch, Enrollment, LiveClass, Attendance, StudyMaterial, FeeStructure, Folder, File, \
-    BatchPurchaseOrder, OfflineClass, BatchFaculty, Schedule, TimeSlot, BatchReview
-from .serializers.attendance_serializers import AttendanceSerializer
+    BatchPurchaseOrder, OfflineClass, BatchFaculty, Schedule, TimeSlot, BatchReview, LiveClassJob
+from .serializers.attendance_serializers import AttendanceSerializer, AttendanceSummarySerializer
 from .serializers.batch_serializers import BatchSerializer, RetrieveBatchSerializer, SubjectSerializer, \
     FolderSerializer, FileSerializer, BatchReviewSerializer
 from .serializers.enrollment_serializers import EnrollmentSerializer, BatchStudentUserSerializer, \
     ListEnrollmentSerializer
-from .serializers.fee_serializers import FeeStructureSerializer, AddFeesRecordSerializer
-from .serializers.liveclass_serializers import LiveClassSerializer, RetrieveLiveClassSerializer, \
-    CreateLiveClassSerializer
+from .serializers.fee_serializers import FeeStructureSerializer, AddFeesRecordSerializer, FeesRecordFilterSerializer
+from .serializers.liveclass_serializers import LiveClassSerializer, CreateLiveClassSerializer, LiveClassJobSerializer, \
+    CreateLiveClassSeriesSerializer
 from .serializers.offline_classes_serializers import OfflineClassSerializer, JoinBatchSerializer
 from .serializers.studymaterial_serializer import StudyMaterialSerializer
+from ..course.models import Course
 from ..payment.models import Transaction
 from ..payment.utils import final_price_with_other_expenses_and_gst
 from ..user.models import Roles
-from ..utils.functions import merge_and_sort_items
+from ..utils.functions import MAX_FOLDER_PAGE_SIZE, decode_item_cursor, get_folder_items, move_item, \
+    set_items_order
 
 User = get_user_model()
 
@@ -45,7 +48,7 @@ class SubjectViewSet(CustomResponseMixin):
     search_fields = ('name', 'description',)
 
 
-class BatchViewSet(CustomResponseMixin):
+class BatchViewSet(FolderStructureCacheMixin, CustomResponseMixin):
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
     retrieve_serializer_class = RetrieveBatchSerializer
@@ -110,17 +113,6 @@ class BatchViewSet(CustomResponseMixin):
         except Batch.DoesNotExist:
             return Response({'error': 'Batch not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-    def build_breadcrumb(self, folder):
-        breadcrumb = []
-        current_folder = folder
-        while current_folder is not None:
-            breadcrumb.append({'id': current_folder.id, 'title': current_folder.title})
-            current_folder = current_folder.parent  # Traverse up to the parent folder
-
-        # Reverse the breadcrumb list to have the root folder at the start
-        breadcrumb.reverse()
-        return breadcrumb
-
     @action(detail=True, methods=['get'], url_path='folder-structure')
     def get_folder_structure(self, request, pk=None):
         batch = self.get_object()
@@ -131,52 +123,60 @@ class BatchViewSet(CustomResponseMixin):
                 folder = Folder.objects.get(id=folder_id, batch=batch)
             except Folder.DoesNotExist:
                 return Response({'detail': 'Folder not found.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            # If no folder_id is provided, return the root folder structure
+            folder, _ = Folder.objects.get_or_create(batch=batch, parent__isnull=True, title='Home')
 
-            # Get files (files) of the current folder
-            files = File.objects.filter(folder=folder).order_by('order')
-            file_serializer = FileSerializer(files, many=True)
-
-            # Get immediate subfolders
-            subfolders = Folder.objects.filter(parent=folder).order_by('order')
-            subfolder_serializer = FolderSerializer(subfolders, many=True)
-
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = self.build_breadcrumb(folder)
-
+        # Optional keyset pagination: ?page_size=<n>, then ?cursor=<next_cursor> for the following pages
+        try:
+            page_size = int(request.query_params.get('page_size', 0))
+            cursor = request.query_params.get('cursor')
+            cursor_key = decode_item_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response({'detail': 'Invalid page_size or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(page_size, MAX_FOLDER_PAGE_SIZE) if page_size > 0 else None
+
+        def build_folder_structure():
+            items, next_cursor = get_folder_items(folder, cursor_key, page_size)
             folder_structure = {
                 'id': folder.id,
                 'title': folder.title,
-                'items': merged_structure
+                'items': items,
+                'next_cursor': next_cursor
             }
-        else:
-            # If no folder_id is provided, return the root folder structure
-            root_folder, _ = Folder.objects.get_or_create(batch=batch, parent__isnull=True, title='Home')
-
-            # Get files (files) of the current folder
-            file_serializer = FileSerializer(root_folder.files.all().order_by('order'), many=True)
-
-            # Get immediate subfolders
-            subfolder_serializer = FolderSerializer(root_folder.folders.all().order_by('order'), many=True)
+            return {'batch_id': batch.id, 'folder_structure': folder_structure, 'breadcrumb': folder.get_breadcrumb()}
 
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = [{'id': root_folder.id, 'title': root_folder.title}]
+        return self.folder_structure_response(request, folder, build_folder_structure,
+                                              variant=f'{page_size}:{cursor}' if page_size or cursor else '')
 
-            folder_structure = {
-                'id': root_folder.id,
-                'title': root_folder.title,
-                'items': merged_structure
-            }
-
-        return Response({'batch_id': batch.id, 'folder_structure': folder_structure, 'breadcrumb': breadcrumb},
-                        status=status.HTTP_200_OK)
+    @action(detail=True, methods=['get'], url_path='low-attendance')
+    def low_attendance(self, request, pk=None):
+        """Students of the batch whose attendance is below ATTENDANCE_CRITERIA, lowest first."""
+        batch = self.get_object()
+        summaries = batch.attendance_summaries.filter(
+            percentage__lt=config.ATTENDANCE_CRITERIA).select_related('student').order_by('percentage', 'id')
+        return Response({'criteria': config.ATTENDANCE_CRITERIA,
+                         'students': AttendanceSummarySerializer(summaries, many=True).data})
 
 
-class EnrollmentViewSet(CustomResponseMixin):
+class EnrollmentViewSet(CSVExportMixin, CustomResponseMixin):
     serializer_class = EnrollmentSerializer
     queryset = Enrollment.objects.all()
     list_serializer_class = ListEnrollmentSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_fields = ('batch', 'student', 'is_approved')
+    export_filename = 'enrollments.csv'
+    export_fields = {
+        'id': 'id',
+        'batch': 'batch__name',
+        'student': 'student__full_name',
+        'email': 'student__email',
+        'phone_number': 'student__phone_number',
+        'is_approved': 'is_approved',
+        'approved_by': 'approved_by__full_name',
+        'batch_joined_date': 'batch_joined_date',
+        'created': 'created',
+    }
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -234,9 +234,23 @@ class LiveClassViewSet(mixins.DestroyModelMixin,
     serializer_class = LiveClassSerializer
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(CSVExportMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_fields = ('live_class', 'live_class__batch', 'student', 'attended')
+    export_filename = 'attendance.csv'
+    export_fields = {
+        'id': 'id',
+        'batch': 'live_class__batch__name',
+        'live_class': 'live_class__title',
+        'class_date': 'live_class__date',
+        'student': 'student__full_name',
+        'email': 'student__email',
+        'attended': 'attended',
+        'start_time': 'start_time',
+        'total_time': 'total_time',
+    }
 
 
 class StudyMaterialViewSet(viewsets.ModelViewSet):
@@ -245,20 +259,16 @@ class StudyMaterialViewSet(viewsets.ModelViewSet):
 
 
 class CreateLiveClassView(APIView):
+    serializer_class = CreateLiveClassSerializer
 
     def post(self, request):
-        serializer = CreateLiveClassSerializer(data=request.data)
+        serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         # Extract validated data
         validated_data = serializer.validated_data
         batch = validated_data['batch']
 
-        # Assuming you have configured your client ID and secret key in settings
-        client_id = config.MERITHUB_CLIENT_ID
-        secret_key = config.MERITHUB_CLIENT_SECRET
-        api = MeritHubAPI(client_id, secret_key)
-
         # Prepare the class data
         class_data = {
             'title': validated_data['title'],
@@ -276,61 +286,35 @@ class CreateLiveClassView(APIView):
             'recording': validated_data['recording'],
             'participantControl': validated_data['participantControl']
         }
-        try:
-            data = api.schedule_class(
-                user_id=self.request.user.id,
-                class_data=class_data,
-            )
-            live_class = LiveClass.objects.create(
-                batch=batch,
-                title=class_data['title'],
-                class_id=data['classId'],
-                date=class_data['startTime'],
-                host_link=api.generate_url(data['hostLink']),
-                common_host_link=api.generate_url(data['commonLinks']['commonHostLink']),
-                common_moderator_link=api.generate_url(data['commonLinks']['commonModeratorLink']),
-                common_participant_link=api.generate_url(data['commonLinks']['commonParticipantLink'])
-            )
-            enrolled_students = Enrollment.objects.filter(batch=batch, is_approved=True)
-            students = []
-            for student in enrolled_students:
-                user = student.student
-                if not user.merit_user_id:
-                    response = api.create_user({
-                        'name': user.full_name,
-                        'email': user.email,
-                        'clientUserId': str(user.id),
-                        "role": "M",
-                        "timeZone": "Asia/Kolkata",
-                        "permission": "CJ"
-                    })
-                    user.merit_user_id = response['userId']
-                    user.save()
-                common_participant_link = live_class.common_participant_link
-                user_link = ""
-                if common_participant_link:
-                    user_link = common_participant_link.split('/')[-1]
-                students.append({
-                    "userId": user.merit_user_id,
-                    "userLink": user_link,
-                    "userType": "su"
-                })
-            # Now add users in live class
-            response = api.add_students_to_class(class_id=live_class.class_id, users=students)
-            for student in response:
-                try:
-                    user = User.objects.get(merit_user_id=student['userId'])
-                    live_class_link = api.generate_url(student['userLink'])
-                    Attendance.objects.create(student=user, live_class=live_class, live_class_link=live_class_link)
-                except User.DoesNotExist:
-                    print(f"User {student['userId']}")
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Serialize the created class (assuming you have a serializer for this)
-        retrieve_serializer = RetrieveLiveClassSerializer(instance=live_class)
-        return Response(retrieve_serializer.data, status=status.HTTP_201_CREATED)
+        # MeritHub is called from a background job, poll the job for its progress
+        job = schedule_live_class(LiveClassJob.OwnerType.BATCH, batch.pk, class_data, request.user,
+                                  occurrences=validated_data.get('occurrences'),
+                                  recurrence=validated_data.get('recurrence', ''))
+        return Response({'job_id': job.pk, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+class CreateLiveClassSeriesView(CreateLiveClassView):
+    """Schedule a class at every occurrence of a recurrence rule, see LiveClassSeriesMixin."""
+    serializer_class = CreateLiveClassSeriesSerializer
+
+
+class LiveClassJobView(RetrieveAPIView):
+    """Progress of a live class scheduled through CreateLiveClassView or CreateCourseLiveClassView."""
+    queryset = LiveClassJob.objects.all()
+    serializer_class = LiveClassJobSerializer
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_superuser or user.role == Roles.ADMIN:
+            return self.queryset
+        # Jobs list students and errors, only their creator and the owner of the batch or course may read them
+        batches = Batch.objects.filter(created_by=user).values('id')
+        courses = Course.objects.filter(created_by=user).values('id')
+        return self.queryset.filter(
+            Q(created_by=user)
+            | Q(owner_type=LiveClassJob.OwnerType.BATCH, owner_id__in=batches)
+            | Q(owner_type=LiveClassJob.OwnerType.COURSE, owner_id__in=courses)
+        )
 
 
 class CreateOfflineClassView(APIView):
@@ -393,91 +377,72 @@ class AddFeesRecordAPI(APIView):
 
 
 class FeesRecordAPI(ListAPIView):
+    """
+    Paid, unpaid (past due) and upcoming installments of all approved enrollments, see get_fee_ledger.
+    Filter with `batch`, `student`, `start_date` and `end_date` (payment date for paid installments, due date for the
+    others, both inclusive). Every list is paginated with `page` and `page_size`, `counts` holds the full sizes.
+    """
 
     def get(self, request, *args, **kwargs):
-        now = timezone.now()
-        unpaid_fees = []
-        upcoming_fees = []
-        paid_fees = []
-        # 1. Fetch all BatchPurchaseOrders marked as paid
-        paid_fees_data = BatchPurchaseOrder.objects.filter(is_paid=True).values(
-            'student__full_name', 'batch__name', 'payment_date', 'installment_number'
-        ).annotate(total_paid=Sum('amount'))
-
-        for data in paid_fees_data:
-            paid_fees.append({
+        filters = FeesRecordFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        offset = (params['page'] - 1) * params['page_size']
+        page = slice(offset, offset + params['page_size'])
+        ledger = get_fee_ledger(params.get('batch'), params.get('student'), params['start'], params['end'])
+
+        paid_fees = [{
+            'student_name': data['student__full_name'],
+            'amount': data['amount'],
+            'batch_name': data['batch__name'],
+            'payment_date': data['payment_date'],
+            'installment_number': data['installment_number'],
+        } for data in ledger['paid_fees'].values(
+            'student__full_name', 'batch__name', 'payment_date', 'installment_number', 'amount')[page]]
+
+        response_data = {'paid_fees': paid_fees}
+        for name in ('unpaid_fees', 'upcoming_fees'):
+            response_data[name] = [{
                 'student_name': data['student__full_name'],
-                'amount': data['total_paid'],
+                'student_email': data['student__email'],
                 'batch_name': data['batch__name'],
-                'payment_date': data.get('payment_date', ""),
-                'installment_number': data.get('installment_number', ""),
-            })
+                'installment_number': data['installment_number'],
+                'amount': data['amount'],
+                'due_date': data['due_date'],
+            } for data in ledger[name].values('student__full_name', 'student__email', 'batch__name',
+                                              'installment_number', 'amount', 'due_date')[page]]
+
+        response_data.update({
+            'counts': {name: queryset.count() for name, queryset in ledger.items()},
+            'page': params['page'],
+            'page_size': params['page_size'],
+        })
+        return Response(response_data)
 
-        # 2. Fetch approved enrollments with a batch, student, and batch_joined_date
-        enrollments = Enrollment.objects.filter(is_approved=True).select_related(
-            'batch__fee_structure', 'student'
-        )
 
-        for enrollment in enrollments:
-            batch = enrollment.batch
-            student = enrollment.student
-            fee_structure = batch.fee_structure
-            if not fee_structure:
-                continue  # Skip if there's no fee structure
-
-            # Get frequency, number_of_values, and installments
-            frequency = fee_structure.frequency
-            interval = fee_structure.number_of_values
-            num_installments = fee_structure.installments
-            fee_amount = fee_structure.fee_amount
-            join_date = enrollment.batch_joined_date
-
-            # Define date increment based on frequency and number_of_values
-            if frequency == 'weekly':
-                date_increment = timedelta(weeks=interval)
-            elif frequency == 'monthly':
-                date_increment = relativedelta(months=interval)
-            else:
-                date_increment = relativedelta(months=1)  # Default to monthly if frequency is unknown
-
-            for installment_num in range(1, num_installments + 1):
-                due_date = join_date + (installment_num - 1) * date_increment
-
-                # Check if a corresponding BatchPurchaseOrder already exists
-                order_exists = BatchPurchaseOrder.objects.filter(
-                    student=student,
-                    batch=batch,
-                    installment_number=installment_num,
-                ).exists()
-
-                if order_exists:
-                    continue  # Skip if BatchPurchaseOrder record already exists
-
-                # Categorize based on due date and payment status
-                record = {
-                    'student_name': student.full_name,
-                    'student_email': student.email,
-                    'batch_name': batch.name,
-                    'installment_number': installment_num,
-                    'amount': fee_amount,
-                    'due_date': due_date,
-                }
-
-                if due_date < now:
-                    # Past-due unpaid installment
-                    unpaid_fees.append(record)
-                else:
-                    # Upcoming installment
-                    upcoming_fees.append(record)
-
-        # Structure response with grouped data
-        response_data = {
-            'paid_fees': paid_fees,
-            'unpaid_fees': unpaid_fees,
-            'upcoming_fees': upcoming_fees,
-        }
+class FeesRecordExportView(APIView):
+    """Stream the fee ledger of FeesRecordAPI as CSV, one row per installment, with the same filters."""
+    header = ['status', 'student_name', 'student_email', 'batch_name', 'installment_number', 'amount', 'due_date',
+              'payment_date']
 
-        return Response(response_data)
+    def get(self, request, *args, **kwargs):
+        filters = FeesRecordFilterSerializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        params = filters.validated_data
+        ledger = get_fee_ledger(params.get('batch'), params.get('student'), params['start'], params['end'])
+        return csv_response('fees-record.csv', self.header, self.rows(ledger))
+
+    @staticmethod
+    def rows(ledger):
+        for row in ledger['paid_fees'].values_list(
+                'student__full_name', 'student__email', 'batch__name', 'installment_number', 'amount',
+                'payment_date').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield ('paid', *row[:5], '', row[5])
+        for status_name in ('unpaid', 'upcoming'):
+            for row in ledger[f'{status_name}_fees'].values_list(
+                    'student__full_name', 'student__email', 'batch__name', 'installment_number', 'amount',
+                    'due_date').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+                yield (status_name, *row, '')
 
 
 class FolderFileViewSet(viewsets.ViewSet):
@@ -514,7 +479,9 @@ class FolderFileViewSet(viewsets.ViewSet):
         request.data['folder'] = folder.id  # Set folder ID in request data
         serializer = FileSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                file = serializer.save()
+                folder.apply_file_counters(file)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -538,16 +505,33 @@ class FolderFileViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['delete'], url_path='folders/(?P<folder_id>[^/.]+)/delete-folder')
     def delete_folder(self, request, pk=None, folder_id=None):
         folder = get_object_or_404(Folder, id=folder_id)
-        folder.delete()  # Delete the folder
+        folder.delete_subtree()  # Delete the folder with all its subfolders and files
         return Response({'status': 'Folder deleted'}, status=status.HTTP_204_NO_CONTENT)
 
     # 6. Delete a file
     @action(detail=True, methods=['delete'], url_path='files/(?P<file_id>[^/.]+)/delete-file')
     def delete_file(self, request, pk=None, file_id=None):
-        file = get_object_or_404(File, id=file_id)
-        file.delete()  # Delete the file
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        with transaction.atomic():
+            file.folder.apply_file_counters(file, sign=-1)
+            file.delete()  # Delete the file
         return Response({'status': 'File deleted'}, status=status.HTTP_204_NO_CONTENT)
 
+    # Move a file to another folder and/or replace its uploaded content
+    @action(detail=True, methods=['patch'], url_path='files/(?P<file_id>[^/.]+)/update-file')
+    def update_file(self, request, pk=None, file_id=None):
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        old_folder = file.folder
+        serializer = FileSerializer(file, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            old_folder.apply_file_counters(file, sign=-1)
+            file = serializer.save()
+            file.folder.apply_file_counters(file)
+            if file.folder_id != old_folder.id:
+                old_folder.touch()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     # 7. Toggle lock status of a file (lock/unlock)
     @action(detail=True, methods=['patch'], url_path='files/(?P<file_id>[^/.]+)/toggle-lock-file')
     def toggle_lock_file(self, request, pk=None, file_id=None):
@@ -578,44 +562,79 @@ class FolderFileViewSet(viewsets.ViewSet):
         except model.DoesNotExist:
             return Response({'error': f'{item_type.capitalize()} not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Determine parent directory
+        # Determine parent directory, root folders are only ordered against the other roots of their owner
         parent = item.parent if item_type == 'folder' else item.folder
+        folders = Folder.objects.filter(parent=parent)
+        if parent is None:
+            owner_field = f'{Folder.owner_field}_id'
+            folders = folders.filter(**{owner_field: getattr(item, owner_field)})
+        files = File.objects.filter(folder=parent)
 
         with transaction.atomic():
-            # Fetch all siblings (folders and files) in the parent directory
-            folders = Folder.objects.filter(parent=parent).order_by('order')
-            files = File.objects.filter(folder=parent).order_by('order')
-
-            # Combine and sort by order
-            siblings = sorted(chain(folders, files), key=lambda x: x.order)
-
-            # Normalize order values to avoid gaps or duplicates
-            for index, sibling in enumerate(siblings, start=1):
-                if sibling.order != index:
-                    sibling.order = index
-                    sibling.save()
-
-            # update item object after setting indexing
-            item = model.objects.get(id=item_id)
-            # Find adjacent item to swap with
-            current_index = siblings.index(item)
-            if direction == 'up' and current_index > 0:
-                adjacent_item = siblings[current_index - 1]
-            elif direction == 'down' and current_index < len(siblings) - 1:
-                adjacent_item = siblings[current_index + 1]
-            else:
+            if not move_item(item, [folders, files], direction):
                 return Response(
                     {'error': f'{item_type.capitalize()} is already at the {"top" if direction == "up" else "bottom"}'},
                     status=status.HTTP_400_BAD_REQUEST)
 
-            # Swap order values
-            item.order, adjacent_item.order = adjacent_item.order, item.order
-            item.save()
-            adjacent_item.save()
-
         return Response({'message': f'{item_type.capitalize()} moved {direction} successfully'},
                         status=status.HTTP_200_OK)
 
+    # 9. Replace the order of everything inside a folder in one go
+    @action(detail=True, methods=['put'], url_path='folders/(?P<folder_id>[^/.]+)/set-order')
+    def set_order(self, request, pk=None, folder_id=None):
+        """
+        Apply a full new order to a folder's subfolders and files, e.g. after a drag and drop.
+
+        Expects `items`: the complete sibling sequence as a list of {"id": ..., "type": "folder" | "file"}.
+        """
+        folder = get_object_or_404(Folder, id=folder_id)
+        items = request.data.get('items')
+        if not isinstance(items, list):
+            return Response({'error': 'items must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            error = set_items_order(items, folder.folders.all(), folder.files.all())
+            if not error:
+                folder.touch()
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'message': 'Order updated successfully'}, status=status.HTTP_200_OK)
+
+    # 10. Copy a folder tree of any batch, course or free resource into a folder of the batch
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/clone-content')
+    def clone_content(self, request, pk=None, folder_id=None):
+        """
+        Expects `source_type` ('batch', 'course' or 'free_resource') and `source_folder_id`. The source folder is
+        copied with its whole subtree as the last item of the target folder.
+
+        Both the target and the source must belong to a batch, course or free resource the user manages (see
+        get_manageable_owners), otherwise they are reported as not found.
+        """
+        folder = get_object_or_404(Folder, id=folder_id, batch__in=get_manageable_owners(Batch, request.user),
+                                   batch_id=pk)
+        source_type = request.data.get('source_type')
+        if source_type not in CONTENT_APP_LABELS:
+            return Response({'error': 'Invalid source_type'}, status=status.HTTP_400_BAD_REQUEST)
+        source = get_clone_source(request.user, source_type, request.data.get('source_folder_id'))
+
+        clone = folder.clone_subtree(source)
+        return Response(FolderSerializer(clone).data, status=status.HTTP_201_CREATED)
+
+    # 11. Import a ZIP archive of folders and files into a folder of the batch
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/import-zip')
+    def import_zip(self, request, pk=None, folder_id=None):
+        folder = get_object_or_404(Folder, id=folder_id, batch_id=pk)
+        archive = request.FILES.get('archive')
+        if archive is None or not zipfile.is_zipfile(archive):
+            return Response({'error': 'A ZIP archive is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            imported = folder.import_zip(archive)
+        except zipfile.BadZipFile as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(imported, status=status.HTTP_201_CREATED)
+
 
 class OfflineClassViewSet(CustomResponseMixin):
     queryset = OfflineClass.objects.all()
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:05
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _count_past_usage(apps, schema_editor):
+    """Count the completed transactions of each student per coupon, Coupon.increment_usage counts new ones."""
+    Transaction = apps.get_model('payment', 'Transaction')
+    CouponUsage = apps.get_model('coupon', 'CouponUsage')
+    usages = (Transaction.objects.filter(coupon__isnull=False, payment_status='completed')
+              .values('coupon_id', 'user_id').annotate(used=Count('id')).order_by())
+    CouponUsage.objects.bulk_create(
+        (CouponUsage(coupon_id=usage['coupon_id'], student_id=usage['user_id'], used=usage['used'])
+         for usage in usages.iterator()),
+        batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coupon', '0009_coupon_is_expired'),
+        ('payment', '0005_alter_transaction_invoice_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CouponUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('used', models.PositiveIntegerField(default=0, verbose_name='Times Used')),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usages', to='coupon.coupon')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_usages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Coupon Usage',
+                'verbose_name_plural': 'Coupon Usages',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='couponusage',
+            constraint=models.UniqueConstraint(fields=('coupon', 'student'), name='unique_coupon_usage'),
+        ),
+        migrations.RunPython(_count_past_usage, migrations.RunPython.noop),
+    ]
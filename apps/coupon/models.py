@@ -1,6 +1,13 @@
+import uuid
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
 from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from django_extensions.db.models import TimeStampedModel
 from rest_framework.exceptions import ValidationError
@@ -50,6 +57,8 @@ class Coupon(TimeStampedModel):
 
     total_applied = models.PositiveIntegerField(default=0, verbose_name="Total Applied")
 
+    LOOKUP_VERSION_KEY = 'coupons:version'
+
     class Meta:
         verbose_name = "Coupon"
         verbose_name_plural = "Coupons"
@@ -68,6 +77,42 @@ class Coupon(TimeStampedModel):
         if self.lifetime:
             self.end_datetime = None
         super().save(**kwargs)
+        transaction.on_commit(self.invalidate_lookups)
+
+    @classmethod
+    def lookup_version(cls):
+        """
+        Version of the coupons, cached lookups are keyed by it. It changes when a coupon is saved or deleted, queryset
+        updates of coupon fields must call invalidate_lookups. Usage counting keeps it, see has_uses_left.
+        """
+        version = cache.get(cls.LOOKUP_VERSION_KEY)
+        if version is None:
+            cache.add(cls.LOOKUP_VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(cls.LOOKUP_VERSION_KEY)
+        return version
+
+    @classmethod
+    def invalidate_lookups(cls):
+        cache.set(cls.LOOKUP_VERSION_KEY, uuid.uuid4().hex, None)
+
+    @classmethod
+    def get_active(cls, code):
+        """
+        The active, visible coupon with this code, or None. Lookups are cached until a coupon is saved or deleted,
+        see lookup_version, with students and courses held as frozensets so eligibility checks are set lookups. The
+        instance is shared and read-only, and its total_applied goes stale, use has_uses_left to check the usage
+        limit.
+        """
+        cache_key = f"coupons:{cls.lookup_version()}:{code}"
+        coupon = cache.get(cache_key)
+        if coupon is None:
+            coupon = cls.objects.filter(code=code, status=True, is_visible=True).first()
+            if coupon:
+                coupon.students = frozenset(coupon.students or ())
+                coupon.courses = frozenset(coupon.courses or ())
+            # Unknown codes are cached too, a new coupon changes the version
+            cache.set(cache_key, coupon or False, settings.COUPON_CACHE_TIMEOUT)
+        return coupon or None
 
     def apply_discount(self, original_price: float, user, course):
         """
@@ -123,6 +168,12 @@ class Coupon(TimeStampedModel):
 
         return discounted_price, discount_amount
 
+    def has_uses_left(self):
+        """Whether the coupon is below max_uses, read from the database since the counter changes on every use."""
+        if not self.max_uses:
+            return True
+        return Coupon.objects.filter(pk=self.pk, total_applied__lt=self.max_uses).exists()
+
     def is_valid(self):
         """
         Check if the coupon is currently valid.
@@ -138,14 +189,53 @@ class Coupon(TimeStampedModel):
             return False
         return True
 
-    def increment_usage(self):
+    def increment_usage(self, user):
         """
-        Increment the total_applied count when a coupon is used.
-        Ensures thread safety using atomic transactions.
+        Count a use of the coupon by `user`. Both limits are checked by conditional UPDATE statements, so concurrent
+        checkouts never read and rewrite the coupon row. Raises ValueError, and counts nothing, when a limit is
+        reached.
         """
         with transaction.atomic():
-            self.refresh_from_db()
-            if self.max_uses and self.total_applied >= self.max_uses:
+            CouponUsage.objects.bulk_create([CouponUsage(coupon=self, student=user)], ignore_conflicts=True)
+            usages = CouponUsage.objects.filter(coupon=self, student=user)
+            if self.usage_per_student:
+                usages = usages.filter(used__lt=self.usage_per_student)
+            if not usages.update(used=F('used') + 1, modified=timezone.now()):
+                raise ValueError("Coupon usage limit per student reached.")
+
+            coupons = Coupon.objects.filter(pk=self.pk)
+            if self.max_uses:
+                coupons = coupons.filter(total_applied__lt=self.max_uses)
+            if not coupons.update(total_applied=F('total_applied') + 1):
                 raise ValueError("Coupon usage limit reached.")
-            self.total_applied += 1
-            self.save()
+        self.total_applied += 1
+
+    def usage_left_for(self, user):
+        """Whether `user` may still use the coupon, by the per-student limit."""
+        if not self.usage_per_student:
+            return True
+        used = CouponUsage.objects.filter(coupon=self, student=user).values_list('used', flat=True).first() or 0
+        return used < self.usage_per_student
+
+
+@receiver(post_delete, sender=Coupon)
+def _coupon_deleted(sender, **kwargs):
+    # Also sent for every coupon of a queryset delete, which bypasses Coupon.delete
+    transaction.on_commit(Coupon.invalidate_lookups)
+
+
+class CouponUsage(TimeStampedModel):
+    """Number of times a student used a coupon, counted by Coupon.increment_usage."""
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='usages')
+    student = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coupon_usages')
+    used = models.PositiveIntegerField(default=0, verbose_name="Times Used")
+
+    class Meta:
+        verbose_name = "Coupon Usage"
+        verbose_name_plural = "Coupon Usages"
+        constraints = [
+            models.UniqueConstraint(fields=['coupon', 'student'], name='unique_coupon_usage'),
+        ]
+
+    def __str__(self):
+        return f"{self.coupon} - {self.student} ({self.used})"
@@ -1,3 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from .models import Coupon, CouponUsage
+
+User = get_user_model()
+
+
+class CouponUsageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', phone_number='+919876543210',
+                                             full_name='Owner')
+        cls.student = User.objects.create_user(email='student@example.com', phone_number='+919876543211',
+                                               full_name='Student')
+        cls.other = User.objects.create_user(email='other@example.com', phone_number='+919876543212',
+                                             full_name='Other')
+        cls.coupon = Coupon.objects.create(name='Welcome', code='WELCOME', discount_type='fixed', discount_value=100,
+                                           start_datetime=timezone.now(), lifetime=True, max_uses=3,
+                                           usage_per_student=2, created_by=cls.owner)
+
+    def test_usage_is_counted_per_student(self):
+        self.coupon.increment_usage(self.student)
+        self.coupon.increment_usage(self.student)
+        self.coupon.increment_usage(self.other)
+
+        self.assertEqual(self.coupon.total_applied, 3)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.total_applied, 3)
+        self.assertEqual(dict(self.coupon.usages.values_list('student', 'used')), {self.student.pk: 2,
+                                                                                   self.other.pk: 1})
+        self.assertFalse(self.coupon.usage_left_for(self.student))
+        self.assertTrue(self.coupon.usage_left_for(self.other))
+
+    def test_per_student_limit(self):
+        self.coupon.increment_usage(self.student)
+        self.coupon.increment_usage(self.student)
+
+        with self.assertRaisesMessage(ValueError, "Coupon usage limit per student reached."):
+            self.coupon.increment_usage(self.student)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.total_applied, 2)
+        self.assertEqual(CouponUsage.objects.get(student=self.student).used, 2)
+
+    def test_total_limit(self):
+        Coupon.objects.filter(pk=self.coupon.pk).update(total_applied=3)
+
+        with self.assertRaisesMessage(ValueError, "Coupon usage limit reached."):
+            self.coupon.increment_usage(self.other)
+        # The per-student count is rolled back with the coupon
+        self.assertFalse(CouponUsage.objects.filter(student=self.other, used__gt=0).exists())
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.total_applied, 3)
+
+    def test_coupon_row_is_not_read(self):
+        # Insert of the usage row, two conditional updates, plus the savepoint
+        with self.assertNumQueries(5):
+            self.coupon.increment_usage(self.student)
+
+
+class CouponLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(email='owner@example.com', phone_number='+919876543210',
+                                             full_name='Owner')
+        cls.coupon = Coupon.objects.create(name='Private', code='PRIVATE', discount_type='percentage',
+                                           discount_value=10, start_datetime=timezone.now(), lifetime=True,
+                                           coupon_type='private', students=list(range(1000)), courses=[1, 2],
+                                           created_by=cls.owner)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_lookup_is_cached(self):
+        coupon = Coupon.get_active('PRIVATE')
+        with self.assertNumQueries(0):
+            self.assertEqual(Coupon.get_active('PRIVATE').pk, coupon.pk)
+        self.assertEqual(coupon.students, frozenset(range(1000)))
+        self.assertEqual(coupon.courses, frozenset({1, 2}))
+
+        self.assertIsNone(Coupon.get_active('UNKNOWN'))
+        with self.assertNumQueries(0):
+            self.assertIsNone(Coupon.get_active('UNKNOWN'))
+
+    def test_lookup_follows_coupon_changes(self):
+        Coupon.get_active('PRIVATE')
+        # Usage counting keeps the cached lookup
+        self.coupon.increment_usage(self.owner)
+        with self.assertNumQueries(0):
+            Coupon.get_active('PRIVATE')
+
+        self.coupon.status = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.coupon.save()
+        self.assertIsNone(Coupon.get_active('PRIVATE'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Coupon.objects.create(name='New', code='NEW', discount_type='fixed', discount_value=50,
+                                          start_datetime=timezone.now(), lifetime=True, created_by=self.owner)
+        self.assertEqual(Coupon.get_active('NEW').name, 'New')
+        # A queryset delete skips Coupon.delete, the post_delete signal still changes the version
+        with self.captureOnCommitCallbacks(execute=True):
+            Coupon.objects.filter(pk=other.pk).delete()
+        self.assertIsNone(Coupon.get_active('NEW'))
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import F
+
+# Keep in sync with apps.utils.functions.ORDER_GAP
+ORDER_GAP = 1024
+
+
+def spread_order(apps, schema_editor):
+    # Leave room between existing positions so a single move only has to rewrite the moved row
+    for model_name in ('Folder', 'File'):
+        apps.get_model('course', model_name).objects.update(order=F('order') * ORDER_GAP)
+
+
+def compact_order(apps, schema_editor):
+    for model_name in ('Folder', 'File'):
+        apps.get_model('course', model_name).objects.update(order=F('order') / ORDER_GAP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0016_content_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(spread_order, compact_order),
+    ]
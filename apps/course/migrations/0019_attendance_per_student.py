@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0018_folder_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='courseattendance',
+            name='live_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_attendances', to='course.courseliveclass'),
+        ),
+    ]
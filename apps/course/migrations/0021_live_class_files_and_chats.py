@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-18 07:20
+
+import django.db.models.deletion
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('course', '0020_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseLiveClassChat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('channel', models.CharField(choices=[('public', 'Public'), ('private', 'Private')], max_length=10, verbose_name='Channel')),
+                ('transcript', models.FileField(upload_to='live_class_chats/', verbose_name='Transcript')),
+                ('message_count', models.PositiveIntegerField(default=0, verbose_name='Message Count')),
+                ('chunk_offsets', models.JSONField(default=list, verbose_name='Chunk Offsets')),
+                ('live_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chats', to='course.courseliveclass')),
+            ],
+            options={
+                'verbose_name': 'Course Live Class Chat',
+                'verbose_name_plural': 'Course Live Class Chats',
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseLiveClassFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('name', models.CharField(blank=True, max_length=255, verbose_name='File Name')),
+                ('url', models.URLField(blank=True, max_length=1000, verbose_name='File URL')),
+                ('details', models.JSONField(default=dict, verbose_name='Details')),
+                ('live_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shared_files', to='course.courseliveclass')),
+            ],
+            options={
+                'verbose_name': 'Course Live Class File',
+                'verbose_name_plural': 'Course Live Class Files',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='courseliveclasschat',
+            constraint=models.UniqueConstraint(fields=('live_class', 'channel'), name='unique_course_live_class_chat'),
+        ),
+    ]
@@ -3,8 +3,10 @@ from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django_extensions.db.models import TimeStampedModel, TitleSlugDescriptionModel, ActivatorModel
 
-from abstract.models import AbstractReview
+from abstract.models import AbstractContentCounters, AbstractReview, AbstractFolder, AbstractAttendanceSummary, \
+    AbstractLiveClassChat, AbstractLiveClassFile
 from apps.user.models import Student
+from apps.utils.functions import build_content_tree
 
 User = get_user_model()
 
@@ -36,7 +38,7 @@ class Subcategory(TimeStampedModel, TitleSlugDescriptionModel, ActivatorModel):
         return self.title
 
 
-class Course(TimeStampedModel):
+class Course(TimeStampedModel, AbstractContentCounters):
     VALIDITY_CHOICES = [
         ('single', 'Single Validity'),
         ('multiple', 'Multiple Validity'),
@@ -95,13 +97,15 @@ class Course(TimeStampedModel):
 
     def calculate_price(self, validity_period=None):
         if self.validity_type == 'multiple':
+            # Picked in Python so prefetched validity periods are used as they are
+            all_pricing = sorted(self.validity_periods.all(), key=lambda pricing: pricing.pk)
             if validity_period:
-                return self.validity_periods.get(id=validity_period).effective_price
-            all_pricing = self.validity_periods.all()
-            if all_pricing.filter(is_promoted=True).exists():
-                return all_pricing.filter(is_promoted=True).first().effective_price
-            else:
-                return all_pricing.first().effective_price
+                for pricing in all_pricing:
+                    if pricing.pk == int(validity_period):
+                        return pricing.effective_price
+                raise CourseValidityPeriod.DoesNotExist("CourseValidityPeriod matching query does not exist.")
+            promoted = [pricing for pricing in all_pricing if pricing.is_promoted]
+            return (promoted or all_pricing)[0].effective_price
 
         else:
             return self.effective_price
@@ -115,68 +119,7 @@ class Course(TimeStampedModel):
 
     @property
     def content(self):
-        # Define the file extensions for videos and images
-        VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
-        IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
-
-        # Initialize counts
-        counts = {
-            'videos': 0,
-            'images': 0,
-            'total_files': 0
-        }
-
-        def fetch_folder_structure(folder):
-            nonlocal counts  # Allows access to the counts dictionary defined in the outer scope
-
-            folder_data = {
-                'id': folder.id,
-                'title': folder.title,
-                'files': [],
-                'subfolders': []
-            }
-            # Fetch files within the folder
-            for file in folder.files.all():
-                # Determine the file extension
-                extension = file.url.name.rsplit('.', 1)[-1].lower()
-
-                # Increment counts based on file type
-                if extension in VIDEO_EXTENSIONS:
-                    counts['videos'] += 1
-                elif extension in IMAGE_EXTENSIONS:
-                    counts['images'] += 1
-
-                counts['total_files'] += 1
-
-                # TODO we don't need to show urls of each file that is locked or if student not purchased course
-                # Append file data
-                folder_data['files'].append({
-                    'id': file.id,
-                    'title': file.title,
-                    'url': file.url.url,  # URL to access the file
-                    'is_locked': file.is_locked
-                })
-
-            # Recursively fetch subfolders
-            for subfolder in folder.folders.all():
-                folder_data['subfolders'].append(fetch_folder_structure(subfolder))
-
-            return folder_data
-
-        folder_structure = []
-        # Start from top-level folders (where parent is None)
-        for folder in self.folders.filter(parent__isnull=True):
-            folder_structure.append(fetch_folder_structure(folder))
-
-        # Prepare the final data with directory structure and counts
-        data = {
-            'directory': folder_structure,
-            'videos': counts['videos'],
-            'images': counts['images'],
-            'total_files': counts['total_files']
-        }
-
-        return data
+        return build_content_tree(self.folders.all(), File.objects.filter(folder__course=self))
 
     @property
     def categories_info(self):
@@ -265,7 +208,9 @@ class CourseCategorySubCategory(TimeStampedModel):
         return f"{self.course} - {self.category} - {', '.join(self.subcategories)}"
 
 
-class Folder(TimeStampedModel):
+class Folder(AbstractFolder):
+    owner_field = 'course'
+
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='folders')
     course = models.ForeignKey(Course, related_name="folders", on_delete=models.CASCADE)
     title = models.CharField(max_length=255, verbose_name="Folder Title")
@@ -284,6 +229,7 @@ class File(TimeStampedModel):
     url = models.FileField(upload_to='videos/', verbose_name="Lecture Video")
     is_locked = models.BooleanField(default=False, verbose_name="Is Locked")
     order = models.PositiveIntegerField(default=0, verbose_name="Order")  # Field to handle the order
+    size = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Size In Bytes")
 
     def __str__(self):
         return self.title
@@ -295,7 +241,14 @@ class File(TimeStampedModel):
         # Automatically set the title from the document file name, if title is empty
         if not self.title and self.url:
             self.title = self.url.name.rsplit('/', 1)[-1]  # Get the file name only
+        if self.url and not self.url._committed:
+            self.size = self.url.size  # Size of the newly uploaded file
         super(File, self).save(**kwargs)
+        Folder.touch_folders(self.folder_id)
+
+    def delete(self, *args, **kwargs):
+        Folder.touch_folders(self.folder_id)
+        return super().delete(*args, **kwargs)
 
 
 class Assignment(TimeStampedModel):
@@ -403,6 +356,8 @@ class CourseLiveClass(TimeStampedModel):
     recording_url = models.URLField(verbose_name="Recording URL", null=True, blank=True)
     duration = models.IntegerField(verbose_name="Duration", null=True, blank=True)
     recording_status = models.CharField(max_length=255, verbose_name="Recording Status", null=True, blank=True)
+    # Set once the class has been counted as held in the attendance summaries
+    attendance_recorded = models.BooleanField(default=False, verbose_name="Attendance Recorded")
 
     class Meta:
         verbose_name = "Live Class"
@@ -412,14 +367,30 @@ class CourseLiveClass(TimeStampedModel):
     def __str__(self):
         return f"Live Class for {self.course} on {self.date}"
 
-    @property
-    def student_join_link(self):
-        return self.course_attendance.live_class_link
+
+class CourseLiveClassFile(AbstractLiveClassFile):
+    live_class = models.ForeignKey(CourseLiveClass, related_name="shared_files", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Course Live Class File"
+        verbose_name_plural = "Course Live Class Files"
+        ordering = ('id',)
+
+
+class CourseLiveClassChat(AbstractLiveClassChat):
+    live_class = models.ForeignKey(CourseLiveClass, related_name="chats", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Course Live Class Chat"
+        verbose_name_plural = "Course Live Class Chats"
+        constraints = [
+            models.UniqueConstraint(fields=('live_class', 'channel'), name='unique_course_live_class_chat'),
+        ]
 
 
 class CourseAttendance(TimeStampedModel):
     student = models.ForeignKey(User, related_name="course_attendances", on_delete=models.CASCADE)
-    live_class = models.OneToOneField(CourseLiveClass, related_name="course_attendance", on_delete=models.CASCADE)
+    live_class = models.ForeignKey(CourseLiveClass, related_name="course_attendances", on_delete=models.CASCADE)
     attended = models.BooleanField(default=False, verbose_name="Attended")
     analytics = models.JSONField(verbose_name="Analytics", null=True, blank=True)
     browser = models.JSONField(max_length=255, verbose_name="Browser", null=True, blank=True)
@@ -438,5 +409,21 @@ class CourseAttendance(TimeStampedModel):
         return f"{self.student} - {self.live_class} - {'Present' if self.attended else 'Absent'}"
 
 
+class CourseAttendanceSummary(AbstractAttendanceSummary):
+    owner_field = 'course'
+
+    course = models.ForeignKey(Course, related_name="attendance_summaries", on_delete=models.CASCADE)
+
+    class Meta:
+        verbose_name = "Course Attendance Summary"
+        verbose_name_plural = "Course Attendance Summaries"
+        constraints = [
+            models.UniqueConstraint(fields=('course', 'student'), name='unique_course_attendance_summary'),
+        ]
+        indexes = [
+            models.Index(fields=('course', 'percentage'), name='course_attendance_pct_idx'),
+        ]
+
+
 class CourseReview(AbstractReview):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='reviews')
@@ -5,7 +5,9 @@ from django.utils import timezone
 from rest_framework import serializers
 
 from .models import Category, Subcategory, Course, CourseCategorySubCategory, Folder, File, CourseFaculty, \
-    CourseValidityPeriod, CourseLiveClass, CourseReview
+    CourseValidityPeriod, CourseLiveClass, CourseReview, CourseAttendanceSummary
+
+from ..batch.serializers.liveclass_serializers import LiveClassSeriesMixin
 
 User = get_user_model()
 
@@ -180,7 +182,7 @@ class FileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = File
-        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order']
+        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order', 'size']
 
 
 class ListCourseSerializer(serializers.ModelSerializer):
@@ -265,12 +267,24 @@ class CreateCourseLiveClassSerializer(serializers.Serializer):
         return data
 
 
+class CreateCourseLiveClassSeriesSerializer(LiveClassSeriesMixin, CreateCourseLiveClassSerializer):
+    pass
+
+
 class RetrieveCourseLiveClassSerializer(serializers.ModelSerializer):
     class Meta:
         model = CourseLiveClass
         fields = '__all__'
 
 
+class CourseAttendanceSummarySerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.full_name', read_only=True)
+
+    class Meta:
+        model = CourseAttendanceSummary
+        fields = ('student', 'student_name', 'classes_held', 'classes_attended', 'total_minutes', 'percentage')
+
+
 class CourseReviewSerializer(serializers.ModelSerializer):
     student = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
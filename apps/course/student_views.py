@@ -1,9 +1,10 @@
 # views.py
+from django.db.models import OuterRef, Subquery
 from rest_framework import mixins
 from rest_framework.viewsets import GenericViewSet
 
 from abstract.views import ReadOnlyCustomResponseMixin
-from .models import Course, CoursePurchaseOrder, CourseLiveClass
+from .models import Course, CoursePurchaseOrder, CourseLiveClass, CourseAttendance
 from .student_serializers import RetrieveStudentCourseSerializer, \
     StudentCourseSerializer, StudentCourseLiveClassSerializer
 
@@ -47,5 +48,5 @@ class StudentCourseLiveClassesViewSet(mixins.ListModelMixin,
     def get_queryset(self):
         # TODO check current user have course access
         course = Course.objects.get(id=self.kwargs['course'])
-        live_classes = course.live_classes.all()
-        return live_classes
+        links = CourseAttendance.objects.filter(live_class=OuterRef('pk'), student=self.request.user)
+        return course.live_classes.annotate(student_join_link=Subquery(links.values('live_class_link')[:1]))
@@ -0,0 +1,45 @@
+from django.test import TestCase
+
+from apps.batch.testing import build_folder_tree, create_owner
+from .models import Course, File, Folder
+
+
+class CourseContentTreeTests(TestCase):
+    """
+    Course.content must load the whole folder tree in a constant number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(name='Course', description='Course', created_by=create_owner())
+        build_folder_tree(Folder, File, course=cls.course)
+
+    def test_content_query_count(self):
+        # The first access initialises the configured storage backend
+        self.course.content
+
+        with self.assertNumQueries(2):
+            content = self.course.content
+
+        self.assertEqual(content['total_files'], 1000)
+        self.assertEqual(content['videos'], 400)
+        self.assertEqual(content['images'], 400)
+
+    def test_content_structure(self):
+        directory = self.course.content['directory']
+        self.assertEqual([folder['title'] for folder in directory], [f'Folder {i}' for i in range(10)])
+        self.assertEqual(len(directory[0]['subfolders']), 5)
+        self.assertEqual(set(directory[0]), {'id', 'title', 'files', 'subfolders'})
+
+        leaf_folder = directory[0]['subfolders'][0]['subfolders'][1]
+        self.assertEqual(leaf_folder['title'], 'Folder 0.0.1')
+        self.assertEqual([file['title'] for file in leaf_folder['files']],
+                         [f'Folder 0.0.1 file {i}' for i in range(10)])
+        self.assertEqual(set(leaf_folder['files'][0]), {'id', 'title', 'url', 'is_locked'})
+
+    def test_other_courses_are_left_out(self):
+        other = Course.objects.create(name='Other', description='Other', created_by=self.course.created_by)
+        Folder.objects.create(course=other, title='Other folder')
+
+        self.assertEqual(len(self.course.content['directory']), 10)
+        self.assertEqual(other.content['total_files'], 0)
@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 from apps.course.student_views import AvailableCourseViewSet, PurchasedCourseCourseViewSet, \
     StudentCourseLiveClassesViewSet
 from apps.course.views import CategoryViewSet, SubcategoryViewSet, CourseViewSet, FolderFileViewSet, \
-    CreateCourseLiveClassView, CourseLiveClassViewSet, CourseReviewViewSet
+    CreateCourseLiveClassView, CourseLiveClassViewSet, CourseReviewViewSet, CreateCourseLiveClassSeriesView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -21,6 +21,7 @@ student_router.register(r'student/purchased-courses', PurchasedCourseCourseViewS
 
 urlpatterns = [
     path('create-live-class/', CreateCourseLiveClassView.as_view(), name='create_live_class'),
+    path('create-live-class-series/', CreateCourseLiveClassSeriesView.as_view(), name='create_live_class_series'),
     # Student URL
     path('student/<str:course>/course-live-classes/', StudentCourseLiveClassesViewSet.as_view({'get': 'list'}),
          name='live_classes_courses'),
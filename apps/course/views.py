@@ -1,4 +1,4 @@
-from itertools import chain
+import zipfile
 
 from constance import config
 from django.contrib.auth import get_user_model
@@ -13,16 +13,20 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 
-from abstract.views import CustomResponseMixin
-from config.live_video import MeritHubAPI
+from abstract.models import CONTENT_APP_LABELS
+from abstract.views import CustomResponseMixin, FolderStructureCacheMixin, get_clone_source, \
+    get_manageable_owners
 from .filters import CourseFilter
-from .models import Category, Subcategory, Course, Folder, File, CourseFaculty, CourseLiveClass, CoursePurchaseOrder, \
-    CourseAttendance, CourseReview
+from .models import Category, Subcategory, Course, Folder, File, CourseFaculty, CourseLiveClass, CourseReview
 from .serializers import CategorySerializer, SubcategorySerializer, CourseSerializer, CoursePriceUpdateSerializer, \
     ListCourseSerializer, FolderSerializer, FileSerializer, ListSubcategorySerializer, CreateCourseLiveClassSerializer, \
-    RetrieveCourseLiveClassSerializer, CourseReviewSerializer
+    RetrieveCourseLiveClassSerializer, CourseReviewSerializer, CourseAttendanceSummarySerializer, \
+    CreateCourseLiveClassSeriesSerializer
+from ..batch.jobs import schedule_live_class
+from ..batch.models import LiveClassJob
 from ..user.models import Roles
-from ..utils.functions import merge_and_sort_items
+from ..utils.functions import MAX_FOLDER_PAGE_SIZE, decode_item_cursor, get_folder_items, move_item, \
+    set_items_order
 
 User = get_user_model()
 
@@ -97,7 +101,7 @@ class SubcategoryViewSet(CustomResponseMixin):
         return Response({"message": "Subcategories Created Successfully"}, status=status.HTTP_201_CREATED)
 
 
-class CourseViewSet(CustomResponseMixin):
+class CourseViewSet(FolderStructureCacheMixin, CustomResponseMixin):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     list_serializer_class = ListCourseSerializer
@@ -164,17 +168,6 @@ class CourseViewSet(CustomResponseMixin):
                          "effective_price": serializer.instance.effective_price
                          }, status=status.HTTP_200_OK)
 
-    def build_breadcrumb(self, folder):
-        breadcrumb = []
-        current_folder = folder
-        while current_folder is not None:
-            breadcrumb.append({'id': current_folder.id, 'title': current_folder.title})
-            current_folder = current_folder.parent  # Traverse up to the parent folder
-
-        # Reverse the breadcrumb list to have the root folder at the start
-        breadcrumb.reverse()
-        return breadcrumb
-
     @action(detail=True, methods=['get'], url_path='folder-structure')
     def get_folder_structure(self, request, pk=None):
         course = self.get_object()
@@ -185,46 +178,40 @@ class CourseViewSet(CustomResponseMixin):
                 folder = Folder.objects.get(id=folder_id, course=course)
             except Folder.DoesNotExist:
                 return Response({'detail': 'Folder not found.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            # If no folder_id is provided, return the root folder structure
+            folder, _ = Folder.objects.get_or_create(course=course, parent__isnull=True, title='Home')
 
-            # Get files (files) of the current folder
-            files = File.objects.filter(folder=folder).order_by('order')
-            file_serializer = FileSerializer(files, many=True)
-
-            # Get immediate subfolders
-            subfolders = Folder.objects.filter(parent=folder).order_by('order')
-            subfolder_serializer = FolderSerializer(subfolders, many=True)
-
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = self.build_breadcrumb(folder)
-
+        # Optional keyset pagination: ?page_size=<n>, then ?cursor=<next_cursor> for the following pages
+        try:
+            page_size = int(request.query_params.get('page_size', 0))
+            cursor = request.query_params.get('cursor')
+            cursor_key = decode_item_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response({'detail': 'Invalid page_size or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(page_size, MAX_FOLDER_PAGE_SIZE) if page_size > 0 else None
+
+        def build_folder_structure():
+            items, next_cursor = get_folder_items(folder, cursor_key, page_size)
             folder_structure = {
                 'id': folder.id,
                 'title': folder.title,
-                'items': merged_structure
+                'items': items,
+                'next_cursor': next_cursor
             }
-        else:
-            # If no folder_id is provided, return the root folder structure
-            root_folder, _ = Folder.objects.get_or_create(course=course, parent__isnull=True, title='Home')
-
-            # Get files (files) of the current folder
-            file_serializer = FileSerializer(root_folder.files.all().order_by('order'), many=True)
-
-            # Get immediate subfolders
-            subfolder_serializer = FolderSerializer(root_folder.folders.all().order_by('order'), many=True)
+            return {'course_id': course.id, 'folder_structure': folder_structure, 'breadcrumb': folder.get_breadcrumb()}
 
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = [{'id': root_folder.id, 'title': root_folder.title}]
+        return self.folder_structure_response(request, folder, build_folder_structure,
+                                              variant=f'{page_size}:{cursor}' if page_size or cursor else '')
 
-            folder_structure = {
-                'id': root_folder.id,
-                'title': root_folder.title,
-                'items': merged_structure
-            }
-
-        return Response({'course_id': course.id, 'folder_structure': folder_structure, 'breadcrumb': breadcrumb},
-                        status=status.HTTP_200_OK)
+    @action(detail=True, methods=['get'], url_path='low-attendance')
+    def low_attendance(self, request, pk=None):
+        """Students of the course whose attendance is below ATTENDANCE_CRITERIA, lowest first."""
+        course = self.get_object()
+        summaries = course.attendance_summaries.filter(
+            percentage__lt=config.ATTENDANCE_CRITERIA).select_related('student').order_by('percentage', 'id')
+        return Response({'criteria': config.ATTENDANCE_CRITERIA,
+                         'students': CourseAttendanceSummarySerializer(summaries, many=True).data})
 
 
 class FolderFileViewSet(viewsets.ViewSet):
@@ -260,7 +247,9 @@ class FolderFileViewSet(viewsets.ViewSet):
         request.data['folder'] = folder.id  # Set folder ID in request data
         serializer = FileSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            file = serializer.save()
+            folder.apply_file_counters(file)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # 3. Rename a folder
@@ -283,16 +272,33 @@ class FolderFileViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['delete'], url_path='folders/(?P<folder_id>[^/.]+)/delete-folder')
     def delete_folder(self, request, pk=None, folder_id=None):
         folder = get_object_or_404(Folder, id=folder_id)
-        folder.delete()  # Delete the folder
+        folder.delete_subtree()  # Delete the folder with all its subfolders and files
         return Response({'status': 'Folder deleted'}, status=status.HTTP_204_NO_CONTENT)
 
     # 6. Delete a file
     @action(detail=True, methods=['delete'], url_path='files/(?P<file_id>[^/.]+)/delete-file')
     def delete_file(self, request, pk=None, file_id=None):
-        file = get_object_or_404(File, id=file_id)
-        file.delete()  # Delete the file
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        with transaction.atomic():
+            file.folder.apply_file_counters(file, sign=-1)
+            file.delete()  # Delete the file
         return Response({'status': 'File deleted'}, status=status.HTTP_204_NO_CONTENT)
 
+    # Move a file to another folder and/or replace its uploaded content
+    @action(detail=True, methods=['patch'], url_path='files/(?P<file_id>[^/.]+)/update-file')
+    def update_file(self, request, pk=None, file_id=None):
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        old_folder = file.folder
+        serializer = FileSerializer(file, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            old_folder.apply_file_counters(file, sign=-1)
+            file = serializer.save()
+            file.folder.apply_file_counters(file)
+            if file.folder_id != old_folder.id:
+                old_folder.touch()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     # 7. Toggle lock status of a file (lock/unlock)
     @action(detail=True, methods=['patch'], url_path='files/(?P<file_id>[^/.]+)/toggle-lock-file')
     def toggle_lock_file(self, request, pk=None, file_id=None):
@@ -323,60 +329,91 @@ class FolderFileViewSet(viewsets.ViewSet):
         except model.DoesNotExist:
             return Response({'error': f'{item_type.capitalize()} not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Determine parent directory
+        # Determine parent directory, root folders are only ordered against the other roots of their owner
         parent = item.parent if item_type == 'folder' else item.folder
+        folders = Folder.objects.filter(parent=parent)
+        if parent is None:
+            owner_field = f'{Folder.owner_field}_id'
+            folders = folders.filter(**{owner_field: getattr(item, owner_field)})
+        files = File.objects.filter(folder=parent)
 
         with transaction.atomic():
-            # Fetch all siblings (folders and files) in the parent directory
-            folders = Folder.objects.filter(parent=parent).order_by('order')
-            files = File.objects.filter(folder=parent).order_by('order')
-
-            # Combine and sort by order
-            siblings = sorted(chain(folders, files), key=lambda x: x.order)
-
-            # Normalize order values to avoid gaps or duplicates
-            for index, sibling in enumerate(siblings, start=1):
-                if sibling.order != index:
-                    sibling.order = index
-                    sibling.save()
-
-            # update item object after setting indexing
-            item = model.objects.get(id=item_id)
-            # Find adjacent item to swap with
-            current_index = siblings.index(item)
-            if direction == 'up' and current_index > 0:
-                adjacent_item = siblings[current_index - 1]
-            elif direction == 'down' and current_index < len(siblings) - 1:
-                adjacent_item = siblings[current_index + 1]
-            else:
+            if not move_item(item, [folders, files], direction):
                 return Response(
                     {'error': f'{item_type.capitalize()} is already at the {"top" if direction == "up" else "bottom"}'},
                     status=status.HTTP_400_BAD_REQUEST)
 
-            # Swap order values
-            item.order, adjacent_item.order = adjacent_item.order, item.order
-            item.save()
-            adjacent_item.save()
-
         return Response({'message': f'{item_type.capitalize()} moved {direction} successfully'},
                         status=status.HTTP_200_OK)
 
+    # 9. Replace the order of everything inside a folder in one go
+    @action(detail=True, methods=['put'], url_path='folders/(?P<folder_id>[^/.]+)/set-order')
+    def set_order(self, request, pk=None, folder_id=None):
+        """
+        Apply a full new order to a folder's subfolders and files, e.g. after a drag and drop.
+
+        Expects `items`: the complete sibling sequence as a list of {"id": ..., "type": "folder" | "file"}.
+        """
+        folder = get_object_or_404(Folder, id=folder_id)
+        items = request.data.get('items')
+        if not isinstance(items, list):
+            return Response({'error': 'items must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            error = set_items_order(items, folder.folders.all(), folder.files.all())
+            if not error:
+                folder.touch()
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'message': 'Order updated successfully'}, status=status.HTTP_200_OK)
+
+    # 10. Copy a folder tree of any batch, course or free resource into a folder of the course
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/clone-content')
+    def clone_content(self, request, pk=None, folder_id=None):
+        """
+        Expects `source_type` ('batch', 'course' or 'free_resource') and `source_folder_id`. The source folder is
+        copied with its whole subtree as the last item of the target folder.
+
+        Both the target and the source must belong to a batch, course or free resource the user manages (see
+        get_manageable_owners), otherwise they are reported as not found.
+        """
+        folder = get_object_or_404(Folder, id=folder_id, course__in=get_manageable_owners(Course, request.user),
+                                   course_id=pk)
+        source_type = request.data.get('source_type')
+        if source_type not in CONTENT_APP_LABELS:
+            return Response({'error': 'Invalid source_type'}, status=status.HTTP_400_BAD_REQUEST)
+        source = get_clone_source(request.user, source_type, request.data.get('source_folder_id'))
+
+        clone = folder.clone_subtree(source)
+        return Response(FolderSerializer(clone).data, status=status.HTTP_201_CREATED)
+
+    # 11. Import a ZIP archive of folders and files into a folder of the course
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/import-zip')
+    def import_zip(self, request, pk=None, folder_id=None):
+        folder = get_object_or_404(Folder, id=folder_id, course_id=pk)
+        archive = request.FILES.get('archive')
+        if archive is None or not zipfile.is_zipfile(archive):
+            return Response({'error': 'A ZIP archive is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            imported = folder.import_zip(archive)
+        except zipfile.BadZipFile as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(imported, status=status.HTTP_201_CREATED)
+
 
 class CreateCourseLiveClassView(APIView):
+    serializer_class = CreateCourseLiveClassSerializer
 
     def post(self, request):
-        serializer = CreateCourseLiveClassSerializer(data=request.data)
+        serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
 
         # Extract validated data
         validated_data = serializer.validated_data
         course = validated_data['course']
 
-        # Assuming you have configured your client ID and secret key in settings
-        client_id = config.MERITHUB_CLIENT_ID
-        secret_key = config.MERITHUB_CLIENT_SECRET
-        api = MeritHubAPI(client_id, secret_key)
-
         # Prepare the class data
         class_data = {
             'title': validated_data['title'],
@@ -394,62 +431,16 @@ class CreateCourseLiveClassView(APIView):
             'recording': validated_data['recording'],
             'participantControl': validated_data['participantControl']
         }
-        try:
-            data = api.schedule_class(
-                user_id=self.request.user.id,
-                class_data=class_data,
-            )
-            live_class = CourseLiveClass.objects.create(
-                course=course,
-                title=class_data['title'],
-                class_id=data['classId'],
-                date=class_data['startTime'],
-                host_link=api.generate_url(data['hostLink']),
-                common_host_link=api.generate_url(data['commonLinks']['commonHostLink']),
-                common_moderator_link=api.generate_url(data['commonLinks']['commonModeratorLink']),
-                common_participant_link=api.generate_url(data['commonLinks']['commonParticipantLink'])
-            )
-            enrolled_students = CoursePurchaseOrder.objects.filter(course=course, is_paid=True)
-            students = []
-            for order in enrolled_students:
-                user = order.student
-                if not user.merit_user_id:
-                    response = api.create_user({
-                        'name': user.full_name,
-                        'email': user.email,
-                        'clientUserId': str(user.id),
-                        "role": "M",
-                        "timeZone": "Asia/Kolkata",
-                        "permission": "CJ"
-                    })
-                    user.merit_user_id = response['userId']
-                    user.save()
-                common_participant_link = live_class.common_participant_link
-                user_link = ""
-                if common_participant_link:
-                    user_link = common_participant_link.split('/')[-1]
-                students.append({
-                    "userId": user.merit_user_id,
-                    "userLink": user_link,
-                    "userType": "su"
-                })
-            # Now add users in live class
-            response = api.add_students_to_class(class_id=live_class.class_id, users=students)
-            for student in response:
-                try:
-                    user = User.objects.get(merit_user_id=student['userId'])
-                    live_class_link = api.generate_url(student['userLink'])
-                    CourseAttendance.objects.create(student=user, live_class=live_class,
-                                                    live_class_link=live_class_link)
-                except User.DoesNotExist:
-                    print(f"User {student['userId']}")
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-            # Serialize the created class (assuming you have a serializer for this)
-        retrieve_serializer = RetrieveCourseLiveClassSerializer(instance=live_class)
-        return Response(retrieve_serializer.data, status=status.HTTP_201_CREATED)
+        # MeritHub is called from a background job, poll the job for its progress
+        job = schedule_live_class(LiveClassJob.OwnerType.COURSE, course.pk, class_data, request.user,
+                                  occurrences=validated_data.get('occurrences'),
+                                  recurrence=validated_data.get('recurrence', ''))
+        return Response({'job_id': job.pk, 'status': job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+class CreateCourseLiveClassSeriesView(CreateCourseLiveClassView):
+    """Schedule a class at every occurrence of a recurrence rule, see LiveClassSeriesMixin."""
+    serializer_class = CreateCourseLiveClassSeriesSerializer
 
 
 class CourseLiveClassViewSet(mixins.DestroyModelMixin,
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+from apps.utils.functions import rebuild_content_counters
+
+
+def backfill_counters(apps, schema_editor):
+    # File sizes are unknown until `rebuild_content_counters --fetch-sizes` reads them from storage
+    rebuild_content_counters(apps.get_model('free_resource', 'FreeResource'), apps.get_model('free_resource', 'Folder'),
+                             apps.get_model('free_resource', 'File'), 'resource_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('free_resource', '0005_folder_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Size In Bytes'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Documents'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Files'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Images'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Total Bytes'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Videos'),
+        ),
+        migrations.AddField(
+            model_name='freeresource',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Documents'),
+        ),
+        migrations.AddField(
+            model_name='freeresource',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total Files'),
+        ),
+        migrations.AddField(
+            model_name='freeresource',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Images'),
+        ),
+        migrations.AddField(
+            model_name='freeresource',
+            name='total_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Total Bytes'),
+        ),
+        migrations.AddField(
+            model_name='freeresource',
+            name='video_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Videos'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
 from django.db import models
 from django_extensions.db.models import TimeStampedModel
 
+from abstract.models import AbstractContentCounters, AbstractFolder
+from apps.utils.functions import build_content_tree
 
-class FreeResource(TimeStampedModel):
+
+class FreeResource(TimeStampedModel, AbstractContentCounters):
     title = models.CharField(max_length=255)
     thumbnail = models.CharField(max_length=255, blank=True, null=True)
 
@@ -11,73 +14,12 @@ class FreeResource(TimeStampedModel):
 
     @property
     def content(self):
-        # Define the file extensions for videos and images
-        VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
-        IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
-
-        # Initialize counts
-        counts = {
-            'videos': 0,
-            'images': 0,
-            'total_files': 0
-        }
-
-        def fetch_folder_structure(folder):
-            nonlocal counts  # Allows access to the counts dictionary defined in the outer scope
-
-            folder_data = {
-                'id': folder.id,
-                'title': folder.title,
-                'order': folder.order,
-                'files': [],
-                'subfolders': []
-            }
-            # Fetch files within the folder
-            for file in folder.files.all():
-                # Determine the file extension
-                extension = file.url.name.rsplit('.', 1)[-1].lower()
-
-                # Increment counts based on file type
-                if extension in VIDEO_EXTENSIONS:
-                    counts['videos'] += 1
-                elif extension in IMAGE_EXTENSIONS:
-                    counts['images'] += 1
-
-                counts['total_files'] += 1
-
-                # TODO we don't need to show urls of each file that is locked or if student not purchased course
-                # Append file data
-                folder_data['files'].append({
-                    'id': file.id,
-                    'title': file.title,
-                    'url': file.url.url,  # URL to access the file
-                    'is_locked': file.is_locked,
-                    'order': file.order
-                })
-
-            # Recursively fetch subfolders
-            for subfolder in folder.folders.all().order_by('order'):
-                folder_data['subfolders'].append(fetch_folder_structure(subfolder))
-
-            return folder_data
-
-        folder_structure = []
-        # Start from top-level folders (where parent is None)
-        for folder in self.folders.filter(parent__isnull=True).order_by('order'):
-            folder_structure.append(fetch_folder_structure(folder))
-
-        # Prepare the final data with directory structure and counts
-        data = {
-            'directory': folder_structure,
-            'videos': counts['videos'],
-            'images': counts['images'],
-            'total_files': counts['total_files']
-        }
-
-        return data
-
-
-class Folder(TimeStampedModel):
+        return build_content_tree(self.folders.all(), File.objects.filter(folder__resource=self), include_order=True)
+
+
+class Folder(AbstractFolder):
+    owner_field = 'resource'
+
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='folders')
     resource = models.ForeignKey(FreeResource, related_name="folders", on_delete=models.CASCADE)
     title = models.CharField(max_length=255, verbose_name="Folder Title")
@@ -96,6 +38,7 @@ class File(TimeStampedModel):
     url = models.FileField(upload_to='videos/', verbose_name="Lecture Video")
     is_locked = models.BooleanField(default=False, verbose_name="Is Locked")
     order = models.PositiveIntegerField(default=0, verbose_name="Order")  # Field to handle the order
+    size = models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Size In Bytes")
 
     def __str__(self):
         return self.title
@@ -107,4 +50,11 @@ class File(TimeStampedModel):
         # Automatically set the title from the document file name, if title is empty
         if not self.title and self.url:
             self.title = self.url.name.rsplit('/', 1)[-1]  # Get the file name only
+        if self.url and not self.url._committed:
+            self.size = self.url.size  # Size of the newly uploaded file
         super(File, self).save(**kwargs)
+        Folder.touch_folders(self.folder_id)
+
+    def delete(self, *args, **kwargs):
+        Folder.touch_folders(self.folder_id)
+        return super().delete(*args, **kwargs)
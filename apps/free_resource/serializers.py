@@ -36,4 +36,4 @@ class FileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = File
-        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order']
+        fields = ['id', 'title', 'folder', 'url', 'created', 'is_locked', 'order', 'size']
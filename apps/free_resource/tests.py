@@ -1,3 +1,39 @@
 from django.test import TestCase
 
-# Create your tests here.
+from apps.batch.testing import build_folder_tree
+from .models import File, Folder, FreeResource
+
+
+class FreeResourceContentTreeTests(TestCase):
+    """
+    FreeResource.content must load the whole folder tree, with the order of every folder and file, in a constant
+    number of queries.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.resource = FreeResource.objects.create(title='Resource')
+        build_folder_tree(Folder, File, resource=cls.resource)
+
+    def test_content_query_count(self):
+        # The first access initialises the configured storage backend
+        self.resource.content
+
+        with self.assertNumQueries(2):
+            content = self.resource.content
+
+        self.assertEqual(content['total_files'], 1000)
+        self.assertEqual(content['videos'], 400)
+        self.assertEqual(content['images'], 400)
+
+    def test_content_structure(self):
+        directory = self.resource.content['directory']
+        self.assertEqual([folder['title'] for folder in directory], [f'Folder {i}' for i in range(10)])
+        self.assertEqual([folder['order'] for folder in directory], list(range(10)))
+        self.assertEqual(set(directory[0]), {'id', 'title', 'order', 'files', 'subfolders'})
+
+        leaf_folder = directory[0]['subfolders'][0]['subfolders'][1]
+        self.assertEqual((leaf_folder['title'], leaf_folder['order']), ('Folder 0.0.1', 1))
+        self.assertEqual([(file['title'], file['order']) for file in leaf_folder['files']],
+                         [(f'Folder 0.0.1 file {i}', i) for i in range(10)])
+        self.assertEqual(set(leaf_folder['files'][0]), {'id', 'title', 'url', 'is_locked', 'order'})
@@ -1,4 +1,5 @@
-from itertools import chain
+import zipfile
+
 
 from django.db import transaction
 from rest_framework import viewsets, status
@@ -6,27 +7,19 @@ from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from abstract.views import CustomResponseMixin
+from abstract.models import CONTENT_APP_LABELS
+from abstract.views import CustomResponseMixin, FolderStructureCacheMixin, get_clone_source, \
+    get_manageable_owners
 from .models import FreeResource, Folder, File
 from .serializers import FreeResourceSerializer, FileSerializer, FolderSerializer
-from ..utils.functions import merge_and_sort_items
+from ..utils.functions import MAX_FOLDER_PAGE_SIZE, decode_item_cursor, get_folder_items, move_item, \
+    set_items_order
 
 
-class FreeResourceViewSet(CustomResponseMixin):
+class FreeResourceViewSet(FolderStructureCacheMixin, CustomResponseMixin):
     queryset = FreeResource.objects.all()
     serializer_class = FreeResourceSerializer
 
-    def build_breadcrumb(self, folder):
-        breadcrumb = []
-        current_folder = folder
-        while current_folder is not None:
-            breadcrumb.append({'id': current_folder.id, 'title': current_folder.title})
-            current_folder = current_folder.parent  # Traverse up to the parent folder
-
-        # Reverse the breadcrumb list to have the root folder at the start
-        breadcrumb.reverse()
-        return breadcrumb
-
     @action(detail=True, methods=['get'], url_path='folder-structure')
     def get_folder_structure(self, request, pk=None):
         resource = self.get_object()
@@ -37,46 +30,32 @@ class FreeResourceViewSet(CustomResponseMixin):
                 folder = Folder.objects.get(id=folder_id, resource=resource)
             except Folder.DoesNotExist:
                 return Response({'detail': 'Folder not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-            # Get files (files) of the current folder
-            files = File.objects.filter(folder=folder).order_by('order')
-            file_serializer = FileSerializer(files, many=True)
-
-            # Get immediate subfolders
-            subfolders = Folder.objects.filter(parent=folder).order_by('order')
-            subfolder_serializer = FolderSerializer(subfolders, many=True)
-
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = self.build_breadcrumb(folder)
-
-            folder_structure = {
-                'id': folder.id,
-                'title': folder.title,
-                'items': merged_structure
-            }
         else:
             # If no folder_id is provided, return the root folder structure
-            root_folder, _ = Folder.objects.get_or_create(resource=resource, parent__isnull=True, title='Home')
-
-            # Get files (files) of the current folder
-            file_serializer = FileSerializer(root_folder.files.all().order_by('order'), many=True)
-
-            # Get immediate subfolders
-            subfolder_serializer = FolderSerializer(root_folder.folders.all().order_by('order'), many=True)
-
-            # Use the utility function to merge and sort
-            merged_structure = merge_and_sort_items(subfolder_serializer.data, file_serializer.data)
-            breadcrumb = [{'id': root_folder.id, 'title': root_folder.title}]
+            folder, _ = Folder.objects.get_or_create(resource=resource, parent__isnull=True, title='Home')
 
+        # Optional keyset pagination: ?page_size=<n>, then ?cursor=<next_cursor> for the following pages
+        try:
+            page_size = int(request.query_params.get('page_size', 0))
+            cursor = request.query_params.get('cursor')
+            cursor_key = decode_item_cursor(cursor) if cursor else None
+        except ValueError:
+            return Response({'detail': 'Invalid page_size or cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = min(page_size, MAX_FOLDER_PAGE_SIZE) if page_size > 0 else None
+
+        def build_folder_structure():
+            items, next_cursor = get_folder_items(folder, cursor_key, page_size)
             folder_structure = {
-                'id': root_folder.id,
-                'title': root_folder.title,
-                'items': merged_structure
+                'id': folder.id,
+                'title': folder.title,
+                'items': items,
+                'next_cursor': next_cursor
             }
+            return {'resource_id': resource.id, 'folder_structure': folder_structure,
+                    'breadcrumb': folder.get_breadcrumb()}
 
-        return Response({'resource_id': resource.id, 'folder_structure': folder_structure, 'breadcrumb': breadcrumb},
-                        status=status.HTTP_200_OK)
+        return self.folder_structure_response(request, folder, build_folder_structure,
+                                              variant=f'{page_size}:{cursor}' if page_size or cursor else '')
 
 
 class FolderFileViewSet(viewsets.ViewSet):
@@ -112,7 +91,9 @@ class FolderFileViewSet(viewsets.ViewSet):
         request.data['folder'] = folder.id  # Set folder ID in request data
         serializer = FileSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        with transaction.atomic():
+            file = serializer.save()
+            folder.apply_file_counters(file)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # 3. Rename a folder
@@ -135,16 +116,33 @@ class FolderFileViewSet(viewsets.ViewSet):
     @action(detail=True, methods=['delete'], url_path='folders/(?P<folder_id>[^/.]+)/delete-folder')
     def delete_folder(self, request, pk=None, folder_id=None):
         folder = get_object_or_404(Folder, id=folder_id)
-        folder.delete()  # Delete the folder
+        folder.delete_subtree()  # Delete the folder with all its subfolders and files
         return Response({'status': 'Folder deleted'}, status=status.HTTP_204_NO_CONTENT)
 
     # 6. Delete a file
     @action(detail=True, methods=['delete'], url_path='files/(?P<file_id>[^/.]+)/delete-file')
     def delete_file(self, request, pk=None, file_id=None):
-        file = get_object_or_404(File, id=file_id)
-        file.delete()  # Delete the file
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        with transaction.atomic():
+            file.folder.apply_file_counters(file, sign=-1)
+            file.delete()  # Delete the file
         return Response({'status': 'File deleted'}, status=status.HTTP_204_NO_CONTENT)
 
+    # Move a file to another folder and/or replace its uploaded content
+    @action(detail=True, methods=['patch'], url_path='files/(?P<file_id>[^/.]+)/update-file')
+    def update_file(self, request, pk=None, file_id=None):
+        file = get_object_or_404(File.objects.select_related('folder'), id=file_id)
+        old_folder = file.folder
+        serializer = FileSerializer(file, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            old_folder.apply_file_counters(file, sign=-1)
+            file = serializer.save()
+            file.folder.apply_file_counters(file)
+            if file.folder_id != old_folder.id:
+                old_folder.touch()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['patch'], url_path='update-order')
     def update_order(self, request, pk=None):
         """
@@ -166,40 +164,75 @@ class FolderFileViewSet(viewsets.ViewSet):
         except model.DoesNotExist:
             return Response({'error': f'{item_type.capitalize()} not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Determine parent directory
+        # Determine parent directory, root folders are only ordered against the other roots of their owner
         parent = item.parent if item_type == 'folder' else item.folder
+        folders = Folder.objects.filter(parent=parent)
+        if parent is None:
+            owner_field = f'{Folder.owner_field}_id'
+            folders = folders.filter(**{owner_field: getattr(item, owner_field)})
+        files = File.objects.filter(folder=parent)
 
         with transaction.atomic():
-            # Fetch all siblings (folders and files) in the parent directory
-            folders = Folder.objects.filter(parent=parent).order_by('order')
-            files = File.objects.filter(folder=parent).order_by('order')
-
-            # Combine and sort by order
-            siblings = sorted(chain(folders, files), key=lambda x: x.order)
-
-            # Normalize order values to avoid gaps or duplicates
-            for index, sibling in enumerate(siblings, start=1):
-                if sibling.order != index:
-                    sibling.order = index
-                    sibling.save()
-
-            # update item object after setting indexing
-            item = model.objects.get(id=item_id)
-            # Find adjacent item to swap with
-            current_index = siblings.index(item)
-            if direction == 'up' and current_index > 0:
-                adjacent_item = siblings[current_index - 1]
-            elif direction == 'down' and current_index < len(siblings) - 1:
-                adjacent_item = siblings[current_index + 1]
-            else:
+            if not move_item(item, [folders, files], direction):
                 return Response(
                     {'error': f'{item_type.capitalize()} is already at the {"top" if direction == "up" else "bottom"}'},
                     status=status.HTTP_400_BAD_REQUEST)
 
-            # Swap order values
-            item.order, adjacent_item.order = adjacent_item.order, item.order
-            item.save()
-            adjacent_item.save()
-
         return Response({'message': f'{item_type.capitalize()} moved {direction} successfully'},
                         status=status.HTTP_200_OK)
+
+    # Replace the order of everything inside a folder in one go
+    @action(detail=True, methods=['put'], url_path='folders/(?P<folder_id>[^/.]+)/set-order')
+    def set_order(self, request, pk=None, folder_id=None):
+        """
+        Apply a full new order to a folder's subfolders and files, e.g. after a drag and drop.
+
+        Expects `items`: the complete sibling sequence as a list of {"id": ..., "type": "folder" | "file"}.
+        """
+        folder = get_object_or_404(Folder, id=folder_id)
+        items = request.data.get('items')
+        if not isinstance(items, list):
+            return Response({'error': 'items must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            error = set_items_order(items, folder.folders.all(), folder.files.all())
+            if not error:
+                folder.touch()
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'message': 'Order updated successfully'}, status=status.HTTP_200_OK)
+
+    # Copy a folder tree of any batch, course or free resource into a folder of the resource
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/clone-content')
+    def clone_content(self, request, pk=None, folder_id=None):
+        """
+        Expects `source_type` ('batch', 'course' or 'free_resource') and `source_folder_id`. The source folder is
+        copied with its whole subtree as the last item of the target folder.
+
+        Both the target and the source must belong to a batch, course or free resource the user manages (see
+        get_manageable_owners), otherwise they are reported as not found.
+        """
+        folder = get_object_or_404(Folder, id=folder_id, resource__in=get_manageable_owners(FreeResource, request.user),
+                                   resource_id=pk)
+        source_type = request.data.get('source_type')
+        if source_type not in CONTENT_APP_LABELS:
+            return Response({'error': 'Invalid source_type'}, status=status.HTTP_400_BAD_REQUEST)
+        source = get_clone_source(request.user, source_type, request.data.get('source_folder_id'))
+
+        clone = folder.clone_subtree(source)
+        return Response(FolderSerializer(clone).data, status=status.HTTP_201_CREATED)
+
+    # Import a ZIP archive of folders and files into a folder of the resource
+    @action(detail=True, methods=['post'], url_path='folders/(?P<folder_id>[^/.]+)/import-zip')
+    def import_zip(self, request, pk=None, folder_id=None):
+        folder = get_object_or_404(Folder, id=folder_id, resource_id=pk)
+        archive = request.FILES.get('archive')
+        if archive is None or not zipfile.is_zipfile(archive):
+            return Response({'error': 'A ZIP archive is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            imported = folder.import_zip(archive)
+        except zipfile.BadZipFile as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(imported, status=status.HTTP_201_CREATED)
@@ -44,9 +44,8 @@ class PurchaseCourseSerializer(serializers.Serializer):
         if not value:
             return None  # No coupon applied
 
-        try:
-            coupon = Coupon.objects.get(code=value, status=True, is_visible=True)
-        except Coupon.DoesNotExist:
+        coupon = Coupon.get_active(value)
+        if not coupon:
             raise serializers.ValidationError("Invalid coupon code.")
 
         # Check if coupon is within the valid date range
@@ -57,15 +56,13 @@ class PurchaseCourseSerializer(serializers.Serializer):
             raise serializers.ValidationError("Coupon has expired.")
 
         # Check max uses
-        if coupon.max_uses and coupon.total_applied >= coupon.max_uses:
+        if not coupon.has_uses_left():
             raise serializers.ValidationError("Coupon usage limit has been reached.")
 
         # Check usage per student
         user = self.context['request'].user
-        if coupon.usage_per_student:
-            user_usage = Transaction.objects.filter(user=user, coupon=coupon).count()
-            if user_usage >= coupon.usage_per_student:
-                raise serializers.ValidationError("You have reached the maximum usage limit for this coupon.")
+        if not coupon.usage_left_for(user):
+            raise serializers.ValidationError("You have reached the maximum usage limit for this coupon.")
 
         return coupon
 
@@ -74,8 +71,7 @@ class PurchaseCourseSerializer(serializers.Serializer):
         if coupon:
             # Optionally, check if the coupon is applicable to the selected course
             course_id = attrs.get('course_id')
-            course = Course.objects.get(id=course_id)
-            if coupon.courses.exists() and course not in coupon.courses.all():
+            if not coupon.is_all_courses and coupon.courses and course_id not in coupon.courses:
                 raise serializers.ValidationError("This coupon is not applicable to the selected course.")
         return attrs
 
@@ -93,9 +89,8 @@ class ApplyCouponSerializer(serializers.Serializer):
 
 
     def validate_coupon_code(self, value):
-        try:
-            coupon = Coupon.objects.get(code=value, status=True, is_visible=True)
-        except Coupon.DoesNotExist:
+        coupon = Coupon.get_active(value)
+        if not coupon:
             raise serializers.ValidationError("Invalid coupon code.")
 
         # Check if coupon is within the valid date range
@@ -106,15 +101,13 @@ class ApplyCouponSerializer(serializers.Serializer):
             raise serializers.ValidationError("Coupon has expired.")
 
         # Check max uses
-        if coupon.max_uses and coupon.total_applied >= coupon.max_uses:
+        if not coupon.has_uses_left():
             raise serializers.ValidationError("Coupon usage limit has been reached.")
 
         # Check usage per student
         user = self.context['request'].user
-        if coupon.usage_per_student:
-            user_usage = Transaction.objects.filter(user=user, coupon=coupon).count()
-            if user_usage >= coupon.usage_per_student:
-                raise serializers.ValidationError("You have reached the maximum usage limit for this coupon.")
+        if not coupon.usage_left_for(user):
+            raise serializers.ValidationError("You have reached the maximum usage limit for this coupon.")
 
         # Check applicability to the course
         course_id = self.initial_data.get('course_id')
@@ -142,12 +135,75 @@ class ApplyCouponSerializer(serializers.Serializer):
         if coupon and course_id:
             if coupon.courses and not coupon.is_all_courses and course.id not in coupon.courses:
                 raise serializers.ValidationError("This coupon is not applicable to the selected course.")
-        # Just for checking coupon all validation passed
 
-        coupon.apply_discount(course.calculate_price(validity_period), request.user, course)
+        # Priced once here, the view returns these
+        attrs['course'] = course
+        attrs['original_price'] = course.calculate_price(validity_period)
+        attrs['price_after_coupon'], attrs['discount_amount'] = coupon.apply_discount(attrs['original_price'],
+                                                                                      request.user, course)
         return attrs
 
 
+class CartItemSerializer(serializers.Serializer):
+    item_type = serializers.ChoiceField(choices=Transaction.ContentType.choices)
+    item_id = serializers.IntegerField()
+    validity_period = serializers.IntegerField(required=False)
+
+
+class CartPricingSerializer(serializers.Serializer):
+    MAX_ITEMS = 100
+
+    items = CartItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+    coupon_code = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+
+    def validate_coupon_code(self, value):
+        if not value:
+            return None  # No coupon applied
+
+        coupon = Coupon.get_active(value)
+        if not coupon:
+            raise serializers.ValidationError("Invalid coupon code.")
+
+        now = timezone.now()
+        if coupon.start_datetime and now < coupon.start_datetime:
+            raise serializers.ValidationError("Coupon is not yet valid.")
+        if not coupon.lifetime and coupon.end_datetime and now > coupon.end_datetime:
+            raise serializers.ValidationError("Coupon has expired.")
+        if not coupon.has_uses_left():
+            raise serializers.ValidationError("Coupon usage limit has been reached.")
+
+        user = self.context['request'].user
+        if not coupon.usage_left_for(user):
+            raise serializers.ValidationError("You have reached the maximum usage limit for this coupon.")
+        if coupon.coupon_type == 'private' and user.id not in coupon.students:
+            raise serializers.ValidationError("This coupon is not applicable to this user.")
+        return coupon
+
+    def validate_items(self, value):
+        # One query per item type, the validity periods of the courses are prefetched for pricing
+        ids = {item_type: {item['item_id'] for item in value if item['item_type'] == item_type}
+               for item_type in Transaction.ContentType.values}
+        querysets = {
+            Transaction.ContentType.COURSE: Course.objects.prefetch_related('validity_periods'),
+            Transaction.ContentType.BATCH: Batch.objects.select_related('fee_structure'),
+            Transaction.ContentType.TEST_SERIES: TestSeries.objects.all(),
+        }
+        objects = {item_type: queryset.filter(id__in=ids[item_type], is_published=True).in_bulk() if ids[item_type]
+                   else {} for item_type, queryset in querysets.items()}
+
+        for item in value:
+            item['item'] = objects[item['item_type']].get(item['item_id'])
+            if not item['item']:
+                raise serializers.ValidationError(
+                    f"Invalid or unpublished {item['item_type'].replace('_', ' ')} ID {item['item_id']}.")
+            if item['item_type'] == Transaction.ContentType.BATCH and not item['item'].fee_structure:
+                raise serializers.ValidationError(f"Batch {item['item_id']} does not have a fee structure.")
+            if item['item_type'] == Transaction.ContentType.COURSE and item.get('validity_period') and not any(
+                    pricing.pk == item['validity_period'] for pricing in item['item'].validity_periods.all()):
+                raise serializers.ValidationError("Invalid Course Pricing Validity.")
+        return value
+
+
 class PurchaseBatchSerializer(serializers.Serializer):
     batch_id = serializers.IntegerField()
     installment_number = serializers.IntegerField(required=False)  # Make it optional
@@ -1,3 +1,131 @@
+from decimal import Decimal
+from unittest import mock
+
+from constance.test import override_config
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.batch.models import Batch, FeeStructure, Subject
+from apps.coupon.models import Coupon
+from apps.course.models import Course, CourseValidityPeriod
+from apps.test_series.models import TestSeries, TestSeriesCategory
+from config import razor_payment
+from config.razor_payment import RazorpayService
+from .serializers import CartPricingSerializer
+from .utils import price_cart
+
+User = get_user_model()
+
+
+@override_config(RAZORPAY_API_KEY='rzp_test_key', RAZORPAY_API_SECRET='secret')
+class RazorpayClientTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(razor_payment, _client=None, _client_auth=None, _credentials_checked_at=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_client_is_shared(self):
+        client = RazorpayService().client
+        # Neither the credentials nor the connection pool are set up again
+        with self.assertNumQueries(0):
+            self.assertIs(RazorpayService().client, client)
+        self.assertEqual(client.auth, ('rzp_test_key', 'secret'))
+
+    def test_client_follows_credential_changes(self):
+        client = RazorpayService().client
+        with override_config(RAZORPAY_API_KEY='rzp_live_key'):
+            changed = RazorpayService().client
+
+        self.assertIsNot(changed, client)
+        self.assertEqual(changed.auth, ('rzp_live_key', 'secret'))
+        self.assertIs(changed.session, client.session)
+
+    def test_posts_are_only_retried_when_not_processed(self):
+        retry = RazorpayService().client.session.get_adapter('https://api.razorpay.com').max_retries
+
+        self.assertTrue(retry.is_retry('POST', 503))
+        self.assertTrue(retry.is_retry('POST', 429))
+        self.assertFalse(retry.is_retry('POST', 500))
+        self.assertFalse(retry.is_retry('POST', 504))
+        self.assertTrue(retry.is_retry('GET', 502))
+        self.assertFalse(retry.increment('POST', '/v1/orders').is_retry('POST', 502))
+
+    def test_order_is_created_with_timeout(self):
+        user = User.objects.create_user(email='student@example.com', phone_number='+919876543210',
+                                        full_name='Student')
+        service = RazorpayService()
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'id': 'order_1'}
+        with mock.patch.object(service.client.session, 'post', return_value=response) as post:
+            transaction = service.initiate_transaction('course', 1, user, Decimal(100), Decimal(118), Decimal(100),
+                                                       Decimal(0), Decimal(0), Decimal(0))
+
+        self.assertEqual(transaction.transaction_id, 'order_1')
+        self.assertEqual(post.call_args.kwargs['timeout'], RazorpayService.TIMEOUT)
+
+
+class CartPricingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='student@example.com', phone_number='+919876543210',
+                                            full_name='Student')
+        cls.course = Course.objects.create(name='Course', description='Course', price=1000, is_published=True,
+                                           created_by=cls.user)
+        cls.multiple_course = Course.objects.create(name='Multiple', description='Multiple', validity_type='multiple',
+                                                    is_published=True, created_by=cls.user)
+        cls.validity_period = CourseValidityPeriod.objects.create(course=cls.multiple_course, duration_value=1,
+                                                                  duration_unit='months', price=500)
+        CourseValidityPeriod.objects.create(course=cls.multiple_course, duration_value=1, duration_unit='years',
+                                            price=800, is_promoted=True)
+        fee_structure = FeeStructure.objects.create(structure_name='Monthly', fee_amount=2000, installments=3)
+        cls.batch = Batch.objects.create(name='Batch', start_date=timezone.now().date(), is_published=True,
+                                         subject=Subject.objects.create(name='Physics'), created_by=cls.user,
+                                         fee_structure=fee_structure)
+        cls.test_series = TestSeries.objects.create(name='Printed', price=300, gst=12, is_published=True,
+                                                    category=TestSeriesCategory.objects.create(title='Printed'))
+        Coupon.objects.create(name='Ten', code='TEN', discount_type='percentage', discount_value=10,
+                              start_datetime=timezone.now(), lifetime=True, courses=[cls.course.id],
+                              created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def validate(self, data):
+        serializer = CartPricingSerializer(data=data, context={'request': mock.Mock(user=self.user)})
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def test_cart_is_priced_in_one_pass(self):
+        # The coupon, then one query per item type and one for the validity periods
+        with self.assertNumQueries(5):
+            validated_data = self.validate({'coupon_code': 'TEN', 'items': [
+                {'item_type': 'course', 'item_id': self.course.id},
+                {'item_type': 'course', 'item_id': self.multiple_course.id,
+                 'validity_period': self.validity_period.id},
+                {'item_type': 'batch', 'item_id': self.batch.id},
+                {'item_type': 'test_series', 'item_id': self.test_series.id},
+            ]})
+        with self.assertNumQueries(0):
+            data = price_cart(validated_data['items'], validated_data['coupon_code'], self.user)
+
+        self.assertEqual([(line['item_name'], line['discount_amount'], line['total_amount'], line['coupon_applied'])
+                          for line in data['items']],
+                         [('Course', Decimal(100), Decimal('1085.60'), True),
+                          ('Multiple', Decimal(0), Decimal('613.60'), False),
+                          ('Batch', Decimal(0), Decimal('2383.60'), False),
+                          ('Printed', Decimal(0), Decimal('358.40'), False)])
+        self.assertEqual(data['items'][1]['coupon_error'], "This coupon is not applicable to this course.")
+        self.assertEqual(data['totals']['discount_amount'], Decimal(100))
+        self.assertEqual(data['totals']['total_amount'], Decimal('4441.20'))
+
+    def test_promoted_validity_is_the_default(self):
+        validated_data = self.validate({'items': [{'item_type': 'course', 'item_id': self.multiple_course.id}]})
+        self.assertEqual(price_cart(validated_data['items'])['totals']['original_price'], Decimal(800))
 
-# Create your tests here.
+    def test_unknown_items_are_rejected(self):
+        serializer = CartPricingSerializer(data={'items': [{'item_type': 'batch', 'item_id': 0}]},
+                                           context={'request': mock.Mock(user=self.user)})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['items'], ["Invalid or unpublished batch ID 0."])
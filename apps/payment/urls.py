@@ -4,7 +4,7 @@ from rest_framework.routers import DefaultRouter
 from apps.payment.student_views import StudentTransactionViewSet
 from apps.payment.views import PurchaseCourseView, VerifyPaymentView, TransactionViewSet, \
     ApplyCouponView, GetCoursePricingView, PurchaseBatchView, GetBatchPricingView, PurchaseTestSeriesView, \
-    GetTestSeriesPricingView
+    GetTestSeriesPricingView, CartPricingView
 
 router = DefaultRouter()
 router.register(r'transactions', TransactionViewSet)
@@ -17,6 +17,7 @@ urlpatterns = [
     path('verify-payment/', VerifyPaymentView.as_view(), name='verify_payment'),
     path('course-pricing/<int:course_id>/', GetCoursePricingView.as_view(), name='get_course_pricing'),
     path('apply-coupon/', ApplyCouponView.as_view(), name='apply_coupon'),
+    path('cart-pricing/', CartPricingView.as_view(), name='cart_pricing'),
     path('batch-pricing/<int:batch_id>/installment/<int:installment_number>/', GetBatchPricingView.as_view(), name='get_batch_pricing'),
     path('purchase-batch/', PurchaseBatchView.as_view(), name='purchase_batch'),
     path('test-series-pricing/<int:test_series_id>/', GetTestSeriesPricingView.as_view(),
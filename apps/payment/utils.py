@@ -1,6 +1,9 @@
 from decimal import Decimal
 
 from django.conf import settings
+from rest_framework.exceptions import ValidationError
+
+from .models import Transaction
 
 
 def final_price_with_other_expenses_and_gst(original_price, discounted_price=None, gst_percentage=None):
@@ -27,3 +30,43 @@ def final_price_with_other_expenses_and_gst(original_price, discounted_price=Non
         "total_amount": total_amount.quantize(Decimal('0.01'))
     }
     return data
+
+
+def price_cart(items, coupon=None, user=None):
+    """
+    Price the validated items of CartPricingSerializer against one coupon, with the fees and GST of each line worked
+    out once. Coupons only list courses, so they are applied to course lines alone. Returns the lines and the totals.
+    """
+    lines = []
+    for item in items:
+        item_type, obj = item['item_type'], item['item']
+        gst_percentage = None
+        if item_type == Transaction.ContentType.COURSE:
+            original_price = obj.calculate_price(item.get('validity_period'))
+        elif item_type == Transaction.ContentType.BATCH:
+            original_price = obj.fee_structure.fee_amount
+        else:
+            original_price = obj.effective_price
+            if not obj.is_digital:
+                gst_percentage = obj.gst
+        original_price = Decimal(original_price or 0)
+
+        line = {'item_type': item_type, 'item_id': obj.id, 'item_name': obj.name, 'discount_amount': Decimal('0.00'),
+                'coupon_applied': False, 'coupon_error': None}
+        price_after_coupon = None
+        if coupon and item_type == Transaction.ContentType.COURSE:
+            try:
+                price_after_coupon, discount_amount = coupon.apply_discount(original_price, user, obj)
+            except ValidationError as e:
+                line['coupon_error'] = e.detail[0]
+            else:
+                line['discount_amount'] = Decimal(discount_amount).quantize(Decimal('0.01'))
+                line['coupon_applied'] = True
+        line.update(final_price_with_other_expenses_and_gst(
+            original_price, Decimal(price_after_coupon) if price_after_coupon is not None else None, gst_percentage))
+        lines.append(line)
+
+    totals = {key: sum((line[key] for line in lines), Decimal(0))
+              for key in ('original_price', 'discount_amount', 'gst_amount', 'internet_charges', 'platform_fees',
+                          'total_amount')}
+    return {'items': lines, 'totals': totals}
@@ -5,19 +5,20 @@ from constance import config
 from django.conf import settings
 from django.db import transaction as db_transaction
 from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from abstract.views import ReadOnlyCustomResponseMixin
+from abstract.views import CSVExportMixin, ReadOnlyCustomResponseMixin
 from apps.batch.models import BatchPurchaseOrder, Batch, Enrollment
 from apps.course.models import Course, CoursePurchaseOrder, CourseValidityPeriod
 from apps.payment.models import Transaction
 from apps.payment.serializers import VerifyPaymentSerializer, TransactionSerializer, PurchaseCourseSerializer, \
-    ApplyCouponSerializer, PurchaseBatchSerializer, PurchaseTestSeriesSerializer
-from apps.payment.utils import final_price_with_other_expenses_and_gst
+    ApplyCouponSerializer, PurchaseBatchSerializer, PurchaseTestSeriesSerializer, CartPricingSerializer
+from apps.payment.utils import final_price_with_other_expenses_and_gst, price_cart
 from apps.test_series.models import TestSeries, TestSeriesPurchaseOrder, PhysicalProductOrder
 from config.razor_payment import RazorpayService
 from config.weasy_pdf import generate_pdf
@@ -25,9 +26,27 @@ from config.weasy_pdf import generate_pdf
 logger = logging.getLogger(__name__)
 
 
-class TransactionViewSet(ReadOnlyCustomResponseMixin):
+class TransactionViewSet(CSVExportMixin, ReadOnlyCustomResponseMixin):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    filter_backends = (DjangoFilterBackend,)
+    filterset_fields = ('user', 'content_type', 'content_id', 'payment_status', 'payment_type')
+    export_filename = 'transactions.csv'
+    export_fields = {
+        'id': 'id',
+        'transaction_id': 'transaction_id',
+        'payment_id': 'payment_id',
+        'user': 'user__full_name',
+        'email': 'user__email',
+        'content_type': 'content_type',
+        'content_id': 'content_id',
+        'amount': 'amount',
+        'discount_applied': 'discount_applied',
+        'total_amount': 'total_amount',
+        'payment_status': 'payment_status',
+        'payment_type': 'payment_type',
+        'created': 'created',
+    }
 
     @action(detail=True, methods=['get'], url_path='download-pdf')
     def download_pdf(self, request, pk=None):
@@ -340,7 +359,7 @@ class VerifyPaymentView(APIView):
                 # Increment coupon usage if a coupon was used
                 if verified_transaction.coupon:
                     try:
-                        verified_transaction.coupon.increment_usage()
+                        verified_transaction.coupon.increment_usage(verified_transaction.user)
                         logger.info(f"Coupon {verified_transaction.coupon.code} usage incremented.")
                     except Exception as e:
                         logger.error(
@@ -423,13 +442,10 @@ class ApplyCouponView(APIView):
     def post(self, request):
         serializer = ApplyCouponSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        course_id = serializer.validated_data['course_id']
         coupon = serializer.validated_data['coupon_code']
-        validity_period = serializer.validated_data.get('validity_period')
-        course = get_object_or_404(Course, id=course_id)
-        original_price = course.calculate_price(validity_period)
-
-        price_after_coupon, discount_amount = coupon.apply_discount(original_price, request.user, course)
+        original_price = serializer.validated_data['original_price']
+        price_after_coupon = serializer.validated_data['price_after_coupon']
+        discount_amount = serializer.validated_data['discount_amount']
         final_price_responses = final_price_with_other_expenses_and_gst(Decimal(original_price),
                                                                         Decimal(price_after_coupon))
         # Prepare response data
@@ -450,6 +466,19 @@ class ApplyCouponView(APIView):
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class CartPricingView(APIView):
+    """
+    API view to price several courses, batches and test series against one optional coupon in a single call.
+    """
+
+    def post(self, request):
+        serializer = CartPricingSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        response_data = price_cart(serializer.validated_data['items'], serializer.validated_data.get('coupon_code'),
+                                   request.user)
+        return Response(response_data, status=status.HTTP_200_OK)
+
+
 class PurchaseBatchView(APIView):
     """
     API view to initiate a batch purchase by creating a Razorpay order for a specific installment.
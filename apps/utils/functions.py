@@ -1,29 +1,293 @@
-def merge_and_sort_items(folders, files):
-    merged_structure = []
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict
+from itertools import chain
 
-    # Append folders to merged structure
+from django.db.models import CharField, F, Q, Value
+from rest_framework import serializers
+
+VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+
+
+def get_file_kind(name):
+    """
+    Classify a stored file name as 'video', 'image' or 'document' from its extension.
+    """
+    extension = name.rsplit('.', 1)[-1].lower()
+    if extension in VIDEO_EXTENSIONS:
+        return 'video'
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    return 'document'
+
+
+CONTENT_COUNTER_FIELDS = ('file_count', 'video_count', 'image_count', 'document_count', 'total_bytes')
+
+
+def rebuild_content_counters(owner_model, folder_model, file_model, owner_attname, dry_run=False):
+    """
+    Recompute the file counters of every folder subtree and of every owner from the stored files.
+
+    Returns the owners and the folders whose stored counters had drifted, with the expected counters set on them,
+    and saves those unless `dry_run`. Only plain fields are read, so migrations can pass their historical models.
+    """
+    def empty_counts():
+        return dict.fromkeys(CONTENT_COUNTER_FIELDS, 0)
+
+    # Count the files of every folder, then add each folder's own counts to all of its ancestors
+    own_counts = defaultdict(empty_counts)
+    for folder_id, name, size in file_model.objects.values_list('folder_id', 'url', 'size').iterator():
+        counts = own_counts[folder_id]
+        counts['file_count'] += 1
+        counts[f"{get_file_kind(name)}_count"] += 1
+        counts['total_bytes'] += size
+
+    folders = list(folder_model.objects.only('id', 'path', owner_attname, *CONTENT_COUNTER_FIELDS))
+    folder_counts = defaultdict(empty_counts)
+    owner_counts = defaultdict(empty_counts)
+    for folder in folders:
+        counts = own_counts.get(folder.id)
+        if not counts:
+            continue
+        for ancestor_id in [int(pk) for pk in folder.path.split('/') if pk] or [folder.id]:
+            for field in CONTENT_COUNTER_FIELDS:
+                folder_counts[ancestor_id][field] += counts[field]
+        for field in CONTENT_COUNTER_FIELDS:
+            owner_counts[getattr(folder, owner_attname)][field] += counts[field]
+
+    owners = list(owner_model.objects.only('id', *CONTENT_COUNTER_FIELDS))
+    drifted_owners = _apply_content_counts(owners, owner_counts)
+    drifted_folders = _apply_content_counts(folders, folder_counts)
+    if not dry_run:
+        owner_model.objects.bulk_update(drifted_owners, CONTENT_COUNTER_FIELDS, batch_size=1000)
+        folder_model.objects.bulk_update(drifted_folders, CONTENT_COUNTER_FIELDS, batch_size=1000)
+    return drifted_owners, drifted_folders
+
+
+def _apply_content_counts(objects, counts_by_id):
+    """
+    Set the expected counters on `objects` and return the ones whose stored counters differ.
+    """
+    drifted = []
+    for obj in objects:
+        counts = counts_by_id.get(obj.id, dict.fromkeys(CONTENT_COUNTER_FIELDS, 0))
+        if any(getattr(obj, field) != counts[field] for field in CONTENT_COUNTER_FIELDS):
+            for field in CONTENT_COUNTER_FIELDS:
+                setattr(obj, field, counts[field])
+            drifted.append(obj)
+    return drifted
+
+
+FOLDER_ITEM, FILE_ITEM = 0, 1
+MAX_FOLDER_PAGE_SIZE = 500
+
+
+def encode_item_cursor(item):
+    key = f"{item['order']}.{FILE_ITEM if item['type'] == 'file' else FOLDER_ITEM}.{item['id']}"
+    return urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_item_cursor(cursor):
+    """
+    Return the (order, kind, id) key encoded in a cursor, raising ValueError when it is malformed.
+    """
+    try:
+        order, kind, pk = (int(part) for part in urlsafe_b64decode(cursor.encode()).decode().split('.'))
+    except (TypeError, ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    return order, kind, pk
+
+
+def get_folder_items(folder, cursor=None, limit=None):
+    """
+    List the subfolders and files of `folder` as a single sequence ordered by (order, kind, id), folders before
+    files on equal order.
+
+    Both tables are merged by the database with a UNION, and with `limit` only one page is read: every branch is
+    filtered past the `cursor` key and limited before the union. Returns the items and the cursor of the next page,
+    None on the last page.
+    """
+    url_field = folder.files.model._meta.get_field('url')
+    datetime_field = serializers.DateTimeField()
+
+    branches = []
+    for kind, queryset in ((FOLDER_ITEM, folder.folders.annotate(item_url=Value(None, output_field=CharField()),
+                                                                 item_locked=Value(False))),
+                           (FILE_ITEM, folder.files.annotate(item_url=F('url'), item_locked=F('is_locked')))):
+        queryset = queryset.annotate(kind=Value(kind)).values(
+            'id', 'title', 'order', 'created', 'item_url', 'item_locked', 'kind')
+        if cursor:
+            order, cursor_kind, pk = cursor
+            if kind > cursor_kind:
+                queryset = queryset.filter(order__gte=order)
+            elif kind == cursor_kind:
+                queryset = queryset.filter(Q(order__gt=order) | Q(order=order, id__gt=pk))
+            else:
+                queryset = queryset.filter(order__gt=order)
+        if limit:
+            queryset = queryset.order_by('order', 'id')[:limit + 1]
+        branches.append(queryset)
+    rows = branches[0].union(branches[1], all=True).order_by('order', 'kind', 'id')
+    if limit:
+        rows = rows[:limit + 1]
+
+    items = []
+    for row in rows:
+        item = {'id': row['id'], 'title': row['title']}
+        if row['kind'] == FOLDER_ITEM:
+            item.update({'type': 'folder', 'parent_id': folder.id})
+        else:
+            item.update({'type': 'file', 'url': url_field.storage.url(row['item_url']) if row['item_url'] else None,
+                         'is_locked': row['item_locked'], 'folder_id': folder.id})
+        item.update({'created': datetime_field.to_representation(row['created']), 'order': row['order']})
+        items.append(item)
+
+    if limit and len(items) > limit:
+        items = items[:limit]
+        return items, encode_item_cursor(items[-1])
+    return items, None
+
+
+def build_content_tree(folders, files, include_order=False):
+    """
+    Build the nested content payload of a course, batch or free resource.
+
+    `folders` and `files` are querysets covering every folder and file of the owner. Each is evaluated once and
+    the tree is assembled in memory, so the whole structure costs two queries no matter how deep it is.
+    """
+    folder_data = {}
+    child_folders = defaultdict(list)
+    root_folders = []
     for folder in folders:
-        merged_structure.append({
-            'id': folder['id'],
-            'title': folder['title'],
-            'type': 'folder',
-            'parent_id': folder.get('parent'),  # Use parent ID if available
-            'created': folder['created'],
-            'order': folder['order']
-        })
-
-    # Append contents to merged structure
+        folder_data[folder.id] = {
+            'id': folder.id,
+            'title': folder.title,
+            'files': [],
+            'subfolders': []
+        }
+        if include_order:
+            folder_data[folder.id]['order'] = folder.order
+        if folder.parent_id is None:
+            root_folders.append(folder.id)
+        else:
+            child_folders[folder.parent_id].append(folder.id)
+
+    file_kinds = defaultdict(list)
     for file in files:
-        merged_structure.append({
-            'id': file['id'],
-            'title': file['title'],  # Assuming 'document' is the title
-            'type': 'file',
-            'url': file['url'],
-            'is_locked': file['is_locked'],
-            'folder_id': file['folder'],  # Link to folder ID
-            'created': file['created'],
-            'order': file['order']
-        })
-
-    # Sort by 'created' date
-    return sorted(merged_structure, key=lambda x: x['order'])
+        if file.folder_id not in folder_data:
+            continue
+
+        # TODO we don't need to show urls of each file that is locked or if student not purchased course
+        file_data = {
+            'id': file.id,
+            'title': file.title,
+            'url': file.url.url,  # URL to access the file
+            'is_locked': file.is_locked
+        }
+        if include_order:
+            file_data['order'] = file.order
+        folder_data[file.folder_id]['files'].append(file_data)
+        file_kinds[file.folder_id].append(get_file_kind(file.url.name))
+
+    counts = {
+        'videos': 0,
+        'images': 0,
+        'total_files': 0
+    }
+    # Link subfolders and count files of every folder reachable from the top-level folders
+    pending = list(root_folders)
+    while pending:
+        folder_id = pending.pop()
+        data = folder_data[folder_id]
+        for kind in file_kinds[folder_id]:
+            if kind == 'video':
+                counts['videos'] += 1
+            elif kind == 'image':
+                counts['images'] += 1
+            counts['total_files'] += 1
+        for child_id in child_folders.get(folder_id, []):
+            data['subfolders'].append(folder_data[child_id])
+            pending.append(child_id)
+
+    return {
+        'directory': [folder_data[folder_id] for folder_id in root_folders],
+        'videos': counts['videos'],
+        'images': counts['images'],
+        'total_files': counts['total_files']
+    }
+
+
+ORDER_GAP = 1024
+
+
+def renumber_items(items):
+    """
+    Give `items` evenly spaced order values following their list position, with one bulk_update per model.
+    """
+    by_model = defaultdict(list)
+    for index, item in enumerate(items, start=1):
+        item.order = index * ORDER_GAP
+        by_model[type(item)].append(item)
+    for model, objects in by_model.items():
+        model.objects.bulk_update(objects, ['order'])
+
+
+def move_item(item, sibling_querysets, direction):
+    """
+    Move a folder or file one position up or down among its siblings.
+
+    Order values are spaced by ORDER_GAP, so the item gets a value between its two new neighbours and a move
+    writes a single row. Siblings are renumbered only when there is no room left between the neighbours (or
+    when legacy rows share the same order). Returns False if the item is already at the top or bottom.
+    """
+    for attempt in range(2):
+        neighbours = []
+        for queryset in sibling_querysets:
+            if queryset.model is type(item):
+                queryset = queryset.exclude(pk=item.pk)
+            if direction == 'up':
+                neighbours += queryset.filter(order__lte=item.order).order_by('-order')[:2]
+            else:
+                neighbours += queryset.filter(order__gte=item.order).order_by('order')[:2]
+        neighbours.sort(key=lambda sibling: sibling.order, reverse=direction == 'up')
+        if not neighbours:
+            return False
+
+        adjacent = neighbours[0]
+        if direction == 'up':
+            bound = neighbours[1].order if len(neighbours) > 1 else -1
+        else:
+            bound = neighbours[1].order if len(neighbours) > 1 else adjacent.order + 2 * ORDER_GAP
+        new_order = (adjacent.order + bound) // 2
+        if adjacent.order != item.order and min(adjacent.order, bound) < new_order < max(adjacent.order, bound):
+            item.order = new_order
+            item.save(update_fields=['order'])
+            return True
+
+        # No room between the neighbours, spread every sibling out and try again
+        siblings = sorted(chain.from_iterable(queryset.order_by('order') for queryset in sibling_querysets),
+                          key=lambda sibling: sibling.order)
+        renumber_items(siblings)
+        item.order = next(sibling.order for sibling in siblings
+                          if type(sibling) is type(item) and sibling.pk == item.pk)
+    return False
+
+
+def set_items_order(items, folder_queryset, file_queryset):
+    """
+    Apply a complete new order to the siblings of a folder.
+
+    `items` is the whole sibling sequence as a list of {'id', 'type'} dicts. Returns an error message when it does
+    not match the current siblings exactly.
+    """
+    folder_ids = set(folder_queryset.values_list('id', flat=True))
+    file_ids = set(file_queryset.values_list('id', flat=True))
+    requested = [(item.get('type'), item.get('id')) for item in items]
+    if len(set(requested)) != len(requested) or set(requested) != (
+            {('folder', pk) for pk in folder_ids} | {('file', pk) for pk in file_ids}):
+        return 'Items must list every folder and file of the parent exactly once'
+
+    models = {'folder': folder_queryset.model, 'file': file_queryset.model}
+    renumber_items([models[item_type](pk=pk) for item_type, pk in requested])
+    return None
@@ -3,4 +3,4 @@ from django.apps import AppConfig
 
 class WebhookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'webhook'
+    name = 'apps.webhook'
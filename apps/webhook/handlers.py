@@ -0,0 +1,234 @@
+import logging
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.batch.models import BatchPurchaseOrder, LiveClass, Attendance, AttendanceSummary
+from apps.course.models import CourseLiveClass, CourseAttendance, CourseAttendanceSummary
+from config.live_video import MeritHubAPI
+from config.razor_payment import RazorpayService
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+ATTENDANCE_WEBHOOK_FIELDS = ['attended', 'analytics', 'browser', 'ip', 'os', 'start_time', 'total_time']
+ATTENDANCE_MODELS = (
+    (LiveClass, Attendance, AttendanceSummary),
+    (CourseLiveClass, CourseAttendance, CourseAttendanceSummary),
+)
+
+
+def handle_razorpay_event(event, signature):
+    """
+    Handle a verified Razorpay event. Raises ValueError or DoesNotExist when the event cannot be applied, which
+    leaves the inbox entry failed.
+    """
+    event_type = event.get('event')
+    data = event.get('payload', {}).get('payment', {}).get('entity', {})
+    if event_type != 'payment.captured':
+        # Handle other event types if necessary
+        return
+
+    razorpay_order_id = data.get('order_id')
+    verified_transaction = RazorpayService().verify_payment(
+        razorpay_order_id=razorpay_order_id,
+        razorpay_payment_id=data.get('id'),
+        razorpay_signature=signature  # Adjust as needed
+    )
+    if verified_transaction.payment_status != 'completed':
+        return
+
+    if verified_transaction.content_type == 'course':
+        # Existing course verification logic
+        pass  # Existing code
+    elif verified_transaction.content_type == 'batch_installment':
+        # Handle batch installment verification
+        purchase_order = BatchPurchaseOrder.objects.get(transaction=verified_transaction)
+        if not purchase_order.is_paid:
+            purchase_order.is_paid = True
+            purchase_order.payment_date = timezone.now()
+            purchase_order.save()
+            logger.info(f"Installment {purchase_order.installment_number} for batch {purchase_order.batch_id} "
+                        f"marked as paid via webhook.")
+    else:
+        raise ValueError(f"Invalid content type '{verified_transaction.content_type}' "
+                         f"for transaction {razorpay_order_id}")
+
+
+def handle_class_status(data):
+    """
+    Handle class status updates.
+    Status:
+    Live: lv
+    Ended: cp
+    Cancelled: cl
+    Expired: ex
+    Edited: up
+    """
+    class_id = data.get("classId")
+    status = data.get("status")
+    try:
+        live_class = LiveClass.objects.get(class_id=class_id)
+        live_class.status = status
+        live_class.save()
+        if status == 'lv':
+            pass
+            # TODO send notifications to all student for live class
+    except LiveClass.DoesNotExist:
+        logger.warning("Live class ID %s not found", class_id)
+
+
+def handle_attendance(data):
+    """
+    Handle attendance data when the class has ended.
+
+    The class is locked and all of its attendance rows are loaded with one query. The reported fields are written
+    back with one bulk_update, and the per-student changes are added to the batch or course attendance summaries.
+    Each row contributes only the difference from its stored values, and the class is counted as held once, so a
+    retried delivery changes nothing.
+    """
+    class_id = data.get("classId")
+    attendance_data = {attendance.get("userId"): attendance for attendance in data.get("attendance", [])}
+    with transaction.atomic():
+        for live_class_model, attendance_model, summary_model in ATTENDANCE_MODELS:
+            live_class = live_class_model.objects.select_for_update().filter(class_id=class_id).first()
+            if live_class is not None:
+                break
+        else:
+            logger.warning("Live class ID %s not found", class_id)
+            return
+
+        attendances = list(attendance_model.objects.filter(live_class=live_class)
+                           .annotate(merit_user_id=F('student__merit_user_id')))
+        counted = live_class.attendance_recorded
+        changes = defaultdict(lambda: [0, 0, 0])
+        reported = []
+        for attn in attendances:
+            change = changes[attn.student_id]
+            if not counted:
+                change[0] += 1
+            attendance = attendance_data.get(attn.merit_user_id)
+            if attendance is None:
+                continue
+            was_attended, minutes_before = attn.attended, attended_minutes(attn)
+            attn.attended = True
+            attn.analytics = attendance.get('analytics')
+            attn.browser = attendance.get('browser')
+            attn.ip = attendance.get('ip')
+            attn.os = attendance.get('os')
+            attn.start_time = attendance.get('startTime')
+            attn.total_time = attendance.get('totalTime')
+            change[1] += not was_attended
+            change[2] += attended_minutes(attn) - minutes_before
+            reported.append(attn)
+        attendance_model.objects.bulk_update(reported, ATTENDANCE_WEBHOOK_FIELDS)
+
+        if not counted:
+            live_class.attendance_recorded = True
+            live_class.save(update_fields=['attendance_recorded'])
+        summary_model.apply_changes(getattr(live_class, f'{summary_model.owner_field}_id'),
+                                    {student_id: change for student_id, change in changes.items() if any(change)})
+
+    missing = attendance_data.keys() - {attn.merit_user_id for attn in reported}
+    if missing:
+        logger.warning("No attendance found in class %s for users %s", class_id, sorted(missing, key=str))
+
+
+def attended_minutes(attendance):
+    """Whole minutes of an attendance row, MeritHub reports totalTime in seconds."""
+    return int(attendance.total_time or 0) // 60
+
+
+def handle_recording(data):
+    """
+    Handle recording status when available.
+    """
+    class_id = data.get("classId")
+    try:
+        live_class = LiveClass.objects.get(class_id=class_id)
+        live_class.recording_url = data.get("url")
+        live_class.recording_status = data.get("status")
+        live_class.duration = data.get("duration")
+        live_class.save()
+    except LiveClass.DoesNotExist:
+        logger.warning("Live class ID %s not found", class_id)
+
+
+def find_live_class(class_id):
+    """The batch or course live class MeritHub knows as `class_id`, or None."""
+    for live_class_model, _, _ in ATTENDANCE_MODELS:
+        live_class = live_class_model.objects.filter(class_id=class_id).first()
+        if live_class is not None:
+            return live_class
+    logger.warning("Live class ID %s not found", class_id)
+    return None
+
+
+def handle_class_files(data):
+    """
+    Handle files shared during the class. The reported list replaces the stored one, so redeliveries are harmless.
+    """
+    files = data.get("Files") or []
+    if not isinstance(files, list):
+        logger.warning("Ignoring class files of class %s, expected a list", data.get("classId"))
+        return
+    live_class = find_live_class(data.get("classId"))
+    if live_class is None:
+        return
+    file_model = live_class.shared_files.model
+    with transaction.atomic():
+        live_class.shared_files.all().delete()
+        file_model.objects.bulk_create(
+            file_model(live_class=live_class, name=(file.get('name') or file.get('fileName') or '')[:255],
+                       url=file.get('url') or file.get('fileUrl') or '', details=file)
+            for file in files if isinstance(file, dict)
+        )
+
+
+def handle_chat_data(data):
+    """
+    Handle chat data when generated after class ends. A channel comes either as the list of its messages or as a
+    link to the transcript, which is downloaded. Every channel is stored as a compressed transcript with a small
+    index row, see AbstractLiveClassChat.
+    """
+    class_id = data.get("classId")
+    chats = data.get("chats") or {}
+    if not isinstance(chats, dict):
+        logger.warning("Ignoring chats of class %s, expected an object", class_id)
+        return
+    live_class = find_live_class(class_id)
+    if live_class is None:
+        return
+    chat_model = live_class.chats.model
+    for channel in chat_model.Channel.values:
+        messages = chats.get(channel)
+        if isinstance(messages, str):
+            # A download failure raises and leaves the inbox event failed, to be retried
+            messages = MeritHubAPI.fetch_chat_transcript(messages)
+        if not messages:
+            continue
+        if not isinstance(messages, list):
+            logger.warning("Ignoring %s chat of class %s, expected a list of messages", channel, class_id)
+            continue
+        chat_model.store(live_class, channel, messages)
+
+
+MERITHUB_HANDLERS = {
+    "classStatus": handle_class_status,
+    "attendance": handle_attendance,
+    "recording": handle_recording,
+    "classFiles": handle_class_files,
+    "chats": handle_chat_data,
+}
+
+
+def process_event(event):
+    """Apply a stored webhook event."""
+    if event.source == WebhookEvent.Source.RAZORPAY:
+        handle_razorpay_event(event.payload, event.signature)
+    else:
+        MERITHUB_HANDLERS[event.event_type](event.payload)
@@ -0,0 +1,77 @@
+import hashlib
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from config.jobs import enqueue
+from .handlers import process_event
+from .models import WebhookEvent
+
+logger = logging.getLogger(__name__)
+
+DRAIN_BATCH_SIZE = 100
+
+
+def receive_event(source, body, payload, event_type='', event_id=None, signature=''):
+    """
+    Store a webhook delivery in the inbox and start draining it once stored. `event_id` identifies the delivery
+    when the sender provides one, otherwise the hash of the raw body does. Returns False for a duplicate.
+    """
+    dedup_key = event_id or hashlib.sha256(body).hexdigest()
+    _, created = WebhookEvent.objects.get_or_create(
+        source=source, dedup_key=dedup_key,
+        defaults={'payload': payload, 'event_type': event_type, 'signature': signature or ''},
+    )
+    if created:
+        enqueue(drain_webhook_inbox)
+    return created
+
+
+def drain_webhook_inbox(retry_failed=False):
+    """
+    Process pending inbox events in arrival order. Their ids are read DRAIN_BATCH_SIZE at a time without locking,
+    then every event is handled in its own transaction by process_inbox_event, so the locks a handler takes are
+    released as soon as its event is done. Returns the number of events processed.
+    """
+    statuses = [WebhookEvent.Status.PENDING]
+    if retry_failed:
+        statuses.append(WebhookEvent.Status.FAILED)
+    processed = 0
+    last_id = 0
+    while True:
+        event_ids = list(WebhookEvent.objects.filter(status__in=statuses, id__gt=last_id).order_by('id')
+                         .values_list('id', flat=True)[:DRAIN_BATCH_SIZE])
+        if not event_ids:
+            return processed
+        for event_id in event_ids:
+            processed += process_inbox_event(event_id, statuses)
+        last_id = event_ids[-1]
+
+
+def process_inbox_event(event_id, statuses):
+    """
+    Lock one inbox event and apply it. An event locked by another drain, or no longer in `statuses`, is skipped,
+    so several workers can drain the inbox together. A handler that raises is rolled back to a savepoint and the
+    event is left failed with its error. Returns whether the event was processed.
+    """
+    with transaction.atomic():
+        event = (WebhookEvent.objects.select_for_update(skip_locked=True)
+                 .filter(pk=event_id, status__in=statuses).first())
+        if event is None:
+            return False
+        event.attempts += 1
+        event.modified = timezone.now()
+        try:
+            with transaction.atomic():
+                process_event(event)
+        except Exception as e:
+            logger.exception("Webhook event %s could not be processed", event.pk)
+            event.status = WebhookEvent.Status.FAILED
+            event.error = str(e)
+        else:
+            event.status = WebhookEvent.Status.PROCESSED
+            event.error = ''
+            event.processed_at = event.modified
+        event.save(update_fields=['status', 'attempts', 'error', 'processed_at', 'modified'])
+        return event.status == WebhookEvent.Status.PROCESSED
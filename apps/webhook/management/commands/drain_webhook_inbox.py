@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.webhook.jobs import drain_webhook_inbox
+
+
+class Command(BaseCommand):
+    help = "Process the webhook events still waiting in the inbox, e.g. the ones queued before a restart"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help="Also process events that failed before")
+
+    def handle(self, *args, **options):
+        processed = drain_webhook_inbox(retry_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(f"{processed} webhook event(s) processed"))
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-18 06:42
+
+import django_extensions.db.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('source', models.CharField(choices=[('razorpay', 'Razorpay'), ('merithub', 'MeritHub')], max_length=10, verbose_name='Source')),
+                ('event_type', models.CharField(blank=True, max_length=100, verbose_name='Event Type')),
+                ('dedup_key', models.CharField(max_length=100, verbose_name='Event ID or Payload Hash')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('signature', models.CharField(blank=True, max_length=255, verbose_name='Signature')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed At')),
+            ],
+            options={
+                'verbose_name': 'Webhook Event',
+                'verbose_name_plural': 'Webhook Events',
+                'ordering': ('-created',),
+                'indexes': [models.Index(fields=['status', 'id'], name='webhook_event_status_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhookevent',
+            constraint=models.UniqueConstraint(fields=('source', 'dedup_key'), name='unique_webhook_event'),
+        ),
+    ]
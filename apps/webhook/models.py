@@ -1,3 +1,42 @@
 from django.db import models
+from django_extensions.db.models import TimeStampedModel
 
-# Create your models here.
+
+class WebhookEvent(TimeStampedModel):
+    """
+    Inbox of received webhook deliveries. The raw payload is stored as soon as it arrives and processed later by
+    apps.webhook.jobs.drain_webhook_inbox, so a redelivered event (same source and dedup key) is stored only once.
+    """
+
+    class Source(models.TextChoices):
+        RAZORPAY = 'razorpay', 'Razorpay'
+        MERITHUB = 'merithub', 'MeritHub'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSED = 'processed', 'Processed'
+        FAILED = 'failed', 'Failed'
+
+    source = models.CharField(max_length=10, choices=Source.choices, verbose_name="Source")
+    event_type = models.CharField(max_length=100, blank=True, verbose_name="Event Type")
+    dedup_key = models.CharField(max_length=100, verbose_name="Event ID or Payload Hash")
+    payload = models.JSONField(verbose_name="Payload")
+    signature = models.CharField(max_length=255, blank=True, verbose_name="Signature")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name="Status")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Attempts")
+    error = models.TextField(blank=True, verbose_name="Error")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Processed At")
+
+    class Meta:
+        verbose_name = "Webhook Event"
+        verbose_name_plural = "Webhook Events"
+        ordering = ('-created',)
+        constraints = [
+            models.UniqueConstraint(fields=('source', 'dedup_key'), name='unique_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=('status', 'id'), name='webhook_event_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.event_type} ({self.status})"
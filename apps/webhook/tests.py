@@ -1,3 +1,240 @@
-from django.test import TestCase
+import gzip
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from constance.test import override_config
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.batch.models import Attendance, AttendanceSummary, Enrollment, LiveClass, LiveClassChat
+from apps.batch.student_views import StudentLiveClassChatView
+from apps.batch.testing import BatchTestCase
+from apps.batch.views import BatchViewSet
+from apps.course.models import Course, CourseLiveClass
+from config.live_video import MeritHubAPI
+from .handlers import handle_attendance, handle_chat_data, handle_class_files
+from .jobs import drain_webhook_inbox
+from .models import WebhookEvent
+from .views import MeritHubWebhookView
+
+User = get_user_model()
+
+
+@override_settings(JOBS_RUN_EAGERLY=True)
+class MeritHubAttendanceWebhookTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.live_class = LiveClass.objects.create(batch=cls.batch, title='Class', class_id='class-1')
+        cls.students = User.objects.bulk_create(
+            User(email=f'student{i}@example.com', phone_number=f'+9170000{i:05d}', full_name=f'Student {i}',
+                 merit_user_id=f'merit-{i}')
+            for i in range(50))
+        Attendance.objects.bulk_create(Attendance(student=student, live_class=cls.live_class)
+                                       for student in cls.students)
+
+    def post(self, payload):
+        request = APIRequestFactory().post('/merithub/', payload, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            return MeritHubWebhookView.as_view()(request)
+
+    def payload(self):
+        return {
+            'requestType': 'attendance',
+            'classId': 'class-1',
+            'attendance': [
+                {'userId': f'merit-{i}', 'browser': {'name': 'Firefox'}, 'ip': '10.0.0.1', 'os': {'name': 'Linux'},
+                 'startTime': '2024-05-01T10:00:00+05:30', 'totalTime': 3000 + i}
+                for i in range(40)
+            ] + [{'userId': 'unknown-user', 'totalTime': 10}],
+        }
+
+    def test_attendance_is_applied_in_bulk(self):
+        # Locked live class, attendance rows, their bulk update, the held flag and three summary queries, inside a
+        # savepoint
+        with self.assertNumQueries(9), self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            handle_attendance(self.payload())
+
+        attended = Attendance.objects.filter(live_class=self.live_class, attended=True)
+        self.assertEqual(attended.count(), 40)
+        attendance = attended.get(student=self.students[7])
+        self.assertEqual((attendance.ip, attendance.total_time), ('10.0.0.1', 3007))
+        self.assertEqual(attendance.browser, {'name': 'Firefox'})
+        self.assertIsNotNone(attendance.start_time)
+
+    def test_attendance_summaries_are_updated_once(self):
+        second_class = LiveClass.objects.create(batch=self.live_class.batch, title='Class 2', class_id='class-2')
+        Attendance.objects.bulk_create(Attendance(student=student, live_class=second_class)
+                                       for student in self.students)
+        with self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            handle_attendance(self.payload())
+            handle_attendance(self.payload())  # Redelivered
+        handle_attendance({'classId': 'class-2', 'attendance': [{'userId': 'merit-0', 'totalTime': 1800}]})
+
+        summaries = AttendanceSummary.objects.filter(batch=self.live_class.batch)
+        self.assertEqual(summaries.count(), 50)
+        first = summaries.get(student=self.students[0])
+        self.assertEqual((first.classes_held, first.classes_attended, first.total_minutes, first.percentage),
+                         (2, 2, 80, Decimal('100.00')))
+        seventh = summaries.get(student=self.students[7])
+        self.assertEqual((seventh.classes_held, seventh.classes_attended, seventh.total_minutes, seventh.percentage),
+                         (2, 1, 50, Decimal('50.00')))
+        absent = summaries.get(student=self.students[45])
+        self.assertEqual((absent.classes_held, absent.classes_attended, absent.percentage), (2, 0, Decimal('0.00')))
+
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.live_class.batch.created_by)
+        with override_config(ATTENDANCE_CRITERIA=75):
+            response = BatchViewSet.as_view({'get': 'low_attendance'})(request, pk=self.live_class.batch.pk)
+        self.assertEqual(len(response.data['students']), 49)
+        self.assertEqual(response.data['students'][0]['percentage'], '0.00')
+
+    def test_delivery_is_stored_and_processed(self):
+        with self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            response = self.post(self.payload())
+
+        self.assertEqual(response.data, {'message': 'Event queued'})
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.source, event.event_type), (WebhookEvent.Source.MERITHUB, 'attendance'))
+        self.assertEqual((event.status, event.attempts), (WebhookEvent.Status.PROCESSED, 1))
+        self.assertEqual(Attendance.objects.filter(live_class=self.live_class, attended=True).count(), 40)
+
+    def test_redelivery_is_ignored(self):
+        with self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            self.post(self.payload())
+        with mock.patch('apps.webhook.jobs.process_event') as process_event:
+            response = self.post(self.payload())
+
+        self.assertEqual(response.data, {'message': 'Duplicate event'})
+        process_event.assert_not_called()
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_failed_event_can_be_retried(self):
+        with mock.patch('apps.webhook.jobs.process_event', side_effect=ValueError('broken')), \
+                self.assertLogs('apps.webhook.jobs', 'ERROR'):
+            self.post(self.payload())
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.error), (WebhookEvent.Status.FAILED, 'broken'))
+
+        with self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            call_command('drain_webhook_inbox', '--retry-failed', stdout=StringIO())
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.error), (WebhookEvent.Status.PROCESSED, 2, ''))
+        self.assertEqual(Attendance.objects.filter(live_class=self.live_class, attended=True).count(), 40)
+
+    def test_unknown_request_type_is_rejected(self):
+        response = self.post({'requestType': 'something'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WebhookEvent.objects.exists())
+
+
+class WebhookInboxDrainTests(TransactionTestCase):
+    def test_every_event_is_committed_on_its_own(self):
+        first, second = (WebhookEvent.objects.create(source=WebhookEvent.Source.MERITHUB, dedup_key=key, payload={})
+                         for key in ('first', 'second'))
+        seen = []
+
+        def read_status():
+            # A separate connection only sees committed rows
+            try:
+                seen.append(WebhookEvent.objects.get(pk=first.pk).status)
+            finally:
+                connection.close()
+
+        def process_event(event):
+            if event.pk == second.pk:
+                reader = threading.Thread(target=read_status)
+                reader.start()
+                reader.join()
+
+        with mock.patch('apps.webhook.jobs.process_event', side_effect=process_event):
+            self.assertEqual(drain_webhook_inbox(), 2)
+        self.assertEqual(seen, [WebhookEvent.Status.PROCESSED])
+
+
+class MeritHubClassContentWebhookTests(BatchTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.live_class = LiveClass.objects.create(batch=cls.batch, title='Class', class_id='class-1')
+        cls.student = User.objects.create_user(email='student@example.com', phone_number='+919876543211',
+                                               full_name='Student', password='password')
+        Enrollment.objects.create(batch=cls.batch, student=cls.student, is_approved=True)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = self.settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def chat(self, **params):
+        request = APIRequestFactory().get('/chat/', params)
+        force_authenticate(request, user=self.student)
+        return StudentLiveClassChatView.as_view()(request, pk=self.live_class.pk)
+
+    def test_class_files_are_replaced_on_redelivery(self):
+        payload = {'classId': 'class-1', 'Files': [{'name': 'notes.pdf', 'url': 'https://files.example.com/1'},
+                                                   {'name': 'slides.pptx', 'url': 'https://files.example.com/2'}]}
+        handle_class_files(payload)
+        handle_class_files(payload)
+
+        self.assertEqual(list(self.live_class.shared_files.values_list('name', flat=True)),
+                         ['notes.pdf', 'slides.pptx'])
+
+    def test_chat_is_stored_compressed_and_paged(self):
+        public = [{'userId': f'user-{i % 7}', 'message': f'Message {i}' + (' homework' if i % 100 == 0 else '')}
+                  for i in range(1000)]
+        handle_chat_data({'classId': 'class-1', 'chats': {'public': public, 'private': public[:3]}})
+
+        chat = LiveClassChat.objects.get(live_class=self.live_class, channel=LiveClassChat.Channel.PUBLIC)
+        self.assertEqual((chat.message_count, len(chat.chunk_offsets)), (1000, 6))
+        self.assertLess(chat.transcript.size, len(str(public)))
+
+        # Page 9 lies in the fifth chunk, the ones before it are not read
+        with mock.patch('gzip.decompress', wraps=gzip.decompress) as decompress:
+            response = self.chat(page=9, page_size=100)
+        self.assertEqual(decompress.call_count, 1)
+        self.assertEqual([m['message'] for m in response.data['results']][:2], ['Message 800 homework', 'Message 801'])
+        self.assertTrue(response.data['has_next'])
+
+        response = self.chat(search='HOMEWORK', page=2, page_size=4)
+        self.assertEqual([m['message'] for m in response.data['results']],
+                         ['Message 400 homework', 'Message 500 homework', 'Message 600 homework',
+                          'Message 700 homework'])
+        self.assertTrue(response.data['has_next'])
+        self.assertEqual(self.chat(page=11, page_size=100).data['results'], [])
+
+    def test_chat_links_are_downloaded(self):
+        messages = [{'userId': 'user-1', 'message': 'Hello'}, {'userId': 'user-2', 'message': 'Hi'}]
+        with mock.patch.object(MeritHubAPI, 'fetch_chat_transcript', return_value=messages) as fetch, \
+                self.assertLogs('apps.webhook.handlers', 'WARNING'):
+            handle_chat_data({'classId': 'class-1', 'chats': {'public': 'https://chats.example.com/public',
+                                                              'private': {'unexpected': True}}})
+
+        fetch.assert_called_once_with('https://chats.example.com/public')
+        self.assertEqual(list(LiveClassChat.objects.values_list('channel', 'message_count')), [('public', 2)])
+        self.assertEqual(self.chat().data['results'], messages)
+
+    def test_missing_chats_are_ignored(self):
+        handle_chat_data({'classId': 'class-1', 'chats': None})
+        self.assertFalse(LiveClassChat.objects.exists())
+
+    def test_course_class_content_is_stored(self):
+        course = Course.objects.create(name='Course', description='Course', created_by=self.student)
+        live_class = CourseLiveClass.objects.create(course=course, title='Class', class_id='course-class-1')
+
+        handle_class_files({'classId': 'course-class-1', 'Files': [{'name': 'notes.pdf'}]})
+        handle_chat_data({'classId': 'course-class-1', 'chats': {'public': [{'message': 'Hello'}]}})
+
+        self.assertEqual(list(live_class.shared_files.values_list('name', flat=True)), ['notes.pdf'])
+        chat = live_class.chats.get()
+        self.assertEqual(chat.get_page(), ([{'message': 'Hello'}], False))
+        self.assertFalse(self.live_class.chats.exists())
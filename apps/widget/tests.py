@@ -1,3 +1,96 @@
-from django.test import TestCase
+from datetime import date, datetime
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.batch.models import Batch, BatchPurchaseOrder, FeeStructure
+from apps.batch.testing import BatchTestCase
+from .views import FeesMetricsView
+
+User = get_user_model()
+
+
+class FeesMetricsTests(BatchTestCase):
+    @classmethod
+    def get_batch_fields(cls):
+        return {'fee_structure': FeeStructure.objects.create(structure_name='Monthly', fee_amount=1000,
+                                                             installments=3)}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        free_batch = Batch.objects.create(name='Free', start_date=date.today(), subject=cls.subject,
+                                          created_by=cls.user)
+        students = User.objects.bulk_create(
+            User(email=f'student{i}@example.com', phone_number=f'+9170000{i:05d}', full_name=f'Student {i}')
+            for i in range(3))
+        january = timezone.make_aware(datetime(2026, 1, 15))
+        february = timezone.make_aware(datetime(2026, 2, 15))
+        BatchPurchaseOrder.objects.bulk_create([
+            # Two installments paid by the first student, one by the second, the third has not paid yet
+            BatchPurchaseOrder(student=students[0], batch=cls.batch, installment_number=1, amount=1000, is_paid=True,
+                               payment_date=january),
+            BatchPurchaseOrder(student=students[0], batch=cls.batch, installment_number=2, amount=1000, is_paid=True,
+                               payment_date=february),
+            BatchPurchaseOrder(student=students[1], batch=cls.batch, installment_number=1, amount=1000, is_paid=True,
+                               payment_date=february),
+            BatchPurchaseOrder(student=students[2], batch=cls.batch, installment_number=1, amount=1000),
+            BatchPurchaseOrder(student=students[0], batch=free_batch, installment_number=1, amount=0),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def fees_metrics(self, **params):
+        request = APIRequestFactory().get('/metrics/fees/', params)
+        force_authenticate(request, user=self.user)
+        response = FeesMetricsView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_totals_come_from_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.fees_metrics()
+
+        self.assertEqual(data, {'total_paid_fees': Decimal(3000), 'total_outstanding_fees': Decimal(6000),
+                                'total_records': 5})
+
+    def test_breakdown_by_batch_and_month(self):
+        data = self.fees_metrics(breakdown='batch,month')
+
+        self.assertEqual([(row['batch_name'], row['total_paid_fees'], row['total_outstanding_fees'],
+                           row['total_records']) for row in data['batches']],
+                         [('Batch', 3000, 6000, 4), ('Free', 0, 0, 1)])
+        self.assertEqual([(row['month'], row['total_paid_fees'], row['total_records']) for row in data['months']],
+                         [(date(2026, 1, 1), 1000, 1), (date(2026, 2, 1), 2000, 2)])
+
+    def test_cache_is_invalidated_when_an_order_changes(self):
+        self.fees_metrics()
+        with self.assertNumQueries(0):
+            self.fees_metrics()
+
+        order = BatchPurchaseOrder.objects.get(batch=self.batch, is_paid=False)
+        order.is_paid = True
+        order.payment_date = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+        data = self.fees_metrics()
+        self.assertEqual(data['total_paid_fees'], Decimal(4000))
+        self.assertEqual(data['total_outstanding_fees'], Decimal(5000))
+
+    def test_cache_is_invalidated_when_a_fee_structure_changes(self):
+        self.fees_metrics()
+        fee_structure = self.batch.fee_structure
+        fee_structure.fee_amount = 2000
+        with self.captureOnCommitCallbacks(execute=True):
+            fee_structure.save()
+        self.assertEqual(self.fees_metrics()['total_outstanding_fees'], Decimal(15000))
+
+        self.batch.fee_structure = FeeStructure.objects.create(structure_name='Cheaper', fee_amount=500, installments=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.batch.save()
+        self.assertEqual(self.fees_metrics()['total_outstanding_fees'], Decimal(1500))
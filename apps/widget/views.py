@@ -1,6 +1,12 @@
-from django.db.models import Count, Sum
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, DecimalField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, TruncMonth
 from django.utils import timezone
 from rest_framework import views, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
 from apps.batch.models import Batch, BatchPurchaseOrder, Enrollment
@@ -91,28 +97,59 @@ class GlobalMetricsView(views.APIView):
 
 
 class FeesMetricsView(views.APIView):
+    """
+    Paid and outstanding fees over all batch purchase orders, where the outstanding fees of a student in a batch are
+    the fee structure total less what they paid. Add `breakdown=batch`, `breakdown=month` or both (comma separated)
+    for the same totals per batch, and the paid fees per payment month. Responses are cached until a purchase order
+    changes.
+    """
+    BREAKDOWNS = ('batch', 'month')
+
     def get(self, request, *args, **kwargs):
-        total_paid_fees = 0
-        total_outstanding_fees = 0
-        total_records = 0
-        purchase_orders = BatchPurchaseOrder.objects.all()
-        for order in purchase_orders:
-            batch = order.batch
-            paid_fees = BatchPurchaseOrder.objects.filter(batch=batch, student=order.student, is_paid=True).aggregate(
-                total_paid=Sum('amount'))['total_paid'] or 0
-            total_fees = batch.fee_structure.total_amount if batch.fee_structure else 0
-            outstanding_fees = total_fees - paid_fees
-
-            total_paid_fees += paid_fees
-            total_outstanding_fees += outstanding_fees
-            total_records += 1
+        breakdown = sorted(filter(None, request.query_params.get('breakdown', '').split(',')))
+        if set(breakdown) - set(self.BREAKDOWNS):
+            raise ValidationError({'breakdown': f"Choose from {', '.join(self.BREAKDOWNS)}."})
+
+        cache_key = f"fees-metrics:{BatchPurchaseOrder.metrics_version()}:{','.join(breakdown)}"
+        response_data = cache.get(cache_key)
+        if response_data is None:
+            response_data = self.get_metrics(breakdown)
+            cache.set(cache_key, response_data, settings.FEES_METRICS_CACHE_TIMEOUT)
+        return Response(response_data, status=status.HTTP_200_OK)
 
+    def get_metrics(self, breakdown):
+        # One grouped query, every student is charged the fee structure total once per batch
+        batches = list(
+            BatchPurchaseOrder.objects.values('batch_id', 'batch__name')
+            .annotate(total_paid_fees=Coalesce(Sum('amount', filter=Q(is_paid=True)), Decimal(0)),
+                      total_records=Count('id'), students=Count('student', distinct=True),
+                      fee_total=Coalesce(Max('batch__fee_structure__total_amount'), Decimal(0)))
+            .annotate(total_outstanding_fees=ExpressionWrapper(
+                F('fee_total') * F('students') - F('total_paid_fees'), output_field=DecimalField()))
+            .values('batch_id', 'batch__name', 'total_paid_fees', 'total_outstanding_fees', 'total_records')
+            .order_by('batch_id')
+        )
         response_data = {
-            'total_paid_fees': total_paid_fees,
-            'total_outstanding_fees': total_outstanding_fees,
-            'total_records': total_records
+            'total_paid_fees': sum((row['total_paid_fees'] for row in batches), Decimal(0)),
+            'total_outstanding_fees': sum((row['total_outstanding_fees'] for row in batches), Decimal(0)),
+            'total_records': sum(row['total_records'] for row in batches),
         }
-        return Response(response_data, status=status.HTTP_200_OK)
+        if 'batch' in breakdown:
+            response_data['batches'] = [{
+                'batch_id': row['batch_id'],
+                'batch_name': row['batch__name'],
+                'total_paid_fees': row['total_paid_fees'],
+                'total_outstanding_fees': row['total_outstanding_fees'],
+                'total_records': row['total_records'],
+            } for row in batches]
+        if 'month' in breakdown:
+            response_data['months'] = list(
+                BatchPurchaseOrder.objects.filter(is_paid=True, payment_date__isnull=False)
+                .values(month=TruncMonth('payment_date', output_field=DateField()))
+                .annotate(total_paid_fees=Sum('amount'), total_records=Count('id'))
+                .order_by('month')
+            )
+        return response_data
 
 
 class StudentDashBoardMetricView(views.APIView):
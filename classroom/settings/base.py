@@ -59,7 +59,8 @@ PROJECT_APPS = [
     "apps.free_resource.apps.FreeResourceConfig",
     "apps.announcement.apps.AnnouncementConfig",
     "apps.notification.apps.NotificationConfig",
-    "apps.mobile.apps.MobileConfig"
+    "apps.mobile.apps.MobileConfig",
+    "apps.webhook.apps.WebhookConfig",
 ]
 
 INSTALLED_APPS += PROJECT_APPS
@@ -180,6 +181,7 @@ CONSTANCE_CONFIG = {
     # Payment Gateway Settings
     "RAZORPAY_API_KEY": ("", "Razorpay API Key"),
     "RAZORPAY_API_SECRET": ("", "Razorpay API Secret"),
+    "RAZORPAY_WEBHOOK_SECRET": ("", "Razorpay Webhook Secret"),
     # SMS Gateway (DLT) Settings
     "SMS_GATEWAY_API_BASE_URL": ("", "SMS Gateway API Base URL"),
     "SMS_GATEWAY_API_KEY": ("", "SMS Gateway API Key"),
@@ -266,6 +268,31 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=20),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=365),
 }
+# The cache holds state every worker process must share: the MeritHub token and its refresh lock, and the
+# version keys of the fee-metrics and coupon caches. LocMemCache is per process and only suits a single process
+# such as the tests, deployments with several workers override CACHES with a shared backend, see
+# production_example.py.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+# Folder listings are keyed by the folder version, so stale entries simply age out
+FOLDER_STRUCTURE_CACHE_TIMEOUT = 60 * 60 * 24
+# Fee metrics are keyed by a version that changes with every purchase order, see BatchPurchaseOrder.metrics_version
+FEES_METRICS_CACHE_TIMEOUT = 60 * 60
+# Coupon lookups are keyed by a version that changes with every coupon save or delete, see Coupon.lookup_version
+COUPON_CACHE_TIMEOUT = 60 * 60
+
+# Background jobs (config.jobs), run inline instead of on the worker pool when JOBS_RUN_EAGERLY is set
+JOBS_MAX_WORKERS = 4
+JOBS_RUN_EAGERLY = False
+
+# MeritHub endpoints, point them at config.merithub_stub to work offline
+MERITHUB_ACCOUNT_URL = "https://serviceaccount1.meritgraph.com/v1/"
+MERITHUB_CLASS_URL = "https://class1.meritgraph.com/v1/"
+MERITHUB_ROOM_URL = "https://live.merithub.com/info/room/"
+
 BROKER_URL = "redis://localhost:6379"
 CELERY_RESULT_BACKEND = "redis://localhost:6379"
 CELERY_ACCEPT_CONTENT = ["application/json"]
@@ -301,7 +328,6 @@ SWAGGER_SETTINGS = {
     },
     # 'DEFAULT_AUTO_SCHEMA_CLASS': 'drf_yasg.openapi.AutoSchema',
 }
-WEBHOOK_LOG_FOLDER = Path.joinpath(BASE_DIR, 'webhook_log')
 
 
 PUSH_NOTIFICATIONS_SETTINGS = {
@@ -27,6 +27,16 @@ DATABASES = {
     }
 }
 
+# Shared cache, so every worker sees the same MeritHub token, refresh lock and cache versions. Run
+# `python manage.py createcachetable` once after deploying. With the `redis` package installed, RedisCache
+# ("django.core.cache.backends.redis.RedisCache", LOCATION "redis://localhost:6379/1") works as well.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
+}
+
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR.joinpath('assets')  # Replace with your actual static root
@@ -0,0 +1,47 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process wide pool running background jobs."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.JOBS_MAX_WORKERS, thread_name_prefix='job')
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background job %s failed", func.__name__)
+    finally:
+        # Every worker thread has its own connection, do not leave it open between jobs
+        connection.close()
+
+
+def enqueue(func, *args, **kwargs):
+    """
+    Run `func(*args, **kwargs)` in the background once the current transaction commits, so the job always sees
+    the rows created for it.
+
+    With JOBS_RUN_EAGERLY the job runs inline instead, which stands in for the worker pool in tests.
+    """
+    def submit():
+        if settings.JOBS_RUN_EAGERLY:
+            func(*args, **kwargs)
+        else:
+            get_executor().submit(_run, func, args, kwargs)
+
+    transaction.on_commit(submit)
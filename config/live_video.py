@@ -1,22 +1,63 @@
 import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import jwt
 import requests
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 
 from apps.batch.models import LiveClass
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process wide requests session, so MeritHub calls reuse pooled keep-alive connections."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MeritHubAPI.MAX_WORKERS)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
 
 
 class MeritHubAPI:
-    BASE_URL = "https://serviceaccount1.meritgraph.com/v1/"
-    CLASS_URL = "https://class1.meritgraph.com/v1/"
+    # Participant provisioning
+    MAX_WORKERS = 16
+    MAX_RETRIES = 3
+    RETRY_BACKOFF = 0.5  # Seconds, doubled after every failed attempt
+    UNPROCESSED_STATUSES = frozenset({429, 503})  # Answers telling the call was not applied
+    PROGRESS_INTERVAL = 25  # Accounts created between two progress reports
+    REQUEST_TIMEOUT = 30
+
+    # Access token caching
+    TOKEN_LIFETIME = 3600  # Assumed when the token response has no expires_in
+    TOKEN_REFRESH_MARGIN = 300  # Refresh this many seconds before the token lapses
+    TOKEN_LOCK_TIMEOUT = 30
+    _local_tokens = {}  # client id -> (token, expires at), spares the cache round-trip within a process
 
     def __init__(self, client_id, secret_key):
         self.client_id = client_id
         self.secret_key = secret_key
+        self.BASE_URL = settings.MERITHUB_ACCOUNT_URL
+        self.CLASS_URL = settings.MERITHUB_CLASS_URL
+        self.ROOM_URL = settings.MERITHUB_ROOM_URL
         self.access_token = None
+        self.token_expires_at = 0
 
     def generate_jwt(self):
         """Generates a JWT token."""
@@ -27,7 +68,7 @@ class MeritHubAPI:
         # Create JWT payload
         expiry = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
         payload = {
-            "aud": f"https://serviceaccount1.meritgraph.com/v1/{client_id}/api/token",
+            "aud": f"{self.BASE_URL}{client_id}/api/token",
             "iss": client_id,
             "expiry": expiry.timestamp()  # Use Unix timestamp for expiry
         }
@@ -52,39 +93,218 @@ class MeritHubAPI:
         }
 
         # Make the request to get the access token
-        response = requests.post(url, data=token_request_body)
+        response = get_session().post(url, data=token_request_body, timeout=self.REQUEST_TIMEOUT)
 
         # Raise an error if the request was unsuccessful
         response.raise_for_status()
 
-        # Extract the access token from the response
-        self.access_token = response.json().get('access_token')
+        # Extract the access token and its lifetime from the response
+        data = response.json()
+        self.access_token = data.get('access_token')
+        self.token_expires_at = time.time() + int(data.get('expires_in') or self.TOKEN_LIFETIME)
         return self.access_token
 
+    @property
+    def token_cache_key(self):
+        return f"merithub:access-token:{self.client_id}"
+
+    def get_cached_access_token(self):
+        """
+        Return a valid access token, shared by every worker through the Django cache. Workers only share it when
+        CACHES is a shared backend, with the per-process LocMemCache each process fetches its own token.
+
+        The token is refreshed TOKEN_REFRESH_MARGIN seconds before it lapses. Only the worker holding the refresh
+        lock asks MeritHub for a new one; the others keep using the current token while it is still valid, or wait
+        for the refreshed one.
+        """
+        now = time.time()
+        token, expires_at = self._local_tokens.get(self.client_id, (None, 0))
+        if expires_at - self.TOKEN_REFRESH_MARGIN > now:
+            return token
+        token, expires_at = cache.get(self.token_cache_key) or (None, 0)
+        if expires_at - self.TOKEN_REFRESH_MARGIN > now:
+            self._local_tokens[self.client_id] = (token, expires_at)
+            return token
+
+        lock_key = f"{self.token_cache_key}:lock"
+        if cache.add(lock_key, True, self.TOKEN_LOCK_TIMEOUT):
+            try:
+                token = self.get_access_token()
+                entry = (token, self.token_expires_at)
+                cache.set(self.token_cache_key, entry, max(int(self.token_expires_at - time.time()), 1))
+                self._local_tokens[self.client_id] = entry
+                return token
+            finally:
+                cache.delete(lock_key)
+
+        # Another worker is refreshing the token
+        if expires_at > now:
+            return token
+        deadline = now + self.TOKEN_LOCK_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(0.1)
+            token, expires_at = cache.get(self.token_cache_key) or (None, 0)
+            if expires_at > time.time():
+                self._local_tokens[self.client_id] = (token, expires_at)
+                return token
+        return self.get_access_token()
+
+    def invalidate_access_token(self):
+        """Drop the shared token after MeritHub rejected it."""
+        self._local_tokens.pop(self.client_id, None)
+        cache.delete(self.token_cache_key)
+        self.access_token = None
+
     def _get_headers(self):
         """Helper method to get headers with access token."""
-        if not self.access_token:
-            self.get_access_token()
+        self.access_token = self.get_cached_access_token()
         return {
             "Authorization": f"{self.access_token}",
             "Content-Type": "application/json"
         }
 
+    def _request(self, method, url, **kwargs):
+        """Send an API call over the shared session, fetching a new token once if MeritHub rejects the current one."""
+        for attempt in range(2):
+            response = get_session().request(method, url, headers=self._get_headers(), timeout=self.REQUEST_TIMEOUT,
+                                             **kwargs)
+            if response.status_code != 401 or attempt:
+                break
+            self.invalidate_access_token()
+        response.raise_for_status()
+        return response.json()
+
     def generate_url(self, link):
-        return f"https://live.merithub.com/info/room/{self.client_id}/{link}"
+        return f"{self.ROOM_URL}{self.client_id}/{link}"
 
     # Users
     def create_user(self, user_data):
         """Add a user to the account."""
         url = f"{self.BASE_URL}{self.client_id}/users"
-        headers = self._get_headers()
-        response = requests.post(url, json=user_data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return self._request('POST', url, json=user_data)
+
+    @classmethod
+    def _is_unprocessed(cls, exc):
+        """
+        Whether a failed call certainly never reached MeritHub: the connection could not be opened, or the answer
+        was 429 or 503. A read timeout, a dropped connection or another 5xx may come after the call was applied.
+        """
+        if isinstance(exc, requests.ConnectTimeout):
+            return True
+        if isinstance(exc, requests.HTTPError):
+            return exc.response is not None and exc.response.status_code in cls.UNPROCESSED_STATUSES
+        if isinstance(exc, requests.ConnectionError):
+            reason = exc.args[0] if exc.args else None
+            return isinstance(getattr(reason, 'reason', reason), NewConnectionError)
+        return False
+
+    def _call_with_retry(self, func, *args, **kwargs):
+        """
+        Run an API call, retrying with exponential backoff only when it was not processed (see _is_unprocessed), so
+        calls that create something, like create_user, are never sent twice.
+        """
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except requests.RequestException as exc:
+                if not self._is_unprocessed(exc) or attempt == self.MAX_RETRIES - 1:
+                    raise
+                time.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+
+    def provision_users(self, users, role="M", permission="CJ", progress=None):
+        """
+        Create MeritHub accounts for the users that have none, MAX_WORKERS calls at a time, and store the new ids
+        with one bulk_update. Returns the users that could not be provisioned.
+
+        `progress(provisioned_students=...)` is called every PROGRESS_INTERVAL new accounts with the number of users
+        that have one.
+        """
+        pending = [user for user in users if not user.merit_user_id]
+        ready = len(users) - len(pending)
+        if not pending:
+            if progress:
+                progress(provisioned_students=ready)
+            return []
+        # Fetch the access token once, before the workers share it
+        self._get_headers()
+
+        def provision(user):
+            return self._call_with_retry(self.create_user, {
+                'name': user.full_name,
+                'email': user.email,
+                'clientUserId': str(user.id),
+                "role": role,
+                "timeZone": "Asia/Kolkata",
+                "permission": permission
+            })['userId']
+
+        provisioned, failed = [], []
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(pending))) as executor:
+            futures = {executor.submit(provision, user): user for user in pending}
+            for future in as_completed(futures):
+                user = futures[future]
+                try:
+                    user.merit_user_id = future.result()
+                    provisioned.append(user)
+                except (requests.RequestException, KeyError, ValueError):
+                    logger.exception("Could not provision MeritHub user for user %s", user.id)
+                    failed.append(user)
+                    continue
+                if progress and len(provisioned) % self.PROGRESS_INTERVAL == 0:
+                    progress(provisioned_students=ready + len(provisioned))
+        User.objects.bulk_update(provisioned, ['merit_user_id'])
+        if progress:
+            progress(provisioned_students=ready + len(provisioned))
+        return failed
+
+    def register_students(self, live_class, users, attendance_model, progress=None):
+        """
+        Provision `users`, add them to the MeritHub class of `live_class` and create their attendance rows with one
+        bulk_create. Returns the users left out because they could not be provisioned.
+
+        `progress` is handed to provision_users and then called with `links_generated` once the links are stored.
+        """
+        return self.register_students_in_classes([live_class], users, attendance_model, progress)
+
+    def register_students_in_classes(self, live_classes, users, attendance_model, progress=None):
+        """
+        Like register_students for several classes, e.g. the occurrences of a series: the users are provisioned once,
+        added to every class MAX_WORKERS calls at a time, and the attendance rows of all classes are created with one
+        bulk_create.
+        """
+        users = list(users)
+        failed = self.provision_users(users, progress=progress)
+        failed_ids = {user.id for user in failed}
+        students = {user.merit_user_id: user for user in users if user.id not in failed_ids}
+        if not students or not live_classes:
+            return failed
+
+        def add_students(live_class):
+            common_participant_link = live_class.common_participant_link
+            user_link = common_participant_link.split('/')[-1] if common_participant_link else ""
+            return self.add_students_to_class(class_id=live_class.class_id, users=[
+                {"userId": merit_user_id, "userLink": user_link, "userType": "su"} for merit_user_id in students
+            ])
+
+        attendances = []
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(live_classes))) as executor:
+            for live_class, response in zip(live_classes, executor.map(add_students, live_classes)):
+                for student in response:
+                    user = students.get(student['userId'])
+                    if user is None:
+                        logger.warning("MeritHub returned unknown user %s for class %s", student['userId'],
+                                       live_class.class_id)
+                        continue
+                    attendances.append(attendance_model(student=user, live_class=live_class,
+                                                        live_class_link=self.generate_url(student['userLink'])))
+        attendance_model.objects.bulk_create(attendances, batch_size=1000)
+        if progress:
+            progress(links_generated=len(attendances))
+        return failed
 
     # Classes
-    def schedule_class(self, user_id, class_data):
-        """Schedule a class for the Instructor."""
+    def get_instructor_merit_id(self, user_id):
+        """MeritHub id of the instructor, creating their MeritHub account on first use."""
         user = User.objects.get(id=user_id)
         if not user.merit_user_id:
             response = self.create_user({
@@ -97,34 +317,43 @@ class MeritHubAPI:
             })
             user.merit_user_id = response['userId']
             user.save()
-        url = f"{self.CLASS_URL}{self.client_id}/{user.merit_user_id}"
-        headers = self._get_headers()
-        response = requests.post(url, json=class_data, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        return data
+        return user.merit_user_id
+
+    def schedule_class(self, user_id, class_data, merit_user_id=None):
+        """Schedule a class for the Instructor."""
+        merit_user_id = merit_user_id or self.get_instructor_merit_id(user_id)
+        url = f"{self.CLASS_URL}{self.client_id}/{merit_user_id}"
+        return self._request('POST', url, json=class_data)
+
+    def schedule_classes(self, user_id, classes):
+        """
+        Schedule every class data in `classes` for the instructor, MAX_WORKERS calls at a time, and return the
+        responses in the same order. Scheduling is not retried, a repeated call could create the class twice.
+        """
+        merit_user_id = self.get_instructor_merit_id(user_id)
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(classes))) as executor:
+            return list(executor.map(lambda class_data: self.schedule_class(user_id, class_data, merit_user_id),
+                                     classes))
 
     def add_students_to_class(self, class_id, users):
         """Add students to a scheduled class."""
         url = f"{self.CLASS_URL}{self.client_id}/{class_id}/users"
-        headers = self._get_headers()
-        response = requests.post(url, json={"users": users}, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return self._request('POST', url, json={"users": users})
 
     def remove_users_from_class(self, class_id, users):
         """Remove users from a class."""
         url = f"{self.CLASS_URL}{self.client_id}/{class_id}/removeuser"
-        headers = self._get_headers()
-        response = requests.post(url, json={"users": users}, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return self._request('POST', url, json={"users": users})
 
     def delete_class(self, class_id):
         """Delete a class and all related data."""
         url = f"{self.CLASS_URL}{self.client_id}/{class_id}"
-        headers = self._get_headers()
-        response = requests.delete(url, headers=headers)
+        return self._request('DELETE', url)
+
+    @classmethod
+    def fetch_chat_transcript(cls, url):
+        """Download a chat transcript linked from the chats webhook and return its decoded JSON."""
+        response = get_session().get(url, timeout=cls.REQUEST_TIMEOUT)
         response.raise_for_status()
         return response.json()
 
@@ -0,0 +1,155 @@
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAILURE = object()  # Answer of a request the stub chose to fail
+
+
+class MeritHubStub:
+    """
+    In-process stand-in for the MeritHub API, so live classes can be created and measured without leaving the
+    machine.
+
+    Point a client at it with `stub.configure(api)`, or every client with `override_settings(**stub.settings())`.
+    Every request waits `latency` seconds before it is answered, like a round-trip to the real service would, and is
+    counted per endpoint in `calls`. A share `error_rate` of the API calls (token requests excepted) is answered
+    with 503 instead, counted under "error"; `seed` makes the failures reproducible.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def settings(self):
+        return {
+            'MERITHUB_ACCOUNT_URL': f"{self.url}account/",
+            'MERITHUB_CLASS_URL': f"{self.url}class/",
+        }
+
+    def configure(self, api):
+        api.BASE_URL = f"{self.url}account/"
+        api.CLASS_URL = f"{self.url}class/"
+        return api
+
+    def next_id(self, prefix):
+        with self._lock:
+            return f"{prefix}{next(self._ids)}"
+
+    def count(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+
+    @property
+    def remote_calls(self):
+        """Number of requests answered so far, failed ones included."""
+        with self._lock:
+            return sum(self.calls.values())
+
+    def should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def respond(self, method, path, body):
+        """Return the JSON answer for a request, following the shape of the MeritHub endpoints in use."""
+        parts = path.strip('/').split('/')
+        if parts[0] == 'account' and parts[-1] == 'token':
+            self.count('token')
+            return {'access_token': self.next_id('stub-token-'), 'expires_in': 3600}
+        if self.should_fail():
+            self.count('error')
+            return FAILURE
+        if parts[0] == 'account' and parts[-1] == 'users':
+            self.count('create_user')
+            return {'userId': self.next_id('user-')}
+        if parts[0] == 'class' and method == 'DELETE':
+            self.count('delete_class')
+            return {'message': 'deleted'}
+        if parts[0] == 'class' and parts[-1] == 'users':
+            self.count('add_users')
+            return [{'userId': user['userId'], 'userLink': self.next_id('link-')} for user in body.get('users', [])]
+        if parts[0] == 'class' and parts[-1] == 'removeuser':
+            self.count('remove_users')
+            return {'message': 'removed'}
+        if parts[0] == 'class':
+            self.count('schedule_class')
+            class_id = self.next_id('class-')
+            return {
+                'classId': class_id,
+                'hostLink': f'host-{class_id}',
+                'commonLinks': {
+                    'commonHostLink': f'common-host-{class_id}',
+                    'commonModeratorLink': f'common-moderator-{class_id}',
+                    'commonParticipantLink': f'common-participant-{class_id}',
+                },
+            }
+        return None
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real service
+            disable_nagle_algorithm = True
+
+            def handle_request(self, method):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw and self.headers.get('Content-Type') == 'application/json' else {}
+                except ValueError:
+                    body = {}
+                time.sleep(stub.latency)
+                answer = stub.respond(method, self.path, body)
+                if answer is FAILURE:
+                    answer, code = {'message': 'Service unavailable'}, 503
+                else:
+                    code = 200 if answer is not None else 404
+                payload = json.dumps(answer).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                self.handle_request('POST')
+
+            def do_DELETE(self):
+                self.handle_request('DELETE')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
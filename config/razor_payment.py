@@ -1,22 +1,100 @@
 # config/razor_payment.py
 
+import logging
+import threading
+import time
+
 import razorpay
+import requests
 from constance import config
+from constance.signals import config_updated
 from django.conf import settings
 from django.db import transaction as db_transaction
+from django.dispatch import receiver
 from django.shortcuts import get_object_or_404
-import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from apps.payment.models import Transaction
 from apps.coupon.models import Coupon
 
 logger = logging.getLogger(__name__)
 
+CREDENTIAL_KEYS = ('RAZORPAY_API_KEY', 'RAZORPAY_API_SECRET')
+
+_client = None
+_client_auth = None
+_credentials_checked_at = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Process wide Razorpay client on a pooled keep-alive session. The credentials are read from constance at most
+    every RazorpayService.CREDENTIALS_TTL seconds, and the client is rebuilt only when they changed.
+    """
+    global _client, _client_auth, _credentials_checked_at
+    checked_at = _credentials_checked_at
+    if _client is not None and checked_at is not None and \
+            time.monotonic() - checked_at < RazorpayService.CREDENTIALS_TTL:
+        return _client
+    with _client_lock:
+        auth = (getattr(config, CREDENTIAL_KEYS[0]), getattr(config, CREDENTIAL_KEYS[1]))
+        if _client is None or auth != _client_auth:
+            session = _client.session if _client is not None else _build_session()
+            _client = razorpay.Client(session=session, auth=auth)
+            _client_auth = auth
+        _credentials_checked_at = time.monotonic()
+        return _client
+
+
+class _RazorpayRetry(Retry):
+    """
+    Retries idempotent calls on 429 and 5xx answers, but POSTs such as order.create only on 429 and 503: a 500, 502
+    or 504 may come after Razorpay already created the order.
+    """
+    UNPROCESSED_STATUSES = frozenset({429, 503})
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method.upper() not in Retry.DEFAULT_ALLOWED_METHODS and status_code not in self.UNPROCESSED_STATUSES:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _build_session():
+    """
+    Requests session keeping connections to Razorpay alive. Refused connections and throttled or unavailable
+    answers are retried a few times with backoff, see _RazorpayRetry. Reads that timed out are not, as the request
+    may have been applied.
+    """
+    retry = _RazorpayRetry(total=RazorpayService.MAX_RETRIES, connect=RazorpayService.MAX_RETRIES, read=0,
+                           status=RazorpayService.MAX_RETRIES, status_forcelist=(429, 500, 502, 503, 504),
+                           allowed_methods=None, backoff_factor=RazorpayService.RETRY_BACKOFF,
+                           raise_on_status=False)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=RazorpayService.POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+    return session
+
+
+@receiver(config_updated)
+def _credentials_updated(sender, key, **kwargs):
+    # Changes made in this process are picked up right away, other processes notice them within CREDENTIALS_TTL
+    global _credentials_checked_at
+    if key in CREDENTIAL_KEYS:
+        _credentials_checked_at = None
+
 
 class RazorpayService:
+    CREDENTIALS_TTL = 60  # Seconds
+    TIMEOUT = (3.05, 10)  # Connect and read timeouts in seconds
+    MAX_RETRIES = 2
+    RETRY_BACKOFF = 0.2  # Seconds, doubled after every failed attempt
+    POOL_SIZE = 16
+
     def __init__(self):
-        # Initialize Razorpay client with secure credentials from settings
-        self.client = razorpay.Client(auth=(config.RAZORPAY_API_KEY, config.RAZORPAY_API_SECRET))
+        # Shared client, see get_client
+        self.client = get_client()
 
     def initiate_transaction(
             self,
@@ -54,7 +132,7 @@ class RazorpayService:
                 "amount": int(total_amount * 100),  # Convert to paise
                 "currency": "INR",
                 "payment_capture": 1  # Auto capture
-            })
+            }, timeout=self.TIMEOUT)
 
             # Create Transaction record within an atomic transaction to ensure data integrity
             with db_transaction.atomic():